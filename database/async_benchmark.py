@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import random
+import sqlite3
+import time
+
+import benchmark
+import query_catalog
+from dal import AsyncDatabase, connect
+
+
+# Mixed per-user requests: (query number, UserID) for reads, or
+# ("insert", UserID) for an ExerciseLogs insert through the writer
+def make_requests(db_path, count, write_ratio=0.0, seed=0):
+    conn = sqlite3.connect(db_path)
+    max_user = conn.execute("SELECT MAX(UserID) FROM Users").fetchone()[0] or 1
+    conn.close()
+    numbers = sorted(query_catalog.user_queries())
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        user_id = rng.randint(1, max_user)
+        if rng.random() < write_ratio:
+            requests.append(("insert", user_id))
+        else:
+            requests.append((rng.choice(numbers), user_id))
+    return requests
+
+
+# Largest delay between when a periodic tick was due and when it ran: how long
+# the event loop was blocked
+async def _loop_lag(stop, interval=0.005):
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - due)
+    return worst
+
+
+async def _drive(handler, requests, concurrency):
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(request):
+        async with gate:
+            start = time.perf_counter_ns()
+            await handler(request)
+            latencies.append(time.perf_counter_ns() - start)
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(r) for r in requests))
+    seconds = time.perf_counter() - start
+    stop.set()
+    return seconds, sorted(latencies), await lag
+
+
+_INSERT_SQL = "INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes) VALUES (?, 'Running', 30)"
+
+
+# Coroutines that call sqlite3 directly on the event loop thread
+async def run_sync(db_path, requests, concurrency):
+    conn = connect(db_path)
+    queries = query_catalog.user_queries(epoch=query_catalog.stores_epoch(conn))
+
+    async def handler(request):
+        number, user_id = request
+        if number == "insert":
+            conn.execute("BEGIN")
+            conn.execute(_INSERT_SQL, (user_id,))
+            conn.execute("COMMIT")
+        else:
+            sql, placeholders = queries[number]
+            conn.execute(sql, (user_id,) * placeholders).fetchall()
+
+    try:
+        return await _drive(handler, requests, concurrency)
+    finally:
+        conn.close()
+
+
+async def run_async(db_path, requests, concurrency, readers):
+    async with AsyncDatabase(db_path, readers=readers, max_pending=concurrency) as db:
+        async def handler(request):
+            number, user_id = request
+            if number == "insert":
+                await db.insert("exercise_logs", UserID=user_id, ExerciseType="Running", DurationMinutes=30)
+            else:
+                await db.user_query(number, user_id)
+
+        return await _drive(handler, requests, concurrency)
+
+
+def summarize(label, seconds, latencies, lag):
+    return {
+        "path": label,
+        "requests": len(latencies),
+        "seconds": seconds,
+        "requests_per_s": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": benchmark.percentile(latencies, 50) / 1e6,
+        "p99_ms": benchmark.percentile(latencies, 99) / 1e6,
+        "max_loop_lag_ms": lag * 1e3,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent request throughput: blocking sqlite3 vs AsyncDatabase")
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at once")
+    parser.add_argument("--readers", type=int, action="append",
+                        help="reader threads for the async path (repeatable, default: 1, 2, 4, 8)")
+    parser.add_argument("--write-ratio", type=float, default=0.0,
+                        help="fraction of requests that insert an ExerciseLogs row (modifies --db)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    requests = make_requests(args.db, args.requests, args.write_ratio, args.seed)
+    results = [summarize("sync", *asyncio.run(run_sync(args.db, requests, args.concurrency)))]
+    for readers in args.readers or (1, 2, 4, 8):
+        results.append(summarize(f"async x{readers}",
+                                 *asyncio.run(run_async(args.db, requests, args.concurrency, readers))))
+
+    print(f"{'path':<10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max loop lag ms':>16}")
+    for r in results:
+        print(f"{r['path']:<10} {r['requests_per_s']:>9,.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['max_loop_lag_ms']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
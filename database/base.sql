@@ -45,6 +45,9 @@ CREATE TABLE HealthMetrics (
     MuscleMass NUMERIC(5, 2), 
     BloodPressure VARCHAR(15), 
     StepCount INTEGER, 
+    SystolicBP INTEGER, 
+    DiastolicBP INTEGER, 
+    RecordedAt DATETIME, 
     PRIMARY KEY (MetricID), 
     FOREIGN KEY(UserID) REFERENCES Users (UserID)
 );
@@ -84,7 +87,7 @@ CREATE INDEX idx_Users_UserName ON Users (UserName);
 CREATE INDEX idx_Users_Gender ON Users (Gender);
 
 -- Indexing for ExerciseLogs table
-CREATE INDEX idx_ExerciseLogs_UserID ON ExerciseLogs (UserID);
+CREATE INDEX idx_ExerciseLogs_UserID_DateTime ON ExerciseLogs (UserID, DateTime);
 CREATE INDEX idx_ExerciseLogs_ExerciseType ON ExerciseLogs (ExerciseType);
 CREATE INDEX idx_ExerciseLogs_DateTime ON ExerciseLogs (DateTime);
 
@@ -93,19 +96,54 @@ CREATE INDEX idx_GoalsAndProgress_UserID ON GoalsAndProgress (UserID);
 CREATE INDEX idx_GoalsAndProgress_GoalType ON GoalsAndProgress (GoalType);
 
 -- Indexing for HealthMetrics table
-CREATE INDEX idx_HealthMetrics_UserID ON HealthMetrics (UserID);
+CREATE INDEX idx_HealthMetrics_UserID_RecordedAt ON HealthMetrics (UserID, RecordedAt);
+-- Hypertensive readings (systolic >= 140 OR diastolic >= 90, either one is
+-- enough) by date: a partial index the window seeks into directly
+CREATE INDEX idx_HealthMetrics_Hypertensive_RecordedAt ON HealthMetrics (RecordedAt)
+WHERE SystolicBP >= 140 OR DiastolicBP >= 90;
 CREATE INDEX idx_HealthMetrics_Weight ON HealthMetrics (Weight);
 CREATE INDEX idx_HealthMetrics_WaistCircumference ON HealthMetrics (WaistCircumference);
 CREATE INDEX idx_HealthMetrics_HipCircumference ON HealthMetrics (HipCircumference);
 CREATE INDEX idx_HealthMetrics_BodyFatPercentage ON HealthMetrics (BodyFatPercentage);
 
+-- Fill SystolicBP/DiastolicBP for writers that only set the "120/80" text;
+-- only <digits>/<digits> readings are split ("12a/8b" and "1/2/3" are not).
+-- migrate_blood_pressure.py installs these two triggers from this file.
+CREATE TRIGGER trg_HealthMetrics_BloodPressure_Insert
+AFTER INSERT ON HealthMetrics
+WHEN NEW.SystolicBP IS NULL AND NEW.BloodPressure GLOB '[0-9]*/[0-9]*'
+  AND NEW.BloodPressure NOT GLOB '*[^0-9/]*' AND NEW.BloodPressure NOT GLOB '*/*/*'
+BEGIN
+    UPDATE HealthMetrics
+    SET SystolicBP = CAST(substr(NEW.BloodPressure, 1, instr(NEW.BloodPressure, '/') - 1) AS INTEGER),
+        DiastolicBP = CAST(substr(NEW.BloodPressure, instr(NEW.BloodPressure, '/') + 1) AS INTEGER)
+    WHERE MetricID = NEW.MetricID;
+END;
+
+-- Re-split when the text changes and the writer left the integers alone;
+-- an unparseable reading clears them rather than keeping the old values
+CREATE TRIGGER trg_HealthMetrics_BloodPressure_Update
+AFTER UPDATE OF BloodPressure ON HealthMetrics
+WHEN NEW.BloodPressure IS NOT OLD.BloodPressure
+  AND NEW.SystolicBP IS OLD.SystolicBP AND NEW.DiastolicBP IS OLD.DiastolicBP
+BEGIN
+    UPDATE HealthMetrics
+    SET SystolicBP = CASE WHEN NEW.BloodPressure GLOB '[0-9]*/[0-9]*'
+                               AND NEW.BloodPressure NOT GLOB '*[^0-9/]*' AND NEW.BloodPressure NOT GLOB '*/*/*'
+                          THEN CAST(substr(NEW.BloodPressure, 1, instr(NEW.BloodPressure, '/') - 1) AS INTEGER) END,
+        DiastolicBP = CASE WHEN NEW.BloodPressure GLOB '[0-9]*/[0-9]*'
+                                AND NEW.BloodPressure NOT GLOB '*[^0-9/]*' AND NEW.BloodPressure NOT GLOB '*/*/*'
+                           THEN CAST(substr(NEW.BloodPressure, instr(NEW.BloodPressure, '/') + 1) AS INTEGER) END
+    WHERE MetricID = NEW.MetricID;
+END;
+
 -- Indexing for NutritionLogs table
-CREATE INDEX idx_NutritionLogs_UserID ON NutritionLogs (UserID);
+CREATE INDEX idx_NutritionLogs_UserID_MealTime ON NutritionLogs (UserID, MealTime);
 CREATE INDEX idx_NutritionLogs_MealName ON NutritionLogs (MealName);
 CREATE INDEX idx_NutritionLogs_MealTime ON NutritionLogs (MealTime);
 
 -- Indexing for SleepData table
-CREATE INDEX idx_SleepData_UserID ON SleepData (UserID);
+CREATE INDEX idx_SleepData_UserID_SleepStartTime ON SleepData (UserID, SleepStartTime);
 CREATE INDEX idx_SleepData_SleepStartTime ON SleepData (SleepStartTime);
 CREATE INDEX idx_SleepData_SleepEndTime ON SleepData (SleepEndTime);
 
@@ -0,0 +1,105 @@
+import argparse
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+from operator import itemgetter
+
+import bulk_load
+import query_catalog
+import synthetic_data
+
+# UserIDs loaded into temp.BatchUsers per statement execution
+DEFAULT_BATCH_USERS = 10000
+
+
+def _ensure_batch_table(conn):
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {query_catalog.BATCH_USERS} (UserID INTEGER PRIMARY KEY)")
+
+
+# Run a query_catalog.CatalogQuery for many users with one statement per
+# `batch_size` users. Yields (user_id, rows) for every user in ascending
+# UserID order, rows being exactly what the per-user statement returns, so
+# results stream back as each user's rows arrive. Opens and commits its own
+# transaction for the temp table unless the caller already holds one.
+def run_batch(conn, query, user_ids, batch_size=DEFAULT_BATCH_USERS):
+    _ensure_batch_table(conn)
+    own_transaction = not conn.in_transaction
+    empty = conn.execute(query.sql, (None,) * query.placeholders).fetchall() if query.kind == "aggregate" else []
+    end = -1 if query.kind == "ranked" else None
+    users = sorted(set(user_ids))
+    for start in range(0, len(users), batch_size):
+        chunk = users[start:start + batch_size]
+        conn.execute(f"DELETE FROM temp.{query_catalog.BATCH_USERS}")
+        conn.executemany(f"INSERT INTO temp.{query_catalog.BATCH_USERS} VALUES (?)", ((u,) for u in chunk))
+        groups = itertools.groupby(conn.execute(query.batch_sql), key=itemgetter(0))
+        current = next(groups, None)
+        for user_id in chunk:
+            if current is not None and current[0] == user_id:
+                rows = [row[1:end] for row in current[1]]
+                current = next(groups, None)
+            else:
+                rows = list(empty)
+            yield user_id, rows
+        if own_transaction:
+            conn.commit()
+
+
+# The same results from one per-user statement per user
+def run_per_user(conn, query, user_ids):
+    for user_id in sorted(set(user_ids)):
+        yield user_id, conn.execute(query.sql, (user_id,) * query.placeholders).fetchall()
+
+
+# Seconds to compute each named query for every user, per-user loop vs
+# set-based
+def compare(conn, names, user_ids, batch_size=DEFAULT_BATCH_USERS):
+    queries = query_catalog.batch_queries(epoch=query_catalog.stores_epoch(conn))
+    results = []
+    for name in names:
+        query = queries[name]
+        timings = {}
+        for mode, run in (("per_user", lambda: run_per_user(conn, query, user_ids)),
+                          ("batch", lambda: run_batch(conn, query, user_ids, batch_size))):
+            start = time.perf_counter()
+            rows = sum(len(user_rows) for _, user_rows in run())
+            timings[mode] = time.perf_counter() - start
+        results.append({"name": name, "kind": query.kind, "rows": rows, **timings})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-user loops vs set-based execution of the query catalog")
+    parser.add_argument("--db", help="database to read (default: generate one with --users)")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_USERS)
+    parser.add_argument("--query", action="append",
+                        help="catalog query name (repeatable, default: every queries.sql statement)")
+    args = parser.parse_args(argv)
+
+    names = args.query or [name for name in query_catalog.batch_queries() if name.startswith("queries.sql")]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "batch.db")
+            conn = sqlite3.connect(db_path)
+            bulk_load.ensure_schema(conn)
+            dataset = synthetic_data.SyntheticDataset(args.users / synthetic_data.USERS_PER_SCALE, seed=1)
+            with bulk_load.load_pragmas(conn):
+                for table in synthetic_data.TABLES:
+                    bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+            conn.close()
+        conn = sqlite3.connect(db_path)
+        user_ids = [row[0] for row in conn.execute("SELECT UserID FROM Users ORDER BY UserID LIMIT ?",
+                                                   (args.users,))]
+        print(f"{len(user_ids):,} users, {args.batch_size:,} per batch")
+        print(f"{'query':<24} {'kind':<10} {'rows':>10} {'per-user':>9} {'batch':>8} {'speedup':>8}")
+        for r in compare(conn, names, user_ids, args.batch_size):
+            print(f"{r['name']:<24} {r['kind']:<10} {r['rows']:>10,} {r['per_user']:>8.2f}s {r['batch']:>7.2f}s "
+                  f"{r['per_user'] / r['batch']:>7.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import csv
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import time
+
+# Columns written to CSV result files, in order
+RESULT_FIELDS = (
+    "name", "mode", "iterations", "rows", "mean_ms", "stdev_ms", "min_ms",
+    "p50_ms", "p95_ms", "p99_ms", "max_ms", "throughput_qps",
+)
+
+
+# Nearest-rank percentile of an already sorted list
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return float("nan")
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+# Ask the OS to drop its cached pages for the database file so the next read
+# has to go to disk. Only available where posix_fadvise exists (Linux); on
+# other platforms cold runs still start from an empty SQLite page cache.
+def evict_os_cache(db_path):
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for path in (db_path, db_path + "-wal"):
+        if not os.path.exists(path):
+            continue
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+# Execute a query and fetch every row, returning the row count. Fetching
+# matters: cursor.execute alone only steps to the first result row.
+def run_query(conn, sql, params=()):
+    return len(conn.execute(sql, params).fetchall())
+
+
+def summarize(name, mode, samples_ns, rows):
+    samples = sorted(ns / 1e6 for ns in samples_ns)
+    total_seconds = sum(samples) / 1000
+    return {
+        "name": name,
+        "mode": mode,
+        "iterations": len(samples),
+        "rows": rows,
+        "mean_ms": statistics.fmean(samples),
+        "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "min_ms": samples[0],
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": samples[-1],
+        "throughput_qps": len(samples) / total_seconds if total_seconds > 0 else float("inf"),
+    }
+
+
+# Time one query. In "warm" mode a single connection runs `warmup` untimed
+# executions and then `iterations` timed ones. In "cold" mode every iteration
+# evicts the file from the OS cache and opens a fresh connection, so both the
+# OS and SQLite caches start empty; connecting is not part of the timing.
+def measure(db_path, name, sql, iterations=50, warmup=5, mode="warm", params=()):
+    samples = []
+    rows = 0
+    if mode == "warm":
+        conn = sqlite3.connect(db_path)
+        try:
+            for _ in range(warmup):
+                run_query(conn, sql, params)
+            for _ in range(iterations):
+                start = time.perf_counter_ns()
+                rows = run_query(conn, sql, params)
+                samples.append(time.perf_counter_ns() - start)
+        finally:
+            conn.close()
+    elif mode == "cold":
+        for _ in range(iterations):
+            evict_os_cache(db_path)
+            conn = sqlite3.connect(db_path)
+            try:
+                start = time.perf_counter_ns()
+                rows = run_query(conn, sql, params)
+                samples.append(time.perf_counter_ns() - start)
+            finally:
+                conn.close()
+    else:
+        raise ValueError(f"Unknown benchmark mode: {mode}")
+    return summarize(name, mode, samples, rows)
+
+
+# EXPLAIN QUERY PLAN for every query, joined into one line per query, so a
+# saved run records which indexes each timing was taken with
+def query_plans(db_path, queries):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {
+            name: "; ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+            for name, sql in queries.items()
+        }
+    finally:
+        conn.close()
+
+
+# Run every query in `queries` ({name: sql}) in each mode and return the
+# results along with some metadata about the run
+def run_suite(db_path, queries, iterations=50, warmup=5, modes=("warm",)):
+    results = []
+    plans = query_plans(db_path, queries)
+    for mode in modes:
+        for name, sql in queries.items():
+            result = measure(db_path, name, sql, iterations, warmup, mode)
+            result["plan"] = plans[name]
+            results.append(result)
+    return {
+        "database": os.path.abspath(db_path),
+        "sqlite_version": sqlite3.sqlite_version,
+        "python_version": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "iterations": iterations,
+        "warmup": warmup,
+        "results": results,
+    }
+
+
+def save_results(report, path):
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(report["results"])
+    else:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def load_results(path):
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            results = []
+            for row in csv.DictReader(f):
+                for field in RESULT_FIELDS[2:]:
+                    row[field] = int(row[field]) if field in ("iterations", "rows") else float(row[field])
+                results.append(row)
+        return {"results": results}
+    with open(path) as f:
+        return json.load(f)
+
+
+# Compare a run against a saved baseline. A query regresses when `metric`
+# grew by more than `threshold` (0.10 = 10%). Returns a list of
+# (name, mode, baseline value, current value, relative change) tuples, one per
+# query present in both runs, and the subset that regressed.
+def compare(baseline, current, metric="p50_ms", threshold=0.10):
+    previous = {(r["name"], r["mode"]): r[metric] for r in baseline["results"]}
+    changes = []
+    regressions = []
+    for result in current["results"]:
+        key = (result["name"], result["mode"])
+        if key not in previous:
+            continue
+        before, after = previous[key], result[metric]
+        change = (after - before) / before if before else 0.0
+        entry = (key[0], key[1], before, after, change)
+        changes.append(entry)
+        if change > threshold:
+            regressions.append(entry)
+    return changes, regressions
+
+
+def format_result(result, show_plan=False):
+    line = (
+        f"{result['name']:<28} {result['mode']:<5} rows={result['rows']:<7} "
+        f"p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms p99={result['p99_ms']:.3f}ms "
+        f"({result['throughput_qps']:,.0f} q/s)"
+    )
+    if show_plan and result.get("plan"):
+        line += f"\n    plan: {result['plan']}"
+    return line
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+BASE_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "base.sql")
+
+# Rows per transaction when bulk loading
+DEFAULT_CHUNK_SIZE = 50000
+
+# PRAGMAs applied while a bulk load is running. The rollback journal is kept in
+# memory and fsyncs are skipped, which is fine for seeding a database that can
+# simply be regenerated if the machine crashes half way through.
+DEFAULT_JOURNAL_MODE = "MEMORY"
+DEFAULT_SYNCHRONOUS = "OFF"
+DEFAULT_CACHE_SIZE = -200000  # negative values are KiB, so roughly 200 MB
+
+
+# Create the tables and indexes from base.sql if the database is still empty
+def ensure_schema(conn, schema_path=BASE_SQL):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Users'"
+    ).fetchone()
+    if exists:
+        return False
+    with open(schema_path) as f:
+        conn.executescript(f.read())
+    conn.commit()
+    return True
+
+
+# Temporarily switch the connection to load-time PRAGMAs and restore the
+# previous settings afterwards
+@contextmanager
+def load_pragmas(conn, journal_mode=DEFAULT_JOURNAL_MODE, synchronous=DEFAULT_SYNCHRONOUS,
+                 cache_size=DEFAULT_CACHE_SIZE):
+    previous = {
+        "journal_mode": conn.execute("PRAGMA journal_mode").fetchone()[0],
+        "synchronous": conn.execute("PRAGMA synchronous").fetchone()[0],
+        "cache_size": conn.execute("PRAGMA cache_size").fetchone()[0],
+    }
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute(f"PRAGMA cache_size = {int(cache_size)}")
+    try:
+        yield
+    finally:
+        conn.commit()
+        conn.execute(f"PRAGMA journal_mode = {previous['journal_mode']}")
+        conn.execute(f"PRAGMA synchronous = {previous['synchronous']}")
+        conn.execute(f"PRAGMA cache_size = {previous['cache_size']}")
+
+
+# Return (name, sql) for every idx_* index, optionally limited to some tables
+def secondary_indexes(conn, tables=None):
+    rows = conn.execute(
+        "SELECT name, tbl_name, sql FROM sqlite_master "
+        "WHERE type = 'index' AND name LIKE 'idx\\_%' ESCAPE '\\' AND sql IS NOT NULL "
+        "ORDER BY tbl_name, name"
+    ).fetchall()
+    return [(name, sql) for name, table, sql in rows if tables is None or table in tables]
+
+
+# Drop the idx_* indexes and return their definitions so they can be rebuilt
+def drop_indexes(conn, tables=None):
+    definitions = secondary_indexes(conn, tables)
+    for name, _ in definitions:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    return definitions
+
+
+# Recreate indexes previously returned by drop_indexes
+def rebuild_indexes(conn, definitions):
+    start = time.perf_counter()
+    for _, sql in definitions:
+        conn.execute(sql)
+    conn.commit()
+    return time.perf_counter() - start
+
+
+# Split any iterable of rows into lists of at most `size` rows
+def chunked(rows, size):
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Insert rows with executemany, committing once per chunk. `rows` can be any
+# iterable (usually a generator), so the full table never sits in memory.
+# Returns the number of rows inserted and the elapsed wall time.
+def bulk_insert(conn, table, columns, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    count = 0
+    start = time.perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        try:
+            conn.executemany(sql, chunk)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        count += len(chunk)
+    return count, time.perf_counter() - start
+
+
+def format_rate(label, rows, seconds):
+    rate = rows / seconds if seconds > 0 else float("inf")
+    return f"{label}: {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/s)"
+
+
+# Name of the INTEGER PRIMARY KEY column of a table
+def primary_key(conn, table, schema="main"):
+    for _, name, _, _, _, pk in conn.execute(f"PRAGMA {schema}.table_info({table})"):
+        if pk:
+            return name
+    return "rowid"
+
+
+# Copy every table of each shard file into the connected database with
+# ATTACH + INSERT ... SELECT, in primary-key order. Shards must hold disjoint
+# key ranges and be given in key order, so rows are appended to the end of
+# each table's B-tree. Returns {table: (rows, seconds)}.
+def merge_shards(conn, shard_paths, tables):
+    stats = {table: [0, 0.0] for table in tables}
+    conn.commit()
+    for path in shard_paths:
+        conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        try:
+            for table in tables:
+                start = time.perf_counter()
+                pk = primary_key(conn, table, "shard")
+                cursor = conn.execute(f"INSERT INTO main.{table} SELECT * FROM shard.{table} ORDER BY {pk}")
+                conn.commit()
+                stats[table][0] += cursor.rowcount
+                stats[table][1] += time.perf_counter() - start
+        finally:
+            conn.execute("DETACH DATABASE shard")
+    return {table: tuple(values) for table, values in stats.items()}
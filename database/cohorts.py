@@ -0,0 +1,363 @@
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import bulk_load
+import export
+
+DEFAULT_CHUNK_ROWS = 100000
+DEFAULT_AGE_WIDTH = 10
+
+# Columns pulled into a snapshot, per table, and how each is stored:
+#   "id"  - int64, NULL as -1
+#   "num" - float64, NULL as nan
+#   "cat" - int32 codes into a sorted label list (NULL sorts first, as in SQL)
+SNAPSHOT_COLUMNS = {
+    "Users": {"UserID": "id", "Age": "num", "Gender": "cat", "Weight": "num", "Height": "num"},
+    "ExerciseLogs": {"UserID": "id", "ExerciseType": "cat", "Intensity": "cat", "DurationMinutes": "num",
+                     "CaloriesBurned": "num", "HeartRate": "num"},
+    "SleepData": {"UserID": "id", "SleepDurationMinutes": "num", "SleepQualityRating": "num"},
+    "HealthMetrics": {"UserID": "id", "Weight": "num", "BodyFatPercentage": "num", "StepCount": "num",
+                      "SystolicBP": "num", "DiastolicBP": "num"},
+}
+
+
+# (row count, max primary key) of a table: a snapshot is reused while this
+# is unchanged. Inserts and deletes change it; in-place UPDATEs do not.
+def signature(conn, table):
+    key = export.page_key(conn, table)
+    return tuple(conn.execute(f"SELECT COUNT(*), MAX({key}) FROM {table}").fetchone())
+
+
+def _sort_labels(codes, labels):
+    order = sorted(range(len(labels)), key=lambda i: (labels[i] is not None, labels[i] or ""))
+    remap = np.empty(len(labels), dtype=np.int32)
+    remap[order] = np.arange(len(labels), dtype=np.int32)
+    return remap[codes] if len(labels) else codes, [labels[i] for i in order]
+
+
+# One table's columns as NumPy arrays, plus the labels of its "cat" columns
+class Snapshot:
+    def __init__(self, table, signature, arrays, labels):
+        self.table = table
+        self.signature = tuple(signature)
+        self.arrays = arrays
+        self.labels = labels
+
+    def __getitem__(self, column):
+        return self.arrays[column]
+
+    def __len__(self):
+        return len(next(iter(self.arrays.values()))) if self.arrays else 0
+
+    def save(self, path):
+        np.savez(path, _signature=np.array(self.signature, dtype=np.int64),
+                 _labels=np.array(json.dumps(self.labels)), **self.arrays)
+
+    @classmethod
+    def load(cls, table, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files if not name.startswith("_")}
+            return cls(table, data["_signature"].tolist(), arrays, json.loads(str(data["_labels"])))
+
+
+# Pull `columns` ({name: kind}) of a table in primary-key order,
+# `chunk_rows` rows per query, converting each chunk to arrays as it arrives
+def pull(conn, table, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, sig=None):
+    columns = columns or SNAPSHOT_COLUMNS[table]
+    names = list(columns)
+    sig = sig or signature(conn, table)
+    parts = {name: [] for name in names}
+    codes = {name: {} for name in names if columns[name] == "cat"}
+    for _, rows in export.pages(conn, table, names, batch_size=chunk_rows):
+        for name, values in zip(names, zip(*rows)):
+            kind = columns[name]
+            if kind == "cat":
+                lookup = codes[name]
+                parts[name].append(np.fromiter((lookup.setdefault(v, len(lookup)) for v in values), np.int32,
+                                               len(values)))
+            else:
+                array = np.array(values, dtype=np.float64)
+                if kind == "id":
+                    array = np.where(np.isnan(array), -1, array).astype(np.int64)
+                parts[name].append(array)
+    arrays, labels = {}, {}
+    for name in names:
+        dtype = {"id": np.int64, "num": np.float64, "cat": np.int32}[columns[name]]
+        arrays[name] = np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype)
+        if name in codes:
+            arrays[name], labels[name] = _sort_labels(arrays[name], list(codes[name]))
+    return Snapshot(table, sig, arrays, labels)
+
+
+# Snapshots of one database, pulled on first use and reused until the
+# table's signature() changes. With `cache_dir` they are also kept as .npz
+# files, so a later process skips the pull when nothing changed.
+class ColumnStore:
+    def __init__(self, conn, cache_dir=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.conn = conn
+        self.cache_dir = cache_dir
+        self.chunk_rows = chunk_rows
+        self._snapshots = {}
+        self.hits = 0
+        self.misses = 0
+
+    def table(self, table, columns=None):
+        columns = columns or SNAPSHOT_COLUMNS[table]
+        key = (table, tuple(columns.items()))
+        sig = signature(self.conn, table)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and snapshot.signature == sig:
+            self.hits += 1
+            return snapshot
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f"{table}.npz")
+            if os.path.exists(path):
+                snapshot = Snapshot.load(table, path)
+                if snapshot.signature == sig and list(snapshot.arrays) == list(columns):
+                    self._snapshots[key] = snapshot
+                    self.hits += 1
+                    return snapshot
+        self.misses += 1
+        snapshot = self._snapshots[key] = pull(self.conn, table, columns, self.chunk_rows, sig)
+        if path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            snapshot.save(path)
+        return snapshot
+
+
+# Row index in `right_ids` for every value of `left_ids` (-1 when absent):
+# a vectorized equi-join on an ID column
+def lookup(left_ids, right_ids):
+    order = np.argsort(right_ids, kind="stable")
+    ordered = right_ids[order]
+    pos = np.clip(np.searchsorted(ordered, left_ids), 0, max(len(ordered) - 1, 0))
+    if not len(ordered):
+        return np.full(len(left_ids), -1)
+    return np.where(ordered[pos] == left_ids, order[pos], -1)
+
+
+# Numbers as categories of `width` (bucket label = lower bound, NULL = None):
+# returns (codes, labels) like a "cat" column
+def buckets(values, width):
+    lower = np.floor(values / width) * width
+    missing = np.isnan(lower)
+    bounds, codes = np.unique(lower[~missing], return_inverse=True)
+    out = np.zeros(len(values), dtype=np.int32)
+    out[~missing] = codes + 1
+    return out, [None] + [int(b) if b == int(b) else float(b) for b in bounds]
+
+
+# GROUP BY over categorical keys. `keys` is a list of (codes, label count)
+# pairs; NaN values are skipped the way SQL aggregates skip NULL. Returns
+# arrays over the non-empty groups, in key order: "group" (a flat index,
+# see group_labels), "rows" (COUNT(*)), "count", "sum" and "mean". With
+# `percentiles` also "min", "max" and one "p<q>" each (linear
+# interpolation, as numpy.percentile), from one sort of the values.
+def group_by(keys, values, percentiles=()):
+    dims = tuple(max(n, 1) for _, n in keys)
+    group = np.ravel_multi_index([codes for codes, _ in keys], dims) if keys else np.zeros(len(values), np.int64)
+    size = int(np.prod(dims))
+    rows = np.bincount(group, minlength=size)
+    valid = ~np.isnan(values)
+    g, v = group[valid], values[valid]
+    count = np.bincount(g, minlength=size)
+    total = np.bincount(g, weights=v, minlength=size)
+    present = np.flatnonzero(rows)
+    count, total = count[present], total[present]
+    has = count > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = {"group": present, "rows": rows[present], "count": count,
+                  "sum": np.where(has, total, np.nan), "mean": np.where(has, total / count, np.nan)}
+    if not percentiles:
+        return result
+
+    # Sort values within groups once; min, max and percentiles are then
+    # positions inside each group's run
+    ordered = v[np.lexsort((v, g))] if len(v) else v
+    starts = (np.cumsum(count) - count)
+    last = np.maximum(count - 1, 0)
+
+    def at(position):
+        if not len(ordered):
+            return np.full(len(present), np.nan)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        lo = ordered[np.minimum(starts + low, len(ordered) - 1)]
+        hi = ordered[np.minimum(starts + high, len(ordered) - 1)]
+        return np.where(has, lo + (hi - lo) * (position - low), np.nan)
+
+    result["min"] = at(np.zeros(len(present)))
+    result["max"] = at(last.astype(np.float64))
+    for q in percentiles:
+        result[f"p{q:g}"] = at(last * (q / 100))
+    return result
+
+
+# Label tuples for the flat group indexes of group_by
+def group_labels(groups, key_labels):
+    dims = tuple(max(len(labels), 1) for labels in key_labels)
+    indexes = np.unravel_index(groups, dims)
+    return [tuple(labels[i] for labels, i in zip(key_labels, row)) for row in zip(*(ix.tolist() for ix in indexes))]
+
+
+def _ranks(values):
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    return (np.cumsum(counts) - (counts - 1) / 2)[inverse]
+
+
+# Pearson or Spearman (average ranks for ties) correlation over the pairs
+# where both values are present; (coefficient, pairs)
+def correlation(x, y, method="pearson"):
+    both = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[both], y[both]
+    if len(x) < 2:
+        return float("nan"), len(x)
+    if method == "spearman":
+        x, y = _ranks(x), _ranks(y)
+    elif method != "pearson":
+        raise ValueError(f"Unknown correlation method: {method}")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return float(np.corrcoef(x, y)[0, 1]), len(x)
+
+
+# Mean of `values` per user, aligned with users["UserID"] (nan for users
+# without values)
+def per_user_mean(users, user_ids, values):
+    index = lookup(user_ids, users["UserID"])
+    known = index >= 0
+    result = group_by([(index[known], len(users))], values[known])
+    means = np.full(len(users), np.nan)
+    means[result["group"]] = result["mean"]
+    return means
+
+
+# Calories burned by age bucket, gender and exercise type. Rows of
+# (AgeBucket, Gender, ExerciseType, Sessions, AvgCalories, P50, P90) in key
+# order; logs of unknown users are left out, as in an inner join.
+def calories_by_cohort(store, age_width=DEFAULT_AGE_WIDTH, percentiles=(50, 90)):
+    users = store.table("Users")
+    logs = store.table("ExerciseLogs")
+    index = lookup(logs["UserID"], users["UserID"])
+    known = index >= 0
+    index = index[known]
+    ages, age_labels = buckets(users["Age"][index], age_width)
+    keys = [(ages, len(age_labels)),
+            (users["Gender"][index], len(users.labels["Gender"])),
+            (logs["ExerciseType"][known], len(logs.labels["ExerciseType"]))]
+    result = group_by(keys, logs["CaloriesBurned"][known], percentiles)
+    labels = group_labels(result["group"], [age_labels, users.labels["Gender"], logs.labels["ExerciseType"]])
+    columns = [result["rows"].tolist(), result["mean"].tolist()] + [result[f"p{q:g}"].tolist() for q in percentiles]
+    return [label + tuple(values) for label, values in zip(labels, zip(*columns))]
+
+
+# Per-user average sleep quality against per-user average step count
+def sleep_vs_steps(store):
+    users = store.table("Users")
+    sleep = store.table("SleepData")
+    metrics = store.table("HealthMetrics")
+    quality = per_user_mean(users, sleep["UserID"], sleep["SleepQualityRating"])
+    steps = per_user_mean(users, metrics["UserID"], metrics["StepCount"])
+    pearson, pairs = correlation(quality, steps)
+    spearman, _ = correlation(quality, steps, "spearman")
+    return {"users": pairs, "pearson": pearson, "spearman": spearman}
+
+
+# The SQLite GROUP BY equivalents of the two reports (per-user averages for
+# the correlation), used by the benchmark
+CALORIES_SQL = """
+SELECT (U.Age / {width}) * {width} AS AgeBucket, U.Gender, E.ExerciseType, COUNT(*), AVG(E.CaloriesBurned)
+FROM ExerciseLogs E JOIN Users U ON U.UserID = E.UserID
+GROUP BY AgeBucket, U.Gender, E.ExerciseType
+ORDER BY AgeBucket, U.Gender, E.ExerciseType
+"""
+
+SLEEP_STEPS_SQL = """
+SELECT S.Quality, H.Steps
+FROM (SELECT UserID, AVG(SleepQualityRating) AS Quality FROM SleepData GROUP BY UserID) S
+JOIN (SELECT UserID, AVG(StepCount) AS Steps FROM HealthMetrics GROUP BY UserID) H ON H.UserID = S.UserID
+"""
+
+
+# Both reports three ways on the same database: SQLite GROUP BY, NumPy
+# including the pull (cold), and NumPy on the cached snapshots (warm)
+def compare(db_path, iterations=3, age_width=DEFAULT_AGE_WIDTH):
+    conn = sqlite3.connect(db_path)
+    try:
+        def best(fn):
+            times = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - start)
+            return min(times)
+
+        def sql():
+            conn.execute(CALORIES_SQL.format(width=age_width)).fetchall()
+            pairs = conn.execute(SLEEP_STEPS_SQL).fetchall()
+            correlation(*(np.array(column, dtype=np.float64) for column in zip(*pairs)))
+
+        def numpy_reports(store):
+            calories_by_cohort(store, age_width)
+            sleep_vs_steps(store)
+
+        store = ColumnStore(conn)
+        results = {"sql": best(sql), "numpy_cold": best(lambda: numpy_reports(ColumnStore(conn)))}
+        numpy_reports(store)
+        results["numpy_warm"] = best(lambda: numpy_reports(store))
+        results["rows"] = {table: signature(conn, table)[0] for table in SNAPSHOT_COLUMNS}
+        return results
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cohort reports over columnar NumPy snapshots")
+    parser.add_argument("command", choices=("report", "bench"))
+    parser.add_argument("--db", help="database (bench default: generate one with --scale-factor)")
+    parser.add_argument("--cache-dir", help="keep snapshots here as .npz between runs")
+    parser.add_argument("--age-width", type=int, default=DEFAULT_AGE_WIDTH)
+    parser.add_argument("--scale-factor", type=float, default=300)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        conn = sqlite3.connect(args.db or "health_fitness_app.db")
+        store = ColumnStore(conn, args.cache_dir)
+        print(f"{'age':>5} {'gender':<8} {'exercise':<18} {'sessions':>9} {'avg kcal':>9} {'p50':>8} {'p90':>8}")
+        for age, gender, kind, sessions, mean, p50, p90 in calories_by_cohort(store, args.age_width):
+            print(f"{age if age is not None else '-':>5} {gender or '-':<8} {kind or '-':<18} {sessions:>9,} "
+                  f"{mean:>9.1f} {p50:>8.1f} {p90:>8.1f}")
+        r = sleep_vs_steps(store)
+        print(f"sleep quality vs step count over {r['users']:,} users: "
+              f"pearson {r['pearson']:.3f}, spearman {r['spearman']:.3f}")
+        conn.close()
+        return
+
+    import synthetic_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "cohorts.db")
+            conn = sqlite3.connect(db_path)
+            bulk_load.ensure_schema(conn)
+            dataset = synthetic_data.SyntheticDataset(args.scale_factor, seed=1)
+            with bulk_load.load_pragmas(conn):
+                for table in SNAPSHOT_COLUMNS:
+                    bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+            conn.close()
+        r = compare(db_path, args.iterations, args.age_width)
+    print(", ".join(f"{table} {rows:,}" for table, rows in r["rows"].items()))
+    for name in ("sql", "numpy_cold", "numpy_warm"):
+        print(f"{name:<11} {r[name]:8.3f} s  {r['sql'] / r[name]:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import benchmark
+import query_catalog
+from dal import GroupCommitWriter, apply_pragma_profile, connect
+
+MODES = ("rollback", "wal", "wal-group")
+
+_INSERT_SQL = ("INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes, Intensity, DateTime) "
+               "VALUES (?, 'Running', 30, 'Moderate', '2023-12-31 12:00:00')")
+
+
+class _Counter:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def record(self, start):
+        elapsed = time.perf_counter_ns() - start
+        with self.lock:
+            self.latencies.append(elapsed)
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+
+def _reader(path, stop, counter, max_user, seed):
+    conn = connect(path)
+    queries = list(query_catalog.user_queries(epoch=query_catalog.stores_epoch(conn)).values())
+    rng = random.Random(seed)
+    while not stop.is_set():
+        sql, placeholders = rng.choice(queries)
+        start = time.perf_counter_ns()
+        try:
+            conn.execute(sql, (rng.randint(1, max_user),) * placeholders).fetchall()
+            counter.record(start)
+        except sqlite3.OperationalError:
+            counter.error()
+    conn.close()
+
+
+# One transaction per insert, like transaction.py
+def _writer(path, stop, counter, max_user, seed, synchronous):
+    rng = random.Random(seed)
+    conn = connect(path)
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    while not stop.is_set():
+        start = time.perf_counter_ns()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(_INSERT_SQL, (rng.randint(1, max_user),))
+            conn.execute("COMMIT")
+            counter.record(start)
+        except sqlite3.OperationalError:
+            if conn.in_transaction:
+                conn.rollback()
+            counter.error()
+    conn.close()
+
+
+# Producers handing inserts to the shared group-commit writer and waiting for
+# their own result
+def _group_producer(writer, stop, counter, max_user, seed):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        start = time.perf_counter_ns()
+        try:
+            writer.execute(_INSERT_SQL, (rng.randint(1, max_user),))
+            counter.record(start)
+        except sqlite3.Error:
+            counter.error()
+
+
+# Run `readers` query threads and `writers` insert threads against a copy of
+# `db_path` in the given mode for `seconds`
+def run_mode(db_path, mode, readers=4, writers=4, seconds=5.0, synchronous=None, max_delay=0.0):
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}")
+    profile = "rollback" if mode == "rollback" else "wal"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        source, copy = sqlite3.connect(db_path), sqlite3.connect(path)
+        source.backup(copy)
+        source.close()
+        apply_pragma_profile(copy, profile, synchronous)
+        sync_level = copy.execute("PRAGMA synchronous").fetchone()[0]
+        max_user = copy.execute("SELECT MAX(UserID) FROM Users").fetchone()[0] or 1
+        copy.close()
+
+        stop = threading.Event()
+        reads, writes = _Counter(), _Counter()
+        group = None
+        threads = [threading.Thread(target=_reader, args=(path, stop, reads, max_user, i)) for i in range(readers)]
+        if mode == "wal-group":
+            group = GroupCommitWriter(path, max_delay=max_delay, synchronous=synchronous or "NORMAL")
+            threads += [threading.Thread(target=_group_producer, args=(group, stop, writes, max_user, 100 + i))
+                        for i in range(writers)]
+        else:
+            level = synchronous or ("FULL" if profile == "rollback" else "NORMAL")
+            threads += [threading.Thread(target=_writer, args=(path, stop, writes, max_user, 100 + i, level))
+                        for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if group is not None:
+            group.close()
+
+    result = {"mode": mode, "synchronous": sync_level, "seconds": seconds}
+    for name, counter in (("reads", reads), ("writes", writes)):
+        latencies = sorted(counter.latencies)
+        result[f"{name}_per_s"] = len(latencies) / seconds
+        result[f"{name}_p99_ms"] = benchmark.percentile(latencies, 99) / 1e6
+        result[f"{name}_errors"] = counter.errors
+    if group is not None:
+        result["avg_batch"] = group.requests / group.batches if group.batches else 0.0
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mixed read/write throughput: rollback journal vs WAL vs group commit")
+    parser.add_argument("--db", default="health_fitness_app.db", help="source database (each mode runs on a copy)")
+    parser.add_argument("--mode", choices=MODES, action="append", help="mode to run (repeatable, default: all)")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--synchronous", choices=("OFF", "NORMAL", "FULL"), default=None,
+                        help="override the profile's synchronous level")
+    parser.add_argument("--max-delay", type=float, default=0.0, help="group-commit linger in seconds")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"{'mode':<10} {'reads/s':>9} {'read p99':>9} {'writes/s':>9} {'write p99':>10} {'busy':>5} {'batch':>6}")
+    for mode in args.mode or MODES:
+        r = run_mode(args.db, mode, args.readers, args.writers, args.seconds, args.synchronous, args.max_delay)
+        batch = f"{r['avg_batch']:6.1f}" if "avg_batch" in r else ""
+        print(f"{mode:<10} {r['reads_per_s']:>9,.0f} {r['reads_p99_ms']:>8.2f}ms {r['writes_per_s']:>9,.0f} "
+              f"{r['writes_p99_ms']:>8.2f}ms {r['reads_errors'] + r['writes_errors']:>5} {batch}")
+
+
+if __name__ == "__main__":
+    main()
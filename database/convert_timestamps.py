@@ -0,0 +1,106 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import bulk_load
+import timeutil
+
+EPOCH_VIEWS_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "epoch_views.sql")
+READABLE_VIEWS = ("ExerciseLogsReadable", "HealthMetricsReadable", "NutritionLogsReadable", "SleepDataReadable")
+
+# Rows updated per transaction
+DEFAULT_BATCH_SIZE = 50000
+
+# Text values that carry a full date; time-only values such as the old
+# 'HH:MM:SS' sleep times cannot be placed on a date and are left alone
+_DATED_TEXT = "typeof({col}) = 'text' AND {col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+
+
+# The table that actually stores the rows (the encoded layout from
+# encode_categoricals.py keeps them in <Table>Encoded behind a view)
+def storage_table(conn, table):
+    encoded = table + "Encoded"
+    found = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (encoded,)).fetchone()
+    return encoded if found else table
+
+
+# SET expression and WHERE guard converting one column to `target`
+def _conversion(column, target):
+    if target == "epoch":
+        guard = _DATED_TEXT.format(col=column) + f" AND unixepoch({column}) IS NOT NULL"
+        return f"{column} = unixepoch({column})", guard
+    return f"{column} = datetime({column}, 'unixepoch')", f"typeof({column}) = 'integer'"
+
+
+# Text values per column without a date, which neither direction converts
+def undated(conn):
+    counts = {}
+    for table, columns in timeutil.TEMPORAL_COLUMNS.items():
+        stored = storage_table(conn, table)
+        for column in columns:
+            condition = f"typeof({column}) = 'text' AND NOT ({_DATED_TEXT.format(col=column)})"
+            counts[f"{table}.{column}"] = conn.execute(
+                f"SELECT COUNT(*) FROM {stored} WHERE {condition}"
+            ).fetchone()[0]
+    return counts
+
+
+# Convert every temporal column in place, `batch_size` primary keys per
+# transaction so a large database never holds one huge write transaction.
+# target is "epoch" (integer seconds, UTC) or "text" ('YYYY-MM-DD HH:MM:SS').
+# Returns {"Table.Column": rows converted}.
+def convert(conn, target="epoch", batch_size=DEFAULT_BATCH_SIZE):
+    if target not in ("epoch", "text"):
+        raise ValueError(f"Unknown timestamp format: {target}")
+    converted = {}
+    for table, columns in timeutil.TEMPORAL_COLUMNS.items():
+        stored = storage_table(conn, table)
+        pk = bulk_load.primary_key(conn, stored)
+        low, high = conn.execute(f"SELECT MIN({pk}), MAX({pk}) FROM {stored}").fetchone()
+        for column in columns:
+            assignment, guard = _conversion(column, target)
+            total = 0
+            if low is not None:
+                for start in range(low, high + 1, batch_size):
+                    cur = conn.execute(
+                        f"UPDATE {stored} SET {assignment} WHERE {pk} >= ? AND {pk} < ? AND {guard}",
+                        (start, start + batch_size),
+                    )
+                    total += cur.rowcount
+                    conn.commit()
+            converted[f"{table}.{column}"] = total
+
+    if target == "epoch":
+        with open(EPOCH_VIEWS_SQL) as f:
+            conn.executescript(f.read())
+    else:
+        for view in READABLE_VIEWS:
+            conn.execute(f"DROP VIEW IF EXISTS {view}")
+    conn.execute("ANALYZE")
+    conn.commit()
+    return converted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert DATETIME columns between text and integer epoch seconds")
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--to", choices=("epoch", "text"), default="epoch")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    start = time.perf_counter()
+    converted = convert(conn, args.to, args.batch_size)
+    seconds = time.perf_counter() - start
+    for name, rows in converted.items():
+        print(f"{name}: converted {rows:,} rows")
+    for name, rows in undated(conn).items():
+        if rows:
+            print(f"{name}: left {rows:,} values without a date unchanged")
+    print(f"Done in {seconds:.2f}s")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
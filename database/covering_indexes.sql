@@ -0,0 +1,22 @@
+-- Covering variants of the per-user time-range indexes for read-heavy nodes.
+-- Each one extends the (UserID, <time>) index from base.sql with the columns
+-- the dashboard queries project, so those queries are answered from the index
+-- alone without visiting the table. They replace the narrower composites,
+-- which are a prefix of them.
+
+-- ExerciseLogs: queries 1, 8, 10 and 14 and the exercise time windows
+DROP INDEX IF EXISTS idx_ExerciseLogs_UserID_DateTime;
+CREATE INDEX IF NOT EXISTS idx_ExerciseLogs_UserID_DateTime_Covering
+    ON ExerciseLogs (UserID, DateTime, ExerciseType, DurationMinutes, CaloriesBurned);
+
+-- NutritionLogs: query 5 and the meal time windows
+DROP INDEX IF EXISTS idx_NutritionLogs_UserID_MealTime;
+CREATE INDEX IF NOT EXISTS idx_NutritionLogs_UserID_MealTime_Covering
+    ON NutritionLogs (UserID, MealTime, MealName, FoodItems);
+
+-- SleepData: queries 6, 12 and 13 and the sleep time windows
+DROP INDEX IF EXISTS idx_SleepData_UserID_SleepStartTime;
+CREATE INDEX IF NOT EXISTS idx_SleepData_UserID_SleepStartTime_Covering
+    ON SleepData (UserID, SleepStartTime, SleepEndTime, SleepDurationMinutes, SleepQualityRating);
+
+ANALYZE;
@@ -0,0 +1,12 @@
+from .aio import AsyncDatabase
+from .cache import QueryCache
+from .database import Database
+from .group_commit import GroupCommitWriter
+from .pool import DEFAULT_PRAGMAS, ConnectionPool, PoolTimeout, connect
+from .profile import UserProfile, fetch_profile, profile_lines
+from .repositories import (ExerciseLogsRepository, GoalsRepository, HealthMetricsRepository,
+                           NutritionLogsRepository, Repository, SleepDataRepository, UserOwnedRepository,
+                           UserPreferencesRepository, UsersRepository)
+from .rows import ExerciseLog, Goal, HealthMetric, NutritionLog, SleepSession, User, UserPreference
+from .shards import ShardedDatabase, create_shards, jump_hash, shard_of
+from .wal import JOURNAL_PROFILES, apply_pragma_profile, checkpoint, wal_size
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .database import Database
+from .pool import DEFAULT_CACHED_STATEMENTS, DEFAULT_PRAGMAS
+
+DEFAULT_READERS = 4
+DEFAULT_MAX_PENDING = 64
+
+
+# asyncio facade that keeps blocking sqlite3 calls off the event loop.
+#
+# Reads run on `readers` executor threads, each with its own connection from a
+# reader pool; sqlite3 releases the GIL while a statement runs, so they
+# proceed in parallel. Writes are serialized on one writer thread that owns the
+# only writing connection, so they never contend for the database lock.
+#
+# Backpressure: at most `max_pending` requests are queued or running on the
+# executors; further callers wait on a semaphore instead of growing the
+# executor queues.
+# Cancellation: a cancelled request that has not started is dropped; a running
+# read is stopped with Connection.interrupt(); a running write is allowed to
+# finish (so its transaction is never left half-applied) and its result is
+# discarded.
+class AsyncDatabase:
+    def __init__(self, path="health_fitness_app.db", readers=DEFAULT_READERS, max_pending=DEFAULT_MAX_PENDING,
+                 cached_statements=DEFAULT_CACHED_STATEMENTS, pragmas=DEFAULT_PRAGMAS):
+        self.path = path
+        self.readers = Database(path, readers, cached_statements, pragmas)
+        self.writer = Database(path, 1, cached_statements, pragmas)
+        self._read_executor = ThreadPoolExecutor(readers, thread_name_prefix="sqlite-reader")
+        self._write_executor = ThreadPoolExecutor(1, thread_name_prefix="sqlite-writer")
+        self._pending = asyncio.Semaphore(max_pending)
+
+    # The semaphore slot is released when the executor job itself is done,
+    # not when the awaiting task is: a cancelled write that keeps running
+    # still counts against max_pending until it finishes
+    async def _submit(self, executor, job, on_cancel=None):
+        loop = asyncio.get_running_loop()
+        await self._pending.acquire()
+        try:
+            work = executor.submit(job)
+        except BaseException:
+            self._pending.release()
+            raise
+        work.add_done_callback(lambda _: self._release(loop))
+        try:
+            return await asyncio.wrap_future(work, loop=loop)
+        except asyncio.CancelledError:
+            if on_cancel:
+                on_cancel()
+            raise
+
+    # Done callbacks run on the executor thread; the semaphore belongs to the loop
+    def _release(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._pending.release)
+        except RuntimeError:
+            # The loop is already closed, and the semaphore with it
+            pass
+
+    # Run fn(conn, *args) on a reader thread with a reader connection
+    async def read(self, fn, *args):
+        running = {}
+        lock = threading.Lock()
+
+        def job():
+            with self.readers.pool.connection() as conn:
+                with lock:
+                    if running.get("cancelled"):
+                        return None
+                    running["conn"] = conn
+                try:
+                    return fn(conn, *args)
+                finally:
+                    with lock:
+                        running.pop("conn", None)
+
+        def interrupt():
+            with lock:
+                running["cancelled"] = True
+                if "conn" in running:
+                    running["conn"].interrupt()
+
+        return await self._submit(self._read_executor, job, interrupt)
+
+    async def fetchall(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    # Run one of the per-user statements from queries.sql (by its number)
+    async def user_query(self, number, user_id):
+        def run(conn):
+            sql, placeholders, _ = self.readers.user_query_sql(number, conn)
+            return conn.execute(sql, (user_id,) * placeholders).fetchall()
+
+        return await self.read(run)
+
+    # Run fn(writer Database, *args) on the writer thread. fn opens its own
+    # transaction, e.g. with db.transaction() or a repository write method.
+    async def write(self, fn, *args):
+        return await self._submit(self._write_executor, lambda: fn(self.writer, *args))
+
+    # transaction.insert_user through the writer; returns the new UserID
+    async def insert_user(self, new_user):
+        import transaction
+        return await self.write(transaction.insert_user, new_user)
+
+    async def insert(self, repository, **values):
+        return await self.write(lambda db: getattr(db, repository).insert(**values))
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._read_executor.shutdown)
+        await loop.run_in_executor(None, self._write_executor.shutdown)
+        self.readers.close()
+        self.writer.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
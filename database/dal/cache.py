@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, NamedTuple, Tuple
+
+DEFAULT_MAX_ENTRIES = 10000
+# Total rows held across all entries; with max_entries this bounds memory
+DEFAULT_MAX_ROWS = 200000
+DEFAULT_TTL = 60.0
+
+
+class _Entry(NamedTuple):
+    rows: Tuple
+    tables: FrozenSet[str]
+    expires: float
+
+
+# Read-through result cache for per-user queries, keyed by (query, UserID,
+# parameters). Entries are evicted least recently used first once
+# `max_entries` or `max_rows` is exceeded, and expire after `ttl` seconds.
+#
+# Every entry records the tables its query reads, so a write only evicts the
+# writing user's entries that depend on the written table: a new exercise log
+# drops that user's ExerciseLogs queries and keeps their sleep and goal ones.
+# Invalidate after the write commits; a load that was running when an
+# invalidation for its user and tables arrived is returned but not cached, so
+# a reader racing a commit never stores the old rows.
+class QueryCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_rows=DEFAULT_MAX_ROWS, ttl=DEFAULT_TTL,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._by_user = {}
+        self._loading = {}
+        self._pending = {}
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._rows -= len(entry.rows)
+        keys = self._by_user[key[1]]
+        keys.discard(key)
+        if not keys:
+            del self._by_user[key[1]]
+
+    # Cached rows for (name, user_id, params), or load() them and cache the
+    # result. `tables` are the tables the query reads.
+    def get_or_load(self, name, user_id, params, tables, load):
+        key = (name, user_id, tuple(params))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(entry.rows)
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            ticket = [frozenset(tables), False]
+            self._loading.setdefault(user_id, []).append(ticket)
+        try:
+            rows = tuple(load())
+        finally:
+            with self._lock:
+                tickets = self._loading[user_id]
+                tickets.remove(ticket)
+                if not tickets:
+                    del self._loading[user_id]
+        with self._lock:
+            if not ticket[1] and len(rows) <= self.max_rows:
+                if key in self._entries:
+                    self._remove(key)
+                self._entries[key] = _Entry(rows, ticket[0], self.clock() + self.ttl)
+                self._by_user.setdefault(user_id, set()).add(key)
+                self._rows += len(rows)
+                while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+        return list(rows)
+
+    # Drop `user_id`'s entries that read any of `tables` (all of them when
+    # tables is None)
+    def invalidate(self, user_id, tables=None):
+        tables = None if tables is None else frozenset([tables] if isinstance(tables, str) else tables)
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                if tables is None or self._entries[key].tables & tables:
+                    self._remove(key)
+                    self.invalidations += 1
+            for ticket in self._loading.get(user_id, ()):
+                if tables is None or ticket[0] & tables:
+                    ticket[1] = True
+
+    # Writes made inside a transaction someone else commits: remember them
+    # against the connection until committed(conn) or discard(conn). A
+    # ConnectionPool the cache listens on calls these as connections come
+    # back; for other connections the caller does.
+    def defer(self, conn, user_id, table):
+        with self._lock:
+            self._pending.setdefault(id(conn), set()).add((user_id, table))
+
+    def committed(self, conn):
+        with self._lock:
+            pending = self._pending.pop(id(conn), ())
+        for user_id, table in pending:
+            self.invalidate(user_id, table)
+
+    def discard(self, conn):
+        with self._lock:
+            self._pending.pop(id(conn), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self._rows = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+
+from .pool import DEFAULT_CACHED_STATEMENTS, DEFAULT_POOL_SIZE, DEFAULT_PRAGMAS, ConnectionPool
+from .profile import PROFILE_TABLES, build_profile, profile_rows
+from .repositories import (ExerciseLogsRepository, GoalsRepository, HealthMetricsRepository,
+                           NutritionLogsRepository, SleepDataRepository, UserPreferencesRepository,
+                           UsersRepository)
+
+
+# One pool plus a repository per table:
+#
+#     db = Database("health_fitness_app.db", pool_size=8)
+#     with db.transaction() as conn:
+#         user_id = db.users.insert(conn, UserName="jane", Age=31)
+#         db.exercise_logs.insert(conn, UserID=user_id, ExerciseType="Running", DurationMinutes=30)
+#     db.exercise_logs.by_user(user_id, limit=10, newest_first=True)
+#
+# Pass a QueryCache to serve user_query() from memory; writes through the
+# repositories and transaction() keep it up to date.
+class Database:
+    def __init__(self, path="health_fitness_app.db", pool_size=DEFAULT_POOL_SIZE,
+                 cached_statements=DEFAULT_CACHED_STATEMENTS, pragmas=DEFAULT_PRAGMAS, timeout=30.0, cache=None):
+        self.pool = ConnectionPool(path, pool_size, cached_statements, pragmas, timeout)
+        self.cache = cache
+        self.users = UsersRepository(self.pool, cache)
+        self.exercise_logs = ExerciseLogsRepository(self.pool, cache)
+        self.goals = GoalsRepository(self.pool, cache)
+        self.health_metrics = HealthMetricsRepository(self.pool, cache)
+        self.nutrition_logs = NutritionLogsRepository(self.pool, cache)
+        self.sleep_data = SleepDataRepository(self.pool, cache)
+        self.preferences = UserPreferencesRepository(self.pool, cache)
+        self._user_queries = None
+
+    # BEGIN ... COMMIT on a pooled connection. Cache invalidations for writes
+    # made inside are applied once the commit has happened (the cache listens
+    # on the pool, so db.pool.transaction() works the same).
+    @contextmanager
+    def transaction(self, mode="DEFERRED"):
+        with self.pool.transaction(mode=mode) as conn:
+            yield conn
+
+    # (sql, placeholders, tables) of statement `number` of queries.sql, its
+    # windows in the storage format of the database behind `conn`. An empty
+    # database cannot tell text from epoch yet, so it is asked again next time.
+    def user_query_sql(self, number, conn):
+        if self._user_queries is None:
+            import query_catalog
+            epoch = query_catalog.stores_epoch(conn)
+            queries = {n: (sql, count, query_catalog.tables_in(sql))
+                       for n, (sql, count) in query_catalog.user_queries(epoch=bool(epoch)).items()}
+            if epoch is None:
+                return queries[number]
+            self._user_queries = queries
+        return self._user_queries[number]
+
+    # Statement `number` of queries.sql for one user, through the cache if
+    # there is one
+    def user_query(self, number, user_id):
+        if self._user_queries is not None:
+            sql, placeholders, tables = self._user_queries[number]
+        else:
+            with self.pool.connection() as conn:
+                sql, placeholders, tables = self.user_query_sql(number, conn)
+
+        def load():
+            with self.pool.connection() as conn:
+                return conn.execute(sql, (user_id,) * placeholders).fetchall()
+
+        if self.cache is None:
+            return load()
+        return self.cache.get_or_load(number, user_id, (), tables, load)
+
+    # Every section of a user's profile in one statement (see dal.profile);
+    # `meal_day` limits the meals to one day, like query 5
+    def profile(self, user_id, meal_day=None):
+        def load():
+            with self.pool.connection() as conn:
+                return profile_rows(conn, user_id, meal_day)
+
+        if self.cache is None:
+            return build_profile(load())
+        return build_profile(self.cache.get_or_load("profile", user_id, (meal_day,), PROFILE_TABLES, load))
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .pool import DEFAULT_PRAGMAS, connect
+from .wal import apply_pragma_profile, checkpoint, wal_size
+
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY = 0.0
+
+_STOP = object()
+
+
+# Group commit: producers on any thread submit small writes, and one writer
+# thread commits everything that queued up while the previous commit ran (up
+# to `max_batch` requests) as a single transaction, so many inserts share one
+# commit and one sync. Under load a batch therefore spans the few milliseconds
+# of the previous commit. `max_delay` adds a linger after the first request,
+# which only pays off when commits are expensive (synchronous=FULL on slow
+# disks) and producers do not block on their results.
+#
+# A request that fails is rolled back on its own (see _commit) and only its
+# future gets the exception; the rest of the batch still commits. Futures resolve only after COMMIT, so a result
+# means the write is durable (per the synchronous level). If the COMMIT
+# itself fails, every request in the batch gets that error.
+#
+# Checkpoints: wal_autocheckpoint is turned off for the writer and the WAL is
+# checkpointed (PASSIVE) between batches once it grows past
+# `checkpoint_bytes`, so a checkpoint never runs inside a producer's latency.
+class GroupCommitWriter:
+    def __init__(self, path, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY, synchronous="NORMAL",
+                 checkpoint_bytes=4 * 2**20, profile="wal", pragmas=DEFAULT_PRAGMAS):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.checkpoint_bytes = checkpoint_bytes
+        self.batches = 0
+        self.requests = 0
+        self.checkpoints = 0
+        self._queue = queue.Queue()
+        self._conn = connect(path, pragmas=pragmas)
+        self.journal_mode = apply_pragma_profile(self._conn, profile, synchronous, autocheckpoint=0)
+        self._thread = threading.Thread(target=self._run, name="sqlite-group-commit", daemon=True)
+        self._closed = False
+        self._thread.start()
+
+    # Queue fn(conn) and return a concurrent.futures.Future for its result
+    def submit(self, fn):
+        if self._closed:
+            raise RuntimeError("Writer is closed")
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    # Queue one statement; the future resolves to its lastrowid
+    def submit_sql(self, sql, params=()):
+        return self.submit(lambda conn: conn.execute(sql, params).lastrowid)
+
+    # Blocking helper: submit and wait for the result
+    def execute(self, sql, params=(), timeout=None):
+        return self.submit_sql(sql, params).result(timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    # Run every request of the batch in one transaction. The fast path runs
+    # them back to back; if one fails, the transaction is rolled back and the
+    # batch is replayed with a SAVEPOINT around each request so only the
+    # failing ones are dropped. Requests must therefore only touch the database.
+    def _commit(self, batch):
+        batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        conn = self._conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                outcomes = [(future, fn(conn), None) for fn, future in batch]
+            except Exception:
+                conn.rollback()
+                conn.execute("BEGIN IMMEDIATE")
+                outcomes = [self._isolated(conn, fn, future) for fn, future in batch]
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        self.batches += 1
+        self.requests += len(batch)
+
+    def _isolated(self, conn, fn, future):
+        conn.execute("SAVEPOINT request")
+        try:
+            result = fn(conn)
+        except Exception as e:
+            conn.execute("ROLLBACK TO request")
+            conn.execute("RELEASE request")
+            return future, None, e
+        conn.execute("RELEASE request")
+        return future, result, None
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            self._commit(batch)
+            if self.journal_mode == "wal" and wal_size(self.path) > self.checkpoint_bytes:
+                checkpoint(self._conn, "PASSIVE")
+                self.checkpoints += 1
+        if self.journal_mode == "wal":
+            checkpoint(self._conn, "PASSIVE")
+        self._conn.close()
+
+    # Commit what is queued, stop the writer thread and close its connection
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
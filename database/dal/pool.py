@@ -0,0 +1,145 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 4
+
+# Prepared statements kept per connection. The repositories only issue a fixed
+# set of SQL strings, so this comfortably holds all of them and every call after
+# the first skips sqlite3_prepare.
+DEFAULT_CACHED_STATEMENTS = 256
+
+# Applied to every new connection, in order. journal_mode is a database-wide
+# setting and is left to the caller (see bulk_load.load_pragmas for loads).
+DEFAULT_PRAGMAS = (
+    ("foreign_keys", "ON"),
+    ("busy_timeout", 5000),
+    ("cache_size", -20000),
+    ("temp_store", "MEMORY"),
+    ("mmap_size", 268435456),
+)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Open a connection the way the pool does. Connections run in autocommit mode
+# (isolation_level=None); writes group themselves with ConnectionPool.transaction.
+def connect(path, cached_statements=DEFAULT_CACHED_STATEMENTS, pragmas=DEFAULT_PRAGMAS, read_only=False):
+    if read_only:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None,
+                               check_same_thread=False, cached_statements=cached_statements)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                               cached_statements=cached_statements)
+    for name, value in pragmas:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+# Bounded, thread-safe pool of SQLite connections. Connections are opened
+# lazily up to `size`; when all of them are checked out, acquire() waits up to
+# `timeout` seconds and then raises PoolTimeout. A connection is only ever used
+# by one thread at a time.
+#
+# Listeners (see listen()) hear when a borrowed connection comes back:
+# committed(conn) if its work ended, discard(conn) if an unfinished
+# transaction had to be rolled back. QueryCache uses this to apply the
+# invalidations deferred inside pool.transaction(), whoever committed it.
+class ConnectionPool:
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, cached_statements=DEFAULT_CACHED_STATEMENTS,
+                 pragmas=DEFAULT_PRAGMAS, timeout=30.0, read_only=False):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.path = path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.pragmas = tuple(pragmas)
+        self.timeout = timeout
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+        self._listeners = []
+
+    @property
+    def opened(self):
+        return self._opened
+
+    def listen(self, listener):
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def acquire(self, timeout=None):
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return connect(self.path, self.cached_statements, self.pragmas, self.read_only)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout if timeout is None else timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No connection available after {self.timeout if timeout is None else timeout}s")
+
+    # Return a connection; an unfinished transaction is rolled back first so
+    # the next borrower starts clean. Listeners are told before the connection
+    # can be handed out again. A transaction the borrower rolled back itself
+    # reports as committed, which only costs extra invalidations.
+    def release(self, conn):
+        rolled_back = conn.in_transaction
+        if rolled_back:
+            conn.rollback()
+        for listener in self._listeners:
+            if rolled_back:
+                listener.discard(conn)
+            else:
+                listener.committed(conn)
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    # Borrow a connection inside BEGIN ... COMMIT, rolling back on any error.
+    # Pass `conn` to join a transaction the caller already holds.
+    @contextmanager
+    def transaction(self, conn=None, mode="DEFERRED"):
+        if conn is not None:
+            yield conn
+            return
+        with self.connection() as conn:
+            conn.execute(f"BEGIN {mode}")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,222 @@
+import datetime
+from collections import Counter
+from typing import List, NamedTuple, Optional
+
+from .rows import ExerciseLog, Goal, HealthMetric, NutritionLog, SleepSession, User, UserPreference
+
+# Every table a profile reads, for cache invalidation
+PROFILE_TABLES = ("Users", "ExerciseLogs", "GoalsAndProgress", "HealthMetrics", "NutritionLogs", "SleepData",
+                  "UserPreferences")
+
+# (section, table, row class) for each row-returning arm of the statement
+_SECTIONS = (
+    ("user", "Users", User),
+    ("exercise_logs", "ExerciseLogs", ExerciseLog),
+    ("goals", "GoalsAndProgress", Goal),
+    ("health_metrics", "HealthMetrics", HealthMetric),
+    ("meals", "NutritionLogs", NutritionLog),
+    ("sleep", "SleepData", SleepSession),
+    ("preferences", "UserPreferences", UserPreference),
+)
+
+# Aggregates left to SQL because SQLite's arithmetic is the definition: BMI
+# over NUMERIC columns (integer division when both are whole numbers) and
+# AVG over the Intensity text. Everything else is computed from the rows.
+_AGGREGATES = (
+    ("bmi", "Users", ("Weight / (Height * Height)",)),
+    ("exercise_totals", "ExerciseLogs", ("SUM(DurationMinutes)", "AVG(Intensity)")),
+)
+
+_WIDTH = max(len(row_class._fields) for _, _, row_class in _SECTIONS)
+
+
+# Nulls first, then numbers, then text: SQLite's ORDER BY for mixed values
+def _sort_key(value):
+    if value is None:
+        return (0, 0)
+    return (2, value) if isinstance(value, str) else (1, value)
+
+
+def _average(values):
+    values = [value for value in values if value is not None]
+    return sum(values) / len(values) if values else None
+
+
+# A user's rows and aggregates as raw typed values. The aggregates of
+# queries.sql that follow from the rows are properties, computed when read.
+class UserProfile(NamedTuple):
+    user: Optional[User]
+    exercise_logs: List[ExerciseLog]
+    goals: List[Goal]
+    health_metrics: List[HealthMetric]
+    meals: List[NutritionLog]
+    sleep: List[SleepSession]
+    preferences: Optional[UserPreference]
+    bmi: Optional[float]
+    total_exercise_minutes: Optional[int]
+    average_intensity: Optional[float]
+
+    @property
+    def goal_count(self):
+        return len(self.goals)
+
+    # Ties go to the type that sorts first
+    @property
+    def most_frequent_exercise_type(self):
+        counts = Counter(log.ExerciseType for log in self.exercise_logs)
+        if not counts:
+            return None
+        return min(counts, key=lambda kind: (-counts[kind], _sort_key(kind)))
+
+    @property
+    def average_sleep_hours(self):
+        return _average(None if s.SleepDurationMinutes is None else s.SleepDurationMinutes / 60.0
+                        for s in self.sleep)
+
+    @property
+    def average_sleep_quality(self):
+        return _average(s.SleepQualityRating for s in self.sleep)
+
+    @property
+    def latest_exercise(self):
+        if not self.exercise_logs:
+            return None
+        return max(self.exercise_logs, key=lambda log: _sort_key(log.DateTime))
+
+
+# One statement for the whole profile: a UNION ALL whose first column names
+# the section and whose other columns are the section's raw values, padded
+# with NULLs to a common width. The UserID is bound once as :user_id and
+# every arm is a seek on its table's UserID index.
+def profile_sql(meal_window=False):
+    def arm(section, columns, rest):
+        values = list(columns) + ["NULL"] * (_WIDTH - len(columns))
+        return f"SELECT '{section}', {', '.join(values)} {rest}"
+
+    arms = []
+    for section, table, row_class in _SECTIONS:
+        rest = f"FROM {table} WHERE UserID = :user_id"
+        if section == "meals" and meal_window:
+            rest += " AND MealTime >= :meal_start AND MealTime < :meal_end"
+        arms.append(arm(section, row_class._fields, rest))
+    for section, table, columns in _AGGREGATES:
+        arms.append(arm(section, columns, f"FROM {table} WHERE UserID = :user_id"))
+    return "\nUNION ALL\n".join(arms)
+
+
+_SQL = {}
+
+
+# Parameters for profile_sql(); `meal_day` ("2023-10-01" or a date) limits
+# the meals to that day, like query 5, with bounds in the storage format
+# given by `epoch` (see timeutil.window)
+def profile_params(user_id, meal_day=None, epoch=False):
+    import timeutil
+
+    params = {"user_id": user_id}
+    if meal_day is not None:
+        day = datetime.date.fromisoformat(str(meal_day))
+        params["meal_start"], params["meal_end"] = timeutil.window(
+            day.isoformat(), (day + datetime.timedelta(days=1)).isoformat(), epoch)
+    return params
+
+
+# The raw rows of one profile, in a single execution. The meal window follows
+# the database's timestamp storage unless `epoch` says which it is.
+def profile_rows(conn, user_id, meal_day=None, epoch=None):
+    if meal_day is not None and epoch is None:
+        import query_catalog
+        epoch = bool(query_catalog.stores_epoch(conn))
+    params = profile_params(user_id, meal_day, epoch)
+    meal_window = "meal_start" in params
+    sql = _SQL.get(meal_window)
+    if sql is None:
+        sql = _SQL[meal_window] = profile_sql(meal_window)
+    return conn.execute(sql, params).fetchall()
+
+
+# Sort the rows of profile_rows() into a UserProfile
+def build_profile(rows):
+    sections = {section: [] for section, _, _ in _SECTIONS}
+    classes = {section: row_class for section, _, row_class in _SECTIONS}
+    bmi = total = intensity = None
+    for row in rows:
+        section = row[0]
+        if section == "bmi":
+            bmi = row[1]
+        elif section == "exercise_totals":
+            total, intensity = row[1], row[2]
+        else:
+            row_class = classes[section]
+            sections[section].append(row_class._make(row[1:1 + len(row_class._fields)]))
+    return UserProfile(
+        user=sections["user"][0] if sections["user"] else None,
+        exercise_logs=sections["exercise_logs"],
+        goals=sections["goals"],
+        health_metrics=sections["health_metrics"],
+        meals=sections["meals"],
+        sleep=sections["sleep"],
+        preferences=sections["preferences"][0] if sections["preferences"] else None,
+        bmi=bmi,
+        total_exercise_minutes=total,
+        average_intensity=intensity,
+    )
+
+
+def fetch_profile(conn, user_id, meal_day=None):
+    return build_profile(profile_rows(conn, user_id, meal_day))
+
+
+# A value as SQLite's || renders it: REALs with 15 significant digits and
+# always a decimal point ("5.0", "7.08333333333333")
+def _text(value):
+    if isinstance(value, float):
+        text = f"{value:.15g}"
+        mantissa, e, exponent = text.partition("e")
+        if "." not in mantissa and mantissa.lstrip("-").isdigit():
+            mantissa += ".0"
+        return mantissa + e + exponent
+    return str(value)
+
+
+# || semantics: NULL if any part is NULL
+def _concat(*parts):
+    if None in parts:
+        return None
+    return "".join([part if type(part) is str else _text(part) for part in parts])
+
+
+# queries.sql statement number -> its lines for a profile
+_LINES = {
+    1: lambda p: [_concat("Exercise Type: ", e.ExerciseType, ", Duration: ", e.DurationMinutes,
+                          " minutes, Calories Burned: ", e.CaloriesBurned) for e in p.exercise_logs],
+    2: lambda p: [_concat("Goal Type: ", g.GoalType, ", Goal Value: ", g.GoalValue, ", Progress Value: ",
+                          g.ProgressValue) for g in p.goals],
+    3: lambda p: [_concat("Number of Goals: ", p.goal_count)],
+    4: lambda p: [_concat("Weight: ", h.Weight, " kg, Waist Circumference: ", h.WaistCircumference,
+                          " cm, Hip Circumference: ", h.HipCircumference, " cm, Body Fat Percentage: ",
+                          h.BodyFatPercentage, "%, Muscle Mass: ", h.MuscleMass, " kg, Blood Pressure: ",
+                          h.BloodPressure, ", Step Count: ", h.StepCount) for h in p.health_metrics],
+    5: lambda p: [_concat("Meal Name: ", m.MealName, ", Food Items: ", m.FoodItems, ", Meal Time: ", m.MealTime)
+                  for m in p.meals],
+    6: lambda p: [_concat("Sleep Duration: ", s.SleepDurationMinutes, " minutes, Sleep Quality Rating: ",
+                          s.SleepQualityRating, ", Start Time: ", s.SleepStartTime, ", End Time: ", s.SleepEndTime)
+                  for s in p.sleep],
+    7: lambda p: [_concat("Fitness Goal: ", pref.FitnessGoal, ", Dietary Restrictions: ", pref.DietaryRestrictions,
+                          ", Preferred Exercises: ", pref.PreferredExercises) for pref in [p.preferences] if pref],
+    8: lambda p: [_concat("Total Exercise Duration: ", p.total_exercise_minutes)],
+    9: lambda p: [_concat("Average Exercise Intensity: ", p.average_intensity)],
+    10: lambda p: [_concat("Most Frequent Exercise Type: ", p.most_frequent_exercise_type)] if p.exercise_logs else [],
+    11: lambda p: [_concat("BMI (Body Mass Index): ", p.bmi)] if p.user else [],
+    12: lambda p: [_concat("Average Daily Sleep Duration: ", p.average_sleep_hours)],
+    13: lambda p: [_concat("Average Daily Sleep Quality Rating: ", p.average_sleep_quality)],
+    14: lambda p: [_concat("Most Recent Exercise: Type: ", e.ExerciseType, ", Duration: ", e.DurationMinutes,
+                           " minutes, Date: ", e.DateTime) for e in [p.latest_exercise] if e],
+}
+
+
+# The display strings of queries.sql, built from the raw values only when
+# asked for: {query number: [line, ...]} for `numbers` (default all). A line
+# is None where SQL's || would have produced NULL.
+def profile_lines(profile, numbers=None):
+    return {number: _LINES[number](profile) for number in (numbers or _LINES)}
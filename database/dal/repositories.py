@@ -0,0 +1,253 @@
+from .rows import (ExerciseLog, Goal, HealthMetric, NutritionLog, SleepSession, User, UserPreference,
+                   mapped, mapped_one)
+
+
+# Table access through a ConnectionPool. Every method builds its SQL from the
+# same few strings, so statements stay in the connection's prepared-statement
+# cache. Pass `conn` to run inside a transaction the caller already holds
+# (pool.transaction()); otherwise each call borrows a connection and writes
+# commit on their own. With a QueryCache, writes invalidate the cached
+# queries of the users they touch; the cache listens on the pool, so writes
+# joined to a pool.transaction() are invalidated when it commits.
+class Repository:
+    table = None
+    row_class = None
+    # True when callers supply the primary key (UserPreferences.UserID)
+    explicit_key = False
+
+    def __init__(self, pool, cache=None):
+        self.pool = pool
+        self.cache = cache
+        if cache is not None:
+            pool.listen(cache)
+        self.columns = self.row_class._fields
+        self.key = self.columns[0]
+        self.insert_columns = self.columns if self.explicit_key else self.columns[1:]
+        self.select_sql = f"SELECT {', '.join(self.columns)} FROM {self.table}"
+        self.insert_sql = (f"INSERT INTO {self.table} ({', '.join(self.insert_columns)}) "
+                           f"VALUES ({', '.join('?' for _ in self.insert_columns)})")
+        self.keyed_insert_sql = (f"INSERT INTO {self.table} ({', '.join(self.columns)}) "
+                                 f"VALUES ({', '.join('?' for _ in self.columns)})")
+
+    def _fetch(self, sql, params=(), conn=None):
+        if conn is not None:
+            return mapped(conn.execute(sql, params), self.row_class)
+        with self.pool.connection() as conn:
+            return mapped(conn.execute(sql, params), self.row_class)
+
+    def _fetch_one(self, sql, params=(), conn=None):
+        if conn is not None:
+            return mapped_one(conn.execute(sql, params), self.row_class)
+        with self.pool.connection() as conn:
+            return mapped_one(conn.execute(sql, params), self.row_class)
+
+    # One plain tuple, for aggregates that have no row class
+    def _row(self, sql, params=(), conn=None):
+        if conn is not None:
+            return conn.execute(sql, params).fetchone()
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def _scalar(self, sql, params=(), conn=None):
+        return self._row(sql, params, conn)[0]
+
+    # Values for insert_columns from keyword arguments; missing columns are NULL
+    def _values(self, values):
+        unknown = set(values) - set(self.insert_columns)
+        if unknown:
+            raise ValueError(f"Unknown {self.table} columns: {', '.join(sorted(unknown))}")
+        return tuple(values.get(column) for column in self.insert_columns)
+
+    # Report users whose rows in this table changed: invalidated now when the
+    # write committed on its own, once the caller's pooled connection is
+    # released when it joined a transaction (see ConnectionPool.release)
+    def _changed(self, conn, user_ids):
+        if self.cache is None:
+            return
+        for user_id in set(user_ids) - {None}:
+            if conn is None:
+                self.cache.invalidate(user_id, self.table)
+            else:
+                self.cache.defer(conn, user_id, self.table)
+
+    # True when the table has been replaced by a view with INSTEAD OF
+    # triggers (partitions.py, encode_categoricals.py). Writes through such a
+    # view leave lastrowid and rowcount at 0 and RETURNING reports no rows,
+    # so inserts pick their key up front and deletes look their rows up first.
+    # Asked on every write, so a DAL opened before a migration keeps working.
+    def _is_view(self, conn):
+        row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (self.table,)).fetchone()
+        return row is not None and row[0] == "view"
+
+    # Key for a new row inserted through the view: one past the highest in
+    # use, read from the <Table>Encoded table behind an encode_categoricals
+    # view so MAX() is one seek instead of a pass over the decoding joins
+    def _next_key(self, conn):
+        import encode_categoricals
+
+        table = self.table
+        if table in encode_categoricals.CATEGORICAL:
+            table = encode_categoricals.encoded_table(table)
+        return conn.execute(f"SELECT COALESCE(MAX({self.key}), 0) + 1 FROM {table}").fetchone()[0]
+
+    def get(self, key, conn=None):
+        return self._fetch_one(f"{self.select_sql} WHERE {self.key} = ?", (key,), conn)
+
+    # Insert one row from keyword arguments and return its primary key
+    def insert(self, conn=None, **values):
+        with self.pool.transaction(conn) as c:
+            if self.explicit_key:
+                c.execute(self.insert_sql, self._values(values))
+                key = values[self.key]
+            elif self._is_view(c):
+                key = self._next_key(c)
+                c.execute(self.keyed_insert_sql, (key,) + self._values(values))
+            else:
+                key = c.execute(self.insert_sql, self._values(values)).lastrowid
+        self._changed(conn, [values.get("UserID", key if self.key == "UserID" else None)])
+        return key
+
+    # Insert tuples ordered like insert_columns in one transaction. New Users
+    # rows have no cached queries yet, so only owned tables invalidate.
+    def insert_many(self, rows, conn=None):
+        rows = rows if isinstance(rows, list) else list(rows)
+        with self.pool.transaction(conn) as c:
+            count = self._insert_rows(c, rows)
+        if "UserID" in self.insert_columns:
+            position = self.insert_columns.index("UserID")
+            self._changed(conn, [row[position] for row in rows])
+        return count
+
+    def _insert_rows(self, conn, rows):
+        count = conn.executemany(self.insert_sql, rows).rowcount
+        return len(rows) if self._is_view(conn) else count
+
+    def delete(self, key, conn=None):
+        with self.pool.transaction(conn) as c:
+            if self._is_view(c):
+                users = [row[0] for row in c.execute(f"SELECT UserID FROM {self.table} WHERE {self.key} = ?",
+                                                     (key,))]
+                if users:
+                    c.execute(f"DELETE FROM {self.table} WHERE {self.key} = ?", (key,))
+            else:
+                users = [row[0] for row in c.execute(
+                    f"DELETE FROM {self.table} WHERE {self.key} = ? RETURNING UserID", (key,))]
+        self._changed(conn, users)
+        return len(users)
+
+
+# Tables whose rows belong to a user, optionally ordered by a timestamp column.
+# Windows are half-open [start, end) so they seek the (UserID, <time>) indexes;
+# pass bounds in the database's storage format (see timeutil.window).
+class UserOwnedRepository(Repository):
+    time_column = None
+
+    def by_user(self, user_id, start=None, end=None, limit=None, newest_first=False, conn=None):
+        if self.time_column is None and (start is not None or end is not None):
+            raise ValueError(f"{self.table} has no timestamp column to filter on")
+        sql = f"{self.select_sql} WHERE UserID = ?"
+        params = [user_id]
+        if start is not None:
+            sql += f" AND {self.time_column} >= ?"
+            params.append(start)
+        if end is not None:
+            sql += f" AND {self.time_column} < ?"
+            params.append(end)
+        order = self.time_column or self.key
+        sql += f" ORDER BY {order} DESC" if newest_first else f" ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._fetch(sql, params, conn)
+
+    def count_for_user(self, user_id, conn=None):
+        return self._scalar(f"SELECT COUNT(*) FROM {self.table} WHERE UserID = ?", (user_id,), conn)
+
+
+class UsersRepository(Repository):
+    table = "Users"
+    row_class = User
+
+    def by_name(self, user_name, conn=None):
+        return self._fetch(f"{self.select_sql} WHERE UserName = ?", (user_name,), conn)
+
+
+class ExerciseLogsRepository(UserOwnedRepository):
+    table = "ExerciseLogs"
+    row_class = ExerciseLog
+    time_column = "DateTime"
+
+    # Partitioned layout: keys come from the sequence every partition shares,
+    # and batches go straight into their partitions
+    def _next_key(self, conn):
+        import partitions
+
+        if not partitions.is_partitioned(conn):
+            return super()._next_key(conn)
+        return conn.execute(f"UPDATE {partitions.STATE} SET NextLogID = NextLogID + 1 "
+                            f"RETURNING NextLogID - 1").fetchone()[0]
+
+    def _insert_rows(self, conn, rows):
+        import partitions
+
+        if partitions.is_partitioned(conn):
+            return partitions.insert_many(conn, self.insert_columns, rows)
+        return super()._insert_rows(conn, rows)
+
+    def latest(self, user_id, conn=None):
+        rows = self.by_user(user_id, limit=1, newest_first=True, conn=conn)
+        return rows[0] if rows else None
+
+    def total_minutes(self, user_id, conn=None):
+        return self._scalar("SELECT SUM(DurationMinutes) FROM ExerciseLogs WHERE UserID = ?", (user_id,), conn)
+
+    def most_frequent_type(self, user_id, conn=None):
+        sql = """
+        SELECT ExerciseType FROM ExerciseLogs WHERE UserID = ?
+        GROUP BY ExerciseType ORDER BY COUNT(*) DESC, ExerciseType LIMIT 1
+        """
+        row = self._row(sql, (user_id,), conn)
+        return row[0] if row else None
+
+
+class GoalsRepository(UserOwnedRepository):
+    table = "GoalsAndProgress"
+    row_class = Goal
+
+
+class HealthMetricsRepository(UserOwnedRepository):
+    table = "HealthMetrics"
+    row_class = HealthMetric
+    time_column = "RecordedAt"
+
+    # Readings at or above systolic OR diastolic recorded since `since`. The
+    # thresholds are written into the SQL so that at the 140/90 defaults the
+    # term matches the partial idx_HealthMetrics_Hypertensive_RecordedAt
+    # index, which bound parameters never do
+    def hypertensive(self, since, systolic=140, diastolic=90, conn=None):
+        sql = (f"{self.select_sql} WHERE (SystolicBP >= {int(systolic)} OR DiastolicBP >= {int(diastolic)}) "
+               f"AND RecordedAt >= ?")
+        return self._fetch(sql, (since,), conn)
+
+
+class NutritionLogsRepository(UserOwnedRepository):
+    table = "NutritionLogs"
+    row_class = NutritionLog
+    time_column = "MealTime"
+
+
+class SleepDataRepository(UserOwnedRepository):
+    table = "SleepData"
+    row_class = SleepSession
+    time_column = "SleepStartTime"
+
+    # (average hours, average quality rating) for a user
+    def averages(self, user_id, conn=None):
+        sql = "SELECT AVG(SleepDurationMinutes) / 60.0, AVG(SleepQualityRating) FROM SleepData WHERE UserID = ?"
+        return tuple(self._row(sql, (user_id,), conn))
+
+
+class UserPreferencesRepository(Repository):
+    table = "UserPreferences"
+    row_class = UserPreference
+    explicit_key = True
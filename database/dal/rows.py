@@ -0,0 +1,85 @@
+from typing import NamedTuple, Optional, Union
+
+# DATETIME columns hold text or, with --epoch-timestamps, integer epoch seconds
+Timestamp = Union[str, int, None]
+
+
+class User(NamedTuple):
+    UserID: int
+    UserName: str
+    Age: Optional[int]
+    Gender: Optional[str]
+    Weight: Optional[float]
+    Height: Optional[float]
+    ContactInfo: Optional[str]
+
+
+class ExerciseLog(NamedTuple):
+    LogID: int
+    UserID: Optional[int]
+    ExerciseType: Optional[str]
+    DurationMinutes: Optional[int]
+    Intensity: Optional[str]
+    DateTime: Timestamp
+    CaloriesBurned: Optional[float]
+    DistanceCovered: Optional[float]
+    HeartRate: Optional[int]
+    WeightLiftedLbs: Optional[float]
+
+
+class Goal(NamedTuple):
+    GoalID: int
+    UserID: Optional[int]
+    GoalType: Optional[str]
+    GoalValue: Optional[float]
+    ProgressValue: Optional[float]
+
+
+class HealthMetric(NamedTuple):
+    MetricID: int
+    UserID: Optional[int]
+    Weight: Optional[float]
+    WaistCircumference: Optional[float]
+    HipCircumference: Optional[float]
+    BodyFatPercentage: Optional[float]
+    MuscleMass: Optional[float]
+    BloodPressure: Optional[str]
+    StepCount: Optional[int]
+    SystolicBP: Optional[int]
+    DiastolicBP: Optional[int]
+    RecordedAt: Timestamp
+
+
+class NutritionLog(NamedTuple):
+    LogID: int
+    UserID: Optional[int]
+    MealName: Optional[str]
+    FoodItems: Optional[str]
+    MealTime: Timestamp
+
+
+class SleepSession(NamedTuple):
+    SleepID: int
+    UserID: Optional[int]
+    SleepDurationMinutes: Optional[int]
+    SleepQualityRating: Optional[int]
+    SleepStartTime: Timestamp
+    SleepEndTime: Timestamp
+
+
+class UserPreference(NamedTuple):
+    UserID: int
+    FitnessGoal: Optional[str]
+    DietaryRestrictions: Optional[str]
+    PreferredExercises: Optional[str]
+
+
+# Map a cursor's rows onto a NamedTuple class. The tuples sqlite3 returns are
+# reused as-is, so no per-row dict is built.
+def mapped(cursor, row_class):
+    return list(map(row_class._make, cursor))
+
+
+def mapped_one(cursor, row_class):
+    row = cursor.fetchone()
+    return None if row is None else row_class._make(row)
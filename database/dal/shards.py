@@ -0,0 +1,179 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .database import Database
+from .pool import DEFAULT_CACHED_STATEMENTS, DEFAULT_POOL_SIZE, DEFAULT_PRAGMAS
+from .rows import User
+
+# Every table is owned by a user, so a user's rows all live in one shard.
+# Users and UserPreferences are keyed by UserID itself; the other tables have
+# their own row IDs, which are only unique within a shard.
+SHARDED_TABLES = ("Users", "ExerciseLogs", "GoalsAndProgress", "HealthMetrics", "NutritionLogs", "SleepData",
+                  "UserPreferences")
+
+# One row per shard file: its position, the shard count it was built for, and
+# (used on shard 0 only) the next UserID to hand out, so IDs stay unique
+# across shards
+SHARD_INFO = "ShardInfo"
+
+_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+# Jump consistent hash (Lamping & Veach): a bucket in [0, buckets) for an
+# integer key. Going from N to N + 1 shards moves only 1 / (N + 1) of the
+# users, and it needs no lookup table.
+def jump_hash(key, buckets):
+    key &= _MASK
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & _MASK
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_of(user_id, shards):
+    return jump_hash(user_id, shards)
+
+
+# Create the schema and ShardInfo in each file of a new shard set
+def create_shards(paths, next_user_id=1):
+    import bulk_load
+    from .pool import connect
+
+    for index, path in enumerate(paths):
+        conn = connect(path)
+        bulk_load.ensure_schema(conn)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {SHARD_INFO} (ShardIndex INTEGER NOT NULL, "
+                     f"ShardCount INTEGER NOT NULL, NextUserID INTEGER NOT NULL)")
+        conn.execute(f"DELETE FROM {SHARD_INFO}")
+        conn.execute(f"INSERT INTO {SHARD_INFO} VALUES (?, ?, ?)", (index, len(paths), next_user_id))
+        conn.close()
+
+
+# A Database per shard file behind one router. Per-user reads and writes go to
+# the shard that owns the UserID; cross-user queries run on every shard in
+# parallel (sqlite3 releases the GIL while a statement runs) and are merged
+# here:
+#
+#     db = ShardedDatabase(["fit.shard0.db", "fit.shard1.db", "fit.shard2.db", "fit.shard3.db"])
+#     user_id = db.insert_user(UserName="jane", Age=31)
+#     db.for_user(user_id).exercise_logs.insert(UserID=user_id, ExerciseType="Running")
+#     db.grouped("ExerciseLogs", "ExerciseType", {"calories": ("avg", "CaloriesBurned")})
+class ShardedDatabase:
+    def __init__(self, paths, pool_size=DEFAULT_POOL_SIZE, cached_statements=DEFAULT_CACHED_STATEMENTS,
+                 pragmas=DEFAULT_PRAGMAS, timeout=30.0, cache=None):
+        self.paths = list(paths)
+        self.shards = [Database(path, pool_size, cached_statements, pragmas, timeout, cache) for path in self.paths]
+        for index, shard in enumerate(self.shards):
+            with shard.pool.connection() as conn:
+                info = conn.execute(f"SELECT ShardIndex, ShardCount FROM {SHARD_INFO}").fetchone()
+            if info != (index, len(self.paths)):
+                self.close()
+                raise ValueError(f"{shard.pool.path} is shard {info[0]} of {info[1]}, "
+                                 f"not shard {index} of {len(self.paths)}")
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards))
+        self._user_columns = ("UserID",) + User._fields[1:]
+        self._insert_user_sql = (f"INSERT INTO Users ({', '.join(self._user_columns)}) "
+                                 f"VALUES ({', '.join('?' for _ in self._user_columns)})")
+
+    def shard_index(self, user_id):
+        return shard_of(user_id, len(self.shards))
+
+    def for_user(self, user_id):
+        return self.shards[self.shard_index(user_id)]
+
+    # Next UserID from the sequence in shard 0
+    def new_user_id(self):
+        with self.shards[0].transaction("IMMEDIATE") as conn:
+            return conn.execute(f"UPDATE {SHARD_INFO} SET NextUserID = NextUserID + 1 "
+                                f"RETURNING NextUserID - 1").fetchone()[0]
+
+    # Insert a user into the shard that owns its (new) UserID and return the ID
+    def insert_user(self, **values):
+        user_id = values.pop("UserID", None) or self.new_user_id()
+        shard = self.for_user(user_id)
+        row = (user_id,) + shard.users._values(values)
+        with shard.transaction() as conn:
+            conn.execute(self._insert_user_sql, row)
+        return user_id
+
+    # Statement `number` of queries.sql for one user, on its shard
+    def user_query(self, number, user_id):
+        return self.for_user(user_id).user_query(number, user_id)
+
+    def profile(self, user_id, meal_day=None):
+        return self.for_user(user_id).profile(user_id, meal_day)
+
+    # Run one statement on every shard at once; returns the rows per shard
+    def scatter(self, sql, params=()):
+        def run(shard):
+            with shard.pool.connection() as conn:
+                return conn.execute(sql, params).fetchall()
+
+        return list(self._executor.map(run, self.shards))
+
+    # GROUP BY `key` across all shards. `aggregates` maps result names to
+    # (function, column) with function one of count, sum, avg, min or max;
+    # each shard returns partial sums and counts, merged here (an average is
+    # total sum / total count, not an average of averages). Returns
+    # {key value: {name: value}}.
+    def grouped(self, table, key, aggregates, where=None, params=()):
+        partial = []
+        for function, column in aggregates.values():
+            if function == "avg":
+                partial += [f"SUM({column})", f"COUNT({column})"]
+            elif function in ("count", "sum", "min", "max"):
+                partial.append(f"{function.upper()}({column})")
+            else:
+                raise ValueError(f"Unsupported aggregate: {function}")
+        condition = f" WHERE {where}" if where else ""
+        sql = f"SELECT {key}, {', '.join(partial)} FROM {table}{condition} GROUP BY {key}"
+        merged = {}
+        for rows in self.scatter(sql, params):
+            for row in rows:
+                current = merged.get(row[0])
+                values = list(row[1:])
+                if current is None:
+                    merged[row[0]] = values
+                    continue
+                i = 0
+                for function, _ in aggregates.values():
+                    if function in ("avg", "count", "sum"):
+                        for _ in range(2 if function == "avg" else 1):
+                            if values[i] is not None:
+                                current[i] = values[i] if current[i] is None else current[i] + values[i]
+                            i += 1
+                    else:
+                        pick = min if function == "min" else max
+                        if values[i] is not None:
+                            current[i] = values[i] if current[i] is None else pick(current[i], values[i])
+                        i += 1
+        result = {}
+        for group, values in merged.items():
+            out, i = {}, 0
+            for name, (function, _) in aggregates.items():
+                if function == "avg":
+                    out[name] = values[i] / values[i + 1] if values[i + 1] else None
+                    i += 2
+                else:
+                    out[name] = values[i]
+                    i += 1
+            result[group] = out
+        return result
+
+    # Total rows of a table over all shards
+    def count(self, table, where=None, params=()):
+        condition = f" WHERE {where}" if where else ""
+        return sum(rows[0][0] for rows in self.scatter(f"SELECT COUNT(*) FROM {table}{condition}", params))
+
+    def close(self):
+        if getattr(self, "_executor", None) is not None:
+            self._executor.shutdown()
+        for shard in self.shards:
+            shard.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
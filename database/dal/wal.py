@@ -0,0 +1,49 @@
+import os
+
+# Journaling profiles. journal_mode is stored in the database file (WAL stays
+# on for every later connection); synchronous and wal_autocheckpoint are
+# per-connection and must be applied by each writer.
+#
+#   rollback  the SQLite default: readers and the writer block each other and
+#             every commit fsyncs the journal and the database
+#   wal       readers never block the writer or each other; with
+#             synchronous=NORMAL a commit only appends to the WAL and fsyncs
+#             at checkpoints, which is durable against application crashes and
+#             loses at most the last transactions on power loss
+JOURNAL_PROFILES = {
+    "rollback": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "wal": {"journal_mode": "WAL", "synchronous": "NORMAL"},
+}
+
+# WAL pages written before SQLite checkpoints on commit (the SQLite default)
+DEFAULT_AUTOCHECKPOINT = 1000
+
+
+# Switch a database to a journaling profile and tune this connection. Pass
+# autocheckpoint=0 to turn automatic checkpoints off and run checkpoint()
+# yourself (GroupCommitWriter does this between batches). Returns the journal
+# mode now in effect.
+def apply_pragma_profile(conn, profile="wal", synchronous=None, autocheckpoint=DEFAULT_AUTOCHECKPOINT):
+    if profile not in JOURNAL_PROFILES:
+        raise ValueError(f"Unknown journal profile: {profile}")
+    settings = JOURNAL_PROFILES[profile]
+    mode = conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}").fetchone()[0]
+    conn.execute(f"PRAGMA synchronous = {synchronous or settings['synchronous']}")
+    if mode.lower() == "wal":
+        conn.execute(f"PRAGMA wal_autocheckpoint = {autocheckpoint}")
+    return mode.lower()
+
+
+# Copy WAL frames back into the database. PASSIVE never waits for readers;
+# TRUNCATE also waits for them and resets the WAL file to zero bytes.
+# Returns (busy, WAL frames, frames checkpointed).
+def checkpoint(conn, mode="PASSIVE"):
+    return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+
+# Size of the database's WAL file in bytes (0 when there is none)
+def wal_size(path):
+    try:
+        return os.path.getsize(path + "-wal")
+    except OSError:
+        return 0
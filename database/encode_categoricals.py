@@ -0,0 +1,359 @@
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+
+import benchmark
+
+# Categorical columns stored as integer codes, and the lookup table behind each
+CATEGORICAL = {
+    "Users": {"Gender": "Genders"},
+    "ExerciseLogs": {"ExerciseType": "ExerciseTypes", "Intensity": "Intensities"},
+    "GoalsAndProgress": {"GoalType": "GoalTypes"},
+    "NutritionLogs": {"MealName": "MealNames"},
+    "UserPreferences": {"FitnessGoal": "FitnessGoals"},
+}
+
+# Lookups whose codes are seeded in a fixed order so the code itself is
+# meaningful: Intensity codes are 1 = Low, 2 = Moderate, 3 = High, which makes
+# AVG(IntensityID) an average intensity level
+ORDINAL = {"Intensities": ("Low", "Moderate", "High")}
+
+# Suffix of the physical table that holds the encoded rows. The original
+# table name becomes a view with the original string columns.
+ENCODED_SUFFIX = "Encoded"
+
+
+def code_column(column):
+    return column + "ID"
+
+
+def encoded_table(table):
+    return table + ENCODED_SUFFIX
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _primary_key(conn, table):
+    for row in conn.execute(f"PRAGMA table_info({table})"):
+        if row[5]:
+            return row[1]
+    return None
+
+
+def is_encoded(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = 'ExerciseLogs'"
+    ).fetchone() is not None
+
+
+def lookup_ddl(column, lookup):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {lookup} (\n"
+        f"    {code_column(column)} INTEGER NOT NULL, \n"
+        f"    {column} VARCHAR(100) NOT NULL UNIQUE, \n"
+        f"    PRIMARY KEY ({code_column(column)})\n"
+        f");"
+    )
+
+
+# Point the foreign keys in a CREATE TABLE at the encoded tables: their
+# parents become views, which a foreign key cannot reference
+def _reference_encoded(sql):
+    for parent in CATEGORICAL:
+        sql = re.sub(rf"REFERENCES {parent}\b", f"REFERENCES {encoded_table(parent)}", sql)
+    return sql
+
+
+# CREATE TABLE for the encoded copy of a table, derived from its current
+# definition so constraints and the other columns stay exactly the same
+def encoded_table_ddl(conn, table):
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    sql = re.sub(rf"CREATE TABLE {table}\b", f"CREATE TABLE {encoded_table(table)}", sql, count=1)
+    sql = _reference_encoded(sql)
+    for column, lookup in CATEGORICAL[table].items():
+        sql = re.sub(
+            rf"(\n\s*){column}\s+[A-Za-z]+(\s*\([^)]*\))?",
+            rf"\g<1>{code_column(column)} INTEGER REFERENCES {lookup} ({code_column(column)})",
+            sql, count=1,
+        )
+    return sql + ";"
+
+
+# A view with the table's original name and columns that decodes the codes
+def view_ddl(conn, table, columns):
+    select = []
+    joins = []
+    for column in columns:
+        lookup = CATEGORICAL[table].get(column)
+        if lookup:
+            alias = lookup.lower()
+            select.append(f"{alias}.{column} AS {column}")
+            joins.append(
+                f"LEFT JOIN {lookup} {alias} ON {alias}.{code_column(column)} = e.{code_column(column)}"
+            )
+        else:
+            select.append(f"e.{column}")
+    return (
+        f"CREATE VIEW {table} AS\nSELECT " + ", ".join(select)
+        + f"\nFROM {encoded_table(table)} e\n" + "\n".join(joins) + ";"
+    )
+
+
+# INSTEAD OF triggers so existing INSERT/UPDATE/DELETE statements against the
+# view keep working; unseen category values are added to the lookup table.
+# Statements on a view report no lastrowid and no RETURNING rows, so callers
+# that need the new key pick it themselves (see dal.Repository.insert).
+def view_trigger_ddl(table, columns, pk):
+    def value(column, ref):
+        lookup = CATEGORICAL[table].get(column)
+        if not lookup:
+            return f"{ref}.{column}"
+        return f"(SELECT {code_column(column)} FROM {lookup} WHERE {column} = {ref}.{column})"
+
+    def register(ref):
+        return "".join(
+            f"    INSERT OR IGNORE INTO {lookup} ({column}) SELECT {ref}.{column} WHERE {ref}.{column} IS NOT NULL;\n"
+            for column, lookup in CATEGORICAL[table].items()
+        )
+
+    physical = [code_column(c) if c in CATEGORICAL[table] else c for c in columns]
+    encoded = encoded_table(table)
+    return [
+        f"CREATE TRIGGER trg_{table}_Insert INSTEAD OF INSERT ON {table}\nBEGIN\n"
+        + register("NEW")
+        + f"    INSERT INTO {encoded} ({', '.join(physical)})\n"
+        + f"    VALUES ({', '.join(value(c, 'NEW') for c in columns)});\nEND;",
+        f"CREATE TRIGGER trg_{table}_Update INSTEAD OF UPDATE ON {table}\nBEGIN\n"
+        + register("NEW")
+        + f"    UPDATE {encoded} SET "
+        + ", ".join(f"{p} = {value(c, 'NEW')}" for p, c in zip(physical, columns))
+        + f"\n    WHERE {pk} = OLD.{pk};\nEND;",
+        f"CREATE TRIGGER trg_{table}_Delete INSTEAD OF DELETE ON {table}\nBEGIN\n"
+        + f"    DELETE FROM {encoded} WHERE {pk} = OLD.{pk};\nEND;",
+    ]
+
+
+# A BEFORE/AFTER trigger of `table` moved onto its encoded table: the
+# UPDATE OF list names the code columns, and NEW.<column>/OLD.<column> read
+# the string back from the lookup table, so the trigger body is unchanged
+def encoded_trigger_ddl(table, sql):
+    encoded = encoded_table(table)
+    sql = re.sub(rf"\bON {table}\b", f"ON {encoded}", sql, count=1)
+
+    def update_of(match):
+        columns = match.group(1)
+        for column in CATEGORICAL[table]:
+            columns = re.sub(rf"\b{column}\b", code_column(column), columns)
+        return f"UPDATE OF {columns} ON {encoded}"
+
+    sql = re.sub(rf"UPDATE OF (.*?) ON {encoded}\b", update_of, sql, count=1, flags=re.S)
+    for column, lookup in CATEGORICAL[table].items():
+        code = code_column(column)
+        sql = re.sub(rf"\b(NEW|OLD)\.{column}\b", rf"(SELECT {column} FROM {lookup} WHERE {code} = \1.{code})", sql)
+    return sql
+
+
+# Convert the categorical columns of every table in CATEGORICAL to integer
+# codes in place. Each table is copied into <Table>Encoded in primary-key
+# order, its idx_* indexes are recreated on the code columns, and the original
+# table is replaced by a view of the same name. Foreign keys of the other
+# tables (SleepData, HealthMetrics, ...) are repointed at the encoded tables
+# by editing their CREATE TABLE text, which changes no stored data. Triggers
+# on the replaced tables would be dropped with them, so the full-text search
+# indexes are reinstalled on the encoded tables afterwards and every other
+# trigger (e.g. the UserStats ones) is recreated on its encoded table with
+# encoded_trigger_ddl. Returns the tables whose search index was reinstalled.
+def migrate(conn):
+    import search
+
+    if is_encoded(conn):
+        raise ValueError("database already uses the encoded layout")
+    tables = ", ".join(f"'{table}'" for table in CATEGORICAL)
+    searched = [table for table in search.SOURCES if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (search.search_table(table),)).fetchone()]
+    search_triggers = {name for table in searched for name in search.trigger_names(table)}
+    carried = [(table, sql) for name, table, sql in conn.execute(
+        f"SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({tables}) "
+        f"ORDER BY name") if name not in search_triggers]
+
+    # Foreign keys must be off while parents are dropped and recreated; the
+    # pragma is a no-op inside a transaction, so set it before BEGIN
+    enforced = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("BEGIN")
+    try:
+        for table in searched:
+            for sql in search.drop_ddl(table):
+                conn.execute(sql)
+        for table, categorical in CATEGORICAL.items():
+            for column, lookup in categorical.items():
+                conn.execute(lookup_ddl(column, lookup))
+                for value in ORDINAL.get(lookup, ()):
+                    conn.execute(f"INSERT OR IGNORE INTO {lookup} ({column}) VALUES (?)", (value,))
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {lookup} ({column}) "
+                    f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY {column}"
+                )
+
+            columns = _columns(conn, table)
+            pk = _primary_key(conn, table)
+            conn.execute(encoded_table_ddl(conn, table))
+            select = []
+            joins = []
+            for column in columns:
+                lookup = categorical.get(column)
+                if lookup:
+                    alias = lookup.lower()
+                    select.append(f"{alias}.{code_column(column)}")
+                    joins.append(f"LEFT JOIN {lookup} {alias} ON {alias}.{column} = t.{column}")
+                else:
+                    select.append(f"t.{column}")
+            conn.execute(
+                f"INSERT INTO {encoded_table(table)} SELECT {', '.join(select)} FROM {table} t "
+                + " ".join(joins) + f" ORDER BY t.{pk}"
+            )
+
+            indexes = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (table,),
+            ).fetchall()
+            conn.execute(f"DROP TABLE {table}")
+            for _, sql in indexes:
+                sql = re.sub(rf"\bON {table}\b", f"ON {encoded_table(table)}", sql, count=1)
+                for column in categorical:
+                    sql = re.sub(rf"\b{column}\b(?=[^(]*\)$)", code_column(column), sql)
+                conn.execute(sql)
+
+            conn.execute(view_ddl(conn, table, columns))
+            for sql in view_trigger_ddl(table, columns, pk):
+                conn.execute(sql)
+            for sql in (sql for owner, sql in carried if owner == table):
+                conn.execute(encoded_trigger_ddl(table, sql))
+
+        # The documented way to change only constraints: rewrite the stored
+        # CREATE TABLE text and bump schema_version so every connection
+        # reloads the schema
+        children = [(name, _reference_encoded(sql)) for name, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND sql IS NOT NULL").fetchall()
+            if _reference_encoded(sql) != sql]
+        if children:
+            version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            conn.execute("PRAGMA writable_schema = ON")
+            for name, sql in children:
+                conn.execute("UPDATE sqlite_master SET sql = ? WHERE type = 'table' AND name = ?", (sql, name))
+            conn.execute(f"PRAGMA schema_version = {version + 1}")
+            conn.execute("PRAGMA writable_schema = RESET")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.execute("PRAGMA writable_schema = RESET")
+        raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if enforced else 'OFF'}")
+    if searched:
+        search.install(conn, searched)
+    return searched
+
+
+# Bytes used by each table and index, from dbstat when SQLite was built with
+# it; None otherwise
+def object_sizes(conn):
+    try:
+        return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+    except sqlite3.OperationalError:
+        return None
+
+
+# Group-by and per-user queries run against both layouts by compare()
+COMPARISON_QUERIES = {
+    "group by exercise type": (
+        "SELECT ExerciseType, COUNT(*), AVG(CaloriesBurned) FROM ExerciseLogs GROUP BY ExerciseType",
+        "SELECT t.ExerciseType, g.n, g.calories FROM ("
+        "SELECT ExerciseTypeID, COUNT(*) AS n, AVG(CaloriesBurned) AS calories "
+        "FROM ExerciseLogsEncoded GROUP BY ExerciseTypeID) g "
+        "JOIN ExerciseTypes t ON t.ExerciseTypeID = g.ExerciseTypeID",
+    ),
+    "group by gender": (
+        "SELECT Gender, COUNT(*), AVG(Age) FROM Users GROUP BY Gender",
+        "SELECT d.Gender, g.n, g.age FROM ("
+        "SELECT GenderID, COUNT(*) AS n, AVG(Age) AS age FROM UsersEncoded GROUP BY GenderID) g "
+        "JOIN Genders d ON d.GenderID = g.GenderID",
+    ),
+    "average intensity (query 9)": (
+        "SELECT AVG(CASE Intensity WHEN 'Low' THEN 1 WHEN 'Moderate' THEN 2 WHEN 'High' THEN 3 END) "
+        "FROM ExerciseLogs WHERE UserID = 1",
+        "SELECT AVG(IntensityID) FROM ExerciseLogsEncoded WHERE UserID = 1",
+    ),
+    "user exercise logs via view (query 1)": (
+        "SELECT ExerciseType, DurationMinutes, CaloriesBurned FROM ExerciseLogs WHERE UserID = 1",
+        "SELECT ExerciseType, DurationMinutes, CaloriesBurned FROM ExerciseLogs WHERE UserID = 1",
+    ),
+}
+
+
+# Copy the database twice, migrate one copy, VACUUM both and report sizes and
+# query latency for the string and encoded layouts
+def compare(db_path, iterations=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, "plain.db")
+        encoded_path = os.path.join(tmp, "encoded.db")
+        shutil.copyfile(db_path, plain_path)
+        shutil.copyfile(db_path, encoded_path)
+
+        conn = sqlite3.connect(encoded_path)
+        migrate(conn)
+        conn.close()
+
+        sizes = {}
+        for label, path in (("plain", plain_path), ("encoded", encoded_path)):
+            conn = sqlite3.connect(path)
+            conn.execute("VACUUM")
+            sizes[label] = (os.path.getsize(path), object_sizes(conn))
+            conn.close()
+
+        timings = []
+        for name, (plain_sql, encoded_sql) in COMPARISON_QUERIES.items():
+            plain = benchmark.measure(plain_path, name, plain_sql, iterations=iterations, warmup=2)
+            encoded = benchmark.measure(encoded_path, name, encoded_sql, iterations=iterations, warmup=2)
+            timings.append((name, plain["p50_ms"], encoded["p50_ms"]))
+    return sizes, timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dictionary-encode the categorical columns")
+    parser.add_argument("command", choices=("migrate", "compare"))
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        conn = sqlite3.connect(args.db, isolation_level=None)
+        searched = migrate(conn)
+        conn.execute("VACUUM")
+        conn.close()
+        print("Migrated to the encoded layout")
+        if searched:
+            print(f"Reinstalled full-text search on: {', '.join(searched)}")
+        return
+
+    sizes, timings = compare(args.db, args.iterations)
+    plain_bytes, plain_objects = sizes["plain"]
+    encoded_bytes, encoded_objects = sizes["encoded"]
+    print(f"File size: {plain_bytes / 2**20:.1f} MiB -> {encoded_bytes / 2**20:.1f} MiB "
+          f"({encoded_bytes / plain_bytes - 1:+.0%})")
+    if plain_objects and encoded_objects:
+        for table in CATEGORICAL:
+            before = plain_objects.get(table, 0)
+            after = encoded_objects.get(encoded_table(table), 0)
+            print(f"  {table:<17} {before / 2**20:8.1f} MiB -> {after / 2**20:8.1f} MiB")
+    for name, plain, encoded in timings:
+        print(f"{name:<38} p50 {plain:.3f}ms -> {encoded:.3f}ms ({plain / encoded if encoded else 0:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+-- Queries for databases that store timestamps as integer epoch seconds
+-- (generate_fake_data.py --epoch-timestamps or convert_timestamps.py --to epoch).
+-- Window bounds are computed once with unixepoch(), so the comparisons stay
+-- integer range seeks on the (UserID, <timestamp>) indexes, and bucketing is
+-- integer arithmetic instead of date parsing.
+-- Benchmark with: python analysis.py --db <epoch db> --sql-file epoch_queries.sql --query epoch_queries
+
+-- Query 1: Retrieve the user's exercise logs for September 2023 for UserID 1
+SELECT ExerciseType, DurationMinutes, CaloriesBurned, datetime(DateTime, 'unixepoch') AS DateTime
+FROM ExerciseLogs
+WHERE UserID = 1
+  AND DateTime >= unixepoch('2023-09-01') AND DateTime < unixepoch('2023-10-01');
+
+-- Query 2: Retrieve the user's nutrition logs (meal name, food items, and meal time) for UserID 1 on '2023-10-01'
+SELECT MealName, FoodItems, datetime(MealTime, 'unixepoch') AS MealTime
+FROM NutritionLogs
+WHERE UserID = 1
+  AND MealTime >= unixepoch('2023-10-01') AND MealTime < unixepoch('2023-10-02');
+
+-- Query 3: Retrieve the user's sleep per night for September 2023 (sessions before noon count towards the previous night)
+SELECT date(SleepStartTime - 43200, 'unixepoch') AS Night,
+       SleepDurationMinutes, SleepQualityRating,
+       datetime(SleepStartTime, 'unixepoch') AS SleepStartTime,
+       datetime(SleepEndTime, 'unixepoch') AS SleepEndTime
+FROM SleepData
+WHERE UserID = 1
+  AND SleepStartTime >= unixepoch('2023-09-01 12:00:00') AND SleepStartTime < unixepoch('2023-10-01 12:00:00');
+
+-- Query 4: Total exercise minutes per week (weeks starting Monday) for UserID 1
+SELECT date(DateTime - (DateTime - 345600) % 604800, 'unixepoch') AS WeekStart,
+       SUM(DurationMinutes) AS TotalMinutes
+FROM ExerciseLogs
+WHERE UserID = 1
+GROUP BY WeekStart
+ORDER BY WeekStart;
+
+-- Query 5: Average sleep duration (hours) per day of the week for UserID 1
+SELECT strftime('%w', SleepStartTime - 43200, 'unixepoch') AS Weekday,
+       AVG(SleepDurationMinutes) / 60.0 AS AverageSleepHours
+FROM SleepData
+WHERE UserID = 1
+GROUP BY Weekday;
+
+-- Query 6: Readings at or above 140/90 (systolic OR diastolic) in the 30 days before 2024-01-01, across all users
+SELECT MetricID, UserID, SystolicBP, DiastolicBP, datetime(RecordedAt, 'unixepoch') AS RecordedAt
+FROM HealthMetrics
+WHERE (SystolicBP >= 140 OR DiastolicBP >= 90)
+  AND RecordedAt >= unixepoch('2024-01-01', '-30 days');
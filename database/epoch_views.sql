@@ -0,0 +1,30 @@
+-- Human-readable views for databases that store timestamps as integer epoch
+-- seconds (generate_fake_data.py --epoch-timestamps or
+-- convert_timestamps.py --to epoch). Queries should filter the base tables with
+-- integer bounds, e.g. DateTime >= unixepoch('2023-09-01'), so indexes can seek.
+
+CREATE VIEW IF NOT EXISTS ExerciseLogsReadable AS
+SELECT LogID, UserID, ExerciseType, DurationMinutes, Intensity,
+       datetime(DateTime, 'unixepoch') AS DateTime,
+       CaloriesBurned, DistanceCovered, HeartRate, WeightLiftedLbs
+FROM ExerciseLogs;
+
+CREATE VIEW IF NOT EXISTS HealthMetricsReadable AS
+SELECT MetricID, UserID, Weight, WaistCircumference, HipCircumference,
+       BodyFatPercentage, MuscleMass, BloodPressure, StepCount, SystolicBP, DiastolicBP,
+       datetime(RecordedAt, 'unixepoch') AS RecordedAt
+FROM HealthMetrics;
+
+CREATE VIEW IF NOT EXISTS NutritionLogsReadable AS
+SELECT LogID, UserID, MealName, FoodItems,
+       datetime(MealTime, 'unixepoch') AS MealTime
+FROM NutritionLogs;
+
+-- A sleep session belongs to the night it started on; sessions that start
+-- after midnight but before noon count towards the previous evening
+CREATE VIEW IF NOT EXISTS SleepDataReadable AS
+SELECT SleepID, UserID, SleepDurationMinutes, SleepQualityRating,
+       datetime(SleepStartTime, 'unixepoch') AS SleepStartTime,
+       datetime(SleepEndTime, 'unixepoch') AS SleepEndTime,
+       date(SleepStartTime - 43200, 'unixepoch') AS Night
+FROM SleepData;
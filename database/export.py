@@ -0,0 +1,319 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+
+import bulk_load
+import timeutil
+
+# Rows fetched and written per step
+DEFAULT_BATCH_SIZE = 10000
+
+FORMATS = ("csv", "jsonl", "parquet", "arrow")
+
+# Columnar formats cannot be appended to once closed, so they are written as
+# numbered part files (output, output.part1, ...)
+_COLUMNAR = ("parquet", "arrow")
+
+
+# Rows per Parquet/Arrow part file. Parts are closed (and checkpointed) when
+# full, so an interrupted columnar export resumes at the last complete part.
+DEFAULT_PART_ROWS = 1000000
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# WHERE clause and parameters for the optional filters. The time window uses
+# the table's first timestamp column and is half-open, [start, end).
+def _filters(table, users=None, window=None):
+    clauses, params = [], []
+    if users is not None:
+        clauses.append("UserID BETWEEN ? AND ?")
+        params += list(users)
+    if window is not None:
+        if table not in timeutil.TEMPORAL_COLUMNS:
+            raise ValueError(f"{table} has no timestamp column to filter on")
+        column = timeutil.TEMPORAL_COLUMNS[table][0]
+        start, end = window
+        if start is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{column} < ?")
+            params.append(end)
+    return clauses, params
+
+
+# The column pages are keyed on: the table's primary key, or for a view (the
+# encoded and partitioned ExerciseLogs layouts) its first column, provided
+# that is the primary key of every table the view reads FROM. Views without
+# one raise rather than paging on their always-NULL rowid.
+def page_key(conn, table):
+    row = conn.execute("SELECT type, sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    if row is None or row[0] != "view":
+        return bulk_load.primary_key(conn, table)
+    first = _columns(conn, table)[0]
+    sources = set(re.findall(r"\bFROM\s+(\w+)", row[1], re.IGNORECASE))
+    if sources and all(bulk_load.primary_key(conn, source) == first for source in sources):
+        return first
+    raise ValueError(f"cannot page through view {table}: its first column is not the key of its tables")
+
+
+# Walk `table` in primary-key order, `batch_size` rows at a time. Each page is
+# its own short query (WHERE pk > last ORDER BY pk LIMIT n), so no read
+# transaction stays open and memory holds one page at most. Yields lists of
+# row tuples.
+def pages(conn, table, columns=None, users=None, window=None, batch_size=DEFAULT_BATCH_SIZE, after=None):
+    key = page_key(conn, table)
+    columns = columns or _columns(conn, table)
+    select = list(columns) if key in columns else [key] + list(columns)
+    clauses, params = _filters(table, users, window)
+    where = " AND ".join([f"{key} > ?"] + clauses)
+    sql = f"SELECT {', '.join(select)} FROM {table} WHERE {where} ORDER BY {key} LIMIT ?"
+    key_index = select.index(key)
+    strip = key not in columns
+    last = after if after is not None else -2**63
+    while True:
+        cursor = conn.execute(sql, [last] + params + [batch_size])
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        last = rows[-1][key_index]
+        if last is None:
+            raise ValueError(f"{table}.{key} is NULL, cannot page on it")
+        yield last, [row[1:] for row in rows] if strip else rows
+        if len(rows) < batch_size:
+            return
+
+
+class _CsvWriter:
+    def __init__(self, path, columns, offset):
+        self.file = open(path, "r+" if offset else "w", newline="")
+        if offset:
+            self.file.seek(offset)
+            self.file.truncate()
+        self.writer = csv.writer(self.file)
+        if not offset:
+            self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class _JsonlWriter(_CsvWriter):
+    def __init__(self, path, columns, offset):
+        self.columns = columns
+        self.file = open(path, "r+" if offset else "w")
+        if offset:
+            self.file.seek(offset)
+            self.file.truncate()
+
+    def write(self, rows):
+        columns = self.columns
+        self.file.write("".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows))
+
+
+# True when a DATETIME column holds epoch integers rather than text
+def stores_epoch(conn, table, column):
+    sample = conn.execute(f"SELECT typeof({column}) FROM {table} WHERE {column} IS NOT NULL LIMIT 1").fetchone()
+    return bool(sample) and sample[0] == "integer"
+
+
+# (start, end) filter bounds from 'YYYY-MM-DD[ HH:MM:SS]' strings (either may
+# be None), converted to the storage format of the table's timestamp column
+def window_bounds(conn, table, since=None, until=None):
+    if table not in timeutil.TEMPORAL_COLUMNS:
+        raise ValueError(f"{table} has no timestamp column to filter on")
+    epoch = stores_epoch(conn, table, timeutil.TEMPORAL_COLUMNS[table][0])
+    return tuple(None if value is None else timeutil.window(value, value, epoch)[0] for value in (since, until))
+
+
+# Arrow type per column from the declared SQL type. DATETIME columns hold
+# text or epoch integers depending on how the database was built, so the
+# stored type of a sample value decides.
+def arrow_schema(conn, table, columns):
+    import pyarrow as pa
+
+    declared = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    fields = []
+    for column in columns:
+        kind = declared.get(column, "")
+        if kind.startswith("DATETIME"):
+            kind = "INTEGER" if stores_epoch(conn, table, column) else "TEXT"
+        if kind.startswith("INT"):
+            fields.append(pa.field(column, pa.int64()))
+        elif kind.startswith(("NUMERIC", "REAL", "FLOAT", "DOUBLE", "DECIMAL")):
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+class _ArrowWriter:
+    def __init__(self, path, fmt, schema):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.schema = schema
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self.writer = pq.ParquetWriter(path, schema)
+        else:
+            self.writer = pa.ipc.new_file(path, schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = [self.pa.array(values, type=field.type) for values, field in zip(columns, self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def flush(self):
+        return None
+
+    def close(self):
+        self.writer.close()
+
+
+def _part_path(output, part):
+    if part == 0:
+        return output
+    stem, suffix = os.path.splitext(output)
+    return f"{stem}.part{part}{suffix}"
+
+
+def _save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+# Stream `table` to `output` in `fmt`. With `checkpoint`, progress is saved as
+# the export goes: after every batch for CSV/JSONL (last primary key and file
+# offset) and after every completed part for Parquet/Arrow. A later call with
+# the same arguments resumes from there, discarding anything written after the
+# checkpoint. Returns {"rows", "seconds", "files", "resumed"} for this run.
+def export(conn, table, output, fmt="csv", columns=None, users=None, window=None,
+           batch_size=DEFAULT_BATCH_SIZE, checkpoint=None, part_rows=DEFAULT_PART_ROWS):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    columns = list(columns or _columns(conn, table))
+    state = load_checkpoint(checkpoint)
+    settings = {"table": table, "output": output, "format": fmt, "columns": columns,
+                "users": list(users) if users else None, "window": list(window) if window else None}
+    if state and {k: state.get(k) for k in settings} != settings:
+        raise ValueError(f"Checkpoint {checkpoint} belongs to a different export")
+    if state and state.get("done"):
+        return {"rows": 0, "seconds": 0.0, "files": state["files"], "resumed": True}
+    resumed = state is not None
+    state = state or dict(settings, last_key=None, offset=0, rows=0, files=[], done=False)
+    columnar = fmt in _COLUMNAR
+    schema = arrow_schema(conn, table, columns) if columnar else None
+
+    def open_writer():
+        if columnar:
+            return _ArrowWriter(_part_path(output, len(state["files"])), fmt, schema)
+        return (_CsvWriter if fmt == "csv" else _JsonlWriter)(output, columns, state["offset"])
+
+    start = time.perf_counter()
+    written = 0
+    in_part = 0
+    writer = open_writer()
+    try:
+        for last_key, rows in pages(conn, table, columns, users, window, batch_size, state["last_key"]):
+            writer.write(rows)
+            written += len(rows)
+            in_part += len(rows)
+            if columnar:
+                if in_part >= part_rows:
+                    writer.close()
+                    state["files"].append(_part_path(output, len(state["files"])))
+                    state.update(last_key=last_key, rows=state["rows"] + in_part)
+                    in_part = 0
+                    if checkpoint:
+                        _save_checkpoint(checkpoint, state)
+                    writer = open_writer()
+            elif checkpoint:
+                state.update(last_key=last_key, rows=state["rows"] + len(rows), offset=writer.flush(), files=[output])
+                _save_checkpoint(checkpoint, state)
+    finally:
+        writer.close()
+    if columnar and (in_part or not state["files"]):
+        state["files"].append(_part_path(output, len(state["files"])))
+    elif not columnar:
+        state["files"] = [output]
+    state["done"] = True
+    if checkpoint:
+        _save_checkpoint(checkpoint, state)
+    return {"rows": written, "seconds": time.perf_counter() - start, "files": state["files"], "resumed": resumed}
+
+
+def _peak_rss_mib():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a table to CSV, JSONL, Parquet or Arrow")
+    parser.add_argument("table")
+    parser.add_argument("output")
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: from the output extension")
+    parser.add_argument("--columns", help="comma-separated column list (default: all)")
+    parser.add_argument("--users", help="UserID range, e.g. 1-5000")
+    parser.add_argument("--since", help="start of the time window (inclusive), e.g. 2023-09-01")
+    parser.add_argument("--until", help="end of the time window (exclusive)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--checkpoint", help="progress file; rerun with the same arguments to resume")
+    parser.add_argument("--part-rows", type=int, default=DEFAULT_PART_ROWS, help="rows per Parquet/Arrow part file")
+    args = parser.parse_args(argv)
+    if args.format is None:
+        ext = os.path.splitext(args.output)[1].lstrip(".").lower()
+        args.format = {"json": "jsonl", "ndjson": "jsonl", "feather": "arrow", "ipc": "arrow"}.get(ext, ext)
+        if args.format not in FORMATS:
+            parser.error("cannot tell the format from the output name; pass --format")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    conn = sqlite3.connect(args.db)
+    users = tuple(int(v) for v in args.users.split("-")) if args.users else None
+    window = window_bounds(conn, args.table, args.since, args.until) if args.since or args.until else None
+    columns = args.columns.split(",") if args.columns else None
+    result = export(conn, args.table, args.output, args.format, columns, users, window,
+                    args.batch_size, args.checkpoint, args.part_rows)
+    conn.close()
+    rate = result["rows"] / result["seconds"] if result["seconds"] else 0.0
+    print(f"Exported {result['rows']:,} rows to {', '.join(result['files'])} "
+          f"in {result['seconds']:.2f}s ({rate:,.0f} rows/s)" + (" (resumed)" if result["resumed"] else ""))
+    peak = _peak_rss_mib()
+    if peak is not None:
+        print(f"Peak RSS {peak:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
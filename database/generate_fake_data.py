@@ -1,116 +1,316 @@
-import sqlite3
-from faker import Faker
+import argparse
+import os
 import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
+from faker import Faker
+
+import bulk_load
+import synthetic_data
+import timeutil
+
 # Initialize Faker
 fake = Faker()
 
-# Connect to the SQLite database
-conn = sqlite3.connect("health_fitness_app.db")
-cursor = conn.cursor()
-
-# Generate and insert fake data into Users table
-for _ in range(100):
-    username = fake.user_name()
-    age = random.randint(18, 70)
-    gender = random.choice(["Male", "Female"])
-    weight = round(random.uniform(100, 300), 2)
-    height = round(random.uniform(4.5, 7.0), 2)
-    contact_info = fake.email()
-
-    cursor.execute(
-        "INSERT INTO Users (UserName, Age, Gender, Weight, Height, ContactInfo) VALUES (?, ?, ?, ?, ?, ?)",
-        (username, age, gender, weight, height, contact_info),
-    )
-
-# Generate and insert fake data into ExerciseLogs table
-for user_id in range(1, 101):
-    for _ in range(10):
-        exercise_type = fake.random_element(elements=("Running", "Swimming", "Strength Training", "Cycling"))
-        duration_minutes = random.randint(10, 120)
-        intensity = fake.random_element(elements=("Low", "Moderate", "High"))
-        date_time = fake.date_time_between(
-            start_date="-1y", end_date="now", tzinfo=None
-        ).strftime("%Y-%m-%d %H:%M:%S")
-        calories_burned = round(random.uniform(100, 600), 2)
-        distance_covered = round(random.uniform(0.5, 10.0), 2)
-        heart_rate = random.randint(80, 200)
-        weight_lifted_lbs = round(random.uniform(0, 300), 2)
-
-        cursor.execute(
-            "INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes, Intensity, DateTime, CaloriesBurned, DistanceCovered, HeartRate, WeightLiftedLbs) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (user_id, exercise_type, duration_minutes, intensity, date_time, calories_burned, distance_covered, heart_rate, weight_lifted_lbs),
-        )
-
-# Generate and insert fake data into GoalsAndProgress table
-for user_id in range(1, 101):
-    for _ in range(5):
-        goal_type = fake.random_element(elements=("Weight Loss", "Muscle Gain", "General Fitness"))
-        goal_value = round(random.uniform(5, 50), 2)
-        progress_value = round(random.uniform(0, goal_value), 2)
-
-        cursor.execute(
-            "INSERT INTO GoalsAndProgress (UserID, GoalType, GoalValue, ProgressValue) VALUES (?, ?, ?, ?)",
-            (user_id, goal_type, goal_value, progress_value),
-        )
-
-# Generate and insert fake data into HealthMetrics table
-for user_id in range(1, 101):
-    for _ in range(5):
+
+# Generate fake rows for the Users table
+def generate_users(num_users):
+    for _ in range(num_users):
+        username = fake.user_name()
+        age = random.randint(18, 70)
+        gender = random.choice(["Male", "Female"])
         weight = round(random.uniform(100, 300), 2)
-        waist_circumference = round(random.uniform(20, 50), 2)
-        hip_circumference = round(random.uniform(20, 60), 2)
-        body_fat_percentage = round(random.uniform(5, 30), 2)
-        muscle_mass = round(random.uniform(20, 80), 2)
-        blood_pressure = f"{random.randint(90, 140)}/{random.randint(60, 90)}"
-        step_count = random.randint(1000, 20000)
-
-        cursor.execute(
-            "INSERT INTO HealthMetrics (UserID, Weight, WaistCircumference, HipCircumference, BodyFatPercentage, MuscleMass, BloodPressure, StepCount) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (user_id, weight, waist_circumference, hip_circumference, body_fat_percentage, muscle_mass, blood_pressure, step_count),
-        )
-
-# Generate and insert fake data into NutritionLogs table
-for user_id in range(1, 101):
-    for _ in range(5):
-        meal_name = fake.random_element(elements=("Breakfast", "Lunch", "Dinner", "Snack"))
-        food_items = fake.sentence(nb_words=6)
-        meal_time = fake.date_time_between(
-            start_date="-1y", end_date="now", tzinfo=None
-        ).strftime("%Y-%m-%d %H:%M:%S")
-
-        cursor.execute(
-            "INSERT INTO NutritionLogs (UserID, MealName, FoodItems, MealTime) VALUES (?, ?, ?, ?)",
-            (user_id, meal_name, food_items, meal_time),
-        )
-
-# Generate and insert fake data into SleepData table
-for user_id in range(1, 101):
-    for _ in range(5):
-        sleep_duration_minutes = random.randint(240, 540)
-        sleep_quality_rating = random.randint(1, 5)
-        sleep_start_time = fake.date_time_between(
-            start_date="-1y", end_date="now", tzinfo=None
-        ).strftime("%H:%M:%S")
-        sleep_end_time = (datetime.strptime(sleep_start_time, "%H:%M:%S") + timedelta(minutes=sleep_duration_minutes)).strftime("%H:%M:%S")
-
-        cursor.execute(
-            "INSERT INTO SleepData (UserID, SleepDurationMinutes, SleepQualityRating, SleepStartTime, SleepEndTime) VALUES (?, ?, ?, ?, ?)",
-            (user_id, sleep_duration_minutes, sleep_quality_rating, sleep_start_time, sleep_end_time),
-        )
-
-# Generate and insert fake data into UserPreferences table
-for user_id in range(1, 101):
-    fitness_goal = fake.random_element(elements=("Lose Weight", "Build Muscle", "General Fitness"))
-    dietary_restrictions = fake.sentence(nb_words=6)
-    preferred_exercises = fake.sentence(nb_words=12)
-
-    cursor.execute(
-        "INSERT INTO UserPreferences (UserID, FitnessGoal, DietaryRestrictions, PreferredExercises) VALUES (?, ?, ?, ?)",
-        (user_id, fitness_goal, dietary_restrictions, preferred_exercises),
-    )
-
-# Commit and close the database connection
-conn.commit()
-conn.close()
+        height = round(random.uniform(4.5, 7.0), 2)
+        contact_info = fake.email()
+        yield (username, age, gender, weight, height, contact_info)
+
+
+# Generate fake rows for the ExerciseLogs table
+def generate_exercise_logs(num_users, per_user, epoch=False):
+    for user_id in range(1, num_users + 1):
+        for _ in range(per_user):
+            exercise_type = fake.random_element(elements=("Running", "Swimming", "Strength Training", "Cycling"))
+            duration_minutes = random.randint(10, 120)
+            intensity = fake.random_element(elements=("Low", "Moderate", "High"))
+            date_time = timeutil.format_timestamp(fake.date_time_between(
+                start_date="-1y", end_date="now", tzinfo=None
+            ), epoch)
+            calories_burned = round(random.uniform(100, 600), 2)
+            distance_covered = round(random.uniform(0.5, 10.0), 2)
+            heart_rate = random.randint(80, 200)
+            weight_lifted_lbs = round(random.uniform(0, 300), 2)
+            yield (user_id, exercise_type, duration_minutes, intensity, date_time, calories_burned,
+                   distance_covered, heart_rate, weight_lifted_lbs)
+
+
+# Generate fake rows for the GoalsAndProgress table
+def generate_goals(num_users, per_user):
+    for user_id in range(1, num_users + 1):
+        for _ in range(per_user):
+            goal_type = fake.random_element(elements=("Weight Loss", "Muscle Gain", "General Fitness"))
+            goal_value = round(random.uniform(5, 50), 2)
+            progress_value = round(random.uniform(0, goal_value), 2)
+            yield (user_id, goal_type, goal_value, progress_value)
+
+
+# Generate fake rows for the HealthMetrics table
+def generate_health_metrics(num_users, per_user, epoch=False):
+    for user_id in range(1, num_users + 1):
+        for _ in range(per_user):
+            weight = round(random.uniform(100, 300), 2)
+            waist_circumference = round(random.uniform(20, 50), 2)
+            hip_circumference = round(random.uniform(20, 60), 2)
+            body_fat_percentage = round(random.uniform(5, 30), 2)
+            muscle_mass = round(random.uniform(20, 80), 2)
+            systolic = random.randint(90, 160)
+            diastolic = random.randint(60, 100)
+            blood_pressure = f"{systolic}/{diastolic}"
+            step_count = random.randint(1000, 20000)
+            recorded_at = timeutil.format_timestamp(fake.date_time_between(
+                start_date="-1y", end_date="now", tzinfo=None
+            ), epoch)
+            yield (user_id, weight, waist_circumference, hip_circumference, body_fat_percentage,
+                   muscle_mass, blood_pressure, step_count, systolic, diastolic, recorded_at)
+
+
+# Generate fake rows for the NutritionLogs table
+def generate_nutrition_logs(num_users, per_user, epoch=False):
+    for user_id in range(1, num_users + 1):
+        for _ in range(per_user):
+            meal_name = fake.random_element(elements=("Breakfast", "Lunch", "Dinner", "Snack"))
+            food_items = fake.sentence(nb_words=6)
+            meal_time = timeutil.format_timestamp(fake.date_time_between(
+                start_date="-1y", end_date="now", tzinfo=None
+            ), epoch)
+            yield (user_id, meal_name, food_items, meal_time)
+
+
+# Generate fake rows for the SleepData table. Sessions start on a real night
+# between 21:00 and 01:00 and keep their full dates, so they can cross midnight.
+def generate_sleep_data(num_users, per_user, epoch=False):
+    for user_id in range(1, num_users + 1):
+        for _ in range(per_user):
+            sleep_duration_minutes = random.randint(240, 540)
+            sleep_quality_rating = random.randint(1, 5)
+            night = fake.date_between(start_date="-1y", end_date="today")
+            start = datetime(night.year, night.month, night.day, 21) + timedelta(minutes=random.randint(0, 240))
+            end = start + timedelta(minutes=sleep_duration_minutes)
+            yield (user_id, sleep_duration_minutes, sleep_quality_rating,
+                   timeutil.format_timestamp(start, epoch), timeutil.format_timestamp(end, epoch))
+
+
+# Generate fake rows for the UserPreferences table
+def generate_user_preferences(num_users):
+    for user_id in range(1, num_users + 1):
+        fitness_goal = fake.random_element(elements=("Lose Weight", "Build Muscle", "General Fitness"))
+        dietary_restrictions = fake.sentence(nb_words=6)
+        preferred_exercises = fake.sentence(nb_words=12)
+        yield (user_id, fitness_goal, dietary_restrictions, preferred_exercises)
+
+
+# (table, columns, rows) for every table, in foreign-key order
+def table_loads(args):
+    if args.engine == "numpy":
+        return numpy_table_loads(args)
+    return [
+        ("Users", ("UserName", "Age", "Gender", "Weight", "Height", "ContactInfo"),
+         generate_users(args.users)),
+        ("ExerciseLogs", ("UserID", "ExerciseType", "DurationMinutes", "Intensity", "DateTime",
+                          "CaloriesBurned", "DistanceCovered", "HeartRate", "WeightLiftedLbs"),
+         generate_exercise_logs(args.users, args.logs_per_user, args.epoch_timestamps)),
+        ("GoalsAndProgress", ("UserID", "GoalType", "GoalValue", "ProgressValue"),
+         generate_goals(args.users, args.goals_per_user)),
+        ("HealthMetrics", ("UserID", "Weight", "WaistCircumference", "HipCircumference",
+                           "BodyFatPercentage", "MuscleMass", "BloodPressure", "StepCount",
+                           "SystolicBP", "DiastolicBP", "RecordedAt"),
+         generate_health_metrics(args.users, args.metrics_per_user, args.epoch_timestamps)),
+        ("NutritionLogs", ("UserID", "MealName", "FoodItems", "MealTime"),
+         generate_nutrition_logs(args.users, args.meals_per_user, args.epoch_timestamps)),
+        ("SleepData", ("UserID", "SleepDurationMinutes", "SleepQualityRating", "SleepStartTime", "SleepEndTime"),
+         generate_sleep_data(args.users, args.sleep_per_user, args.epoch_timestamps)),
+        ("UserPreferences", ("UserID", "FitnessGoal", "DietaryRestrictions", "PreferredExercises"),
+         generate_user_preferences(args.users)),
+    ]
+
+
+# Same as table_loads, but built column-at-a-time by the seeded NumPy engine.
+# Primary keys are generated too, so a given scale factor and seed always
+# produce the same database.
+def numpy_table_loads(args):
+    dataset = synthetic_dataset(args)
+    return [(table, columns, dataset.rows(table)) for table, columns in synthetic_data.COLUMNS.items()]
+
+
+def synthetic_dataset(args):
+    means = {
+        "ExerciseLogs": args.logs_per_user,
+        "GoalsAndProgress": args.goals_per_user,
+        "HealthMetrics": args.metrics_per_user,
+        "NutritionLogs": args.meals_per_user,
+        "SleepData": args.sleep_per_user,
+    }
+    return synthetic_data.SyntheticDataset(args.scale_factor, args.seed, users=args.users, means=means,
+                                           epoch=args.epoch_timestamps)
+
+
+# Split the dataset's user blocks into at most `workers` contiguous UserID ranges
+def shard_ranges(dataset, workers):
+    blocks = list(dataset.blocks())
+    per_shard, extra = divmod(len(blocks), workers)
+    ranges = []
+    start = 0
+    for i in range(workers):
+        size = per_shard + (1 if i < extra else 0)
+        if size == 0:
+            break
+        first_user = blocks[start] * synthetic_data.BLOCK_USERS + 1
+        last_user = min((blocks[start + size - 1] + 1) * synthetic_data.BLOCK_USERS, dataset.users)
+        ranges.append((first_user, last_user))
+        start += size
+    return ranges
+
+
+# Worker: generate one UserID range into its own shard database (tables only,
+# no indexes, no journal). Runs in a separate process.
+def write_shard(path, args, first_user, last_user):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    bulk_load.ensure_schema(conn)
+    bulk_load.drop_indexes(conn)
+    dataset = synthetic_dataset(args)
+    start = time.perf_counter()
+    with bulk_load.load_pragmas(conn, "OFF", "OFF", args.cache_size):
+        for table, columns in synthetic_data.COLUMNS.items():
+            bulk_load.bulk_insert(conn, table, columns, dataset.rows(table, first_user, last_user), args.chunk_size)
+    conn.close()
+    return path, time.perf_counter() - start
+
+
+# The numpy engine writes its own primary keys (1..n per table), so it can only
+# fill empty tables; stop before loading anything rather than failing on the
+# first duplicate key part way through
+def require_empty(conn, db_path):
+    for table in synthetic_data.TABLES:
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            conn.close()
+            raise SystemExit(f"{db_path}: {table} is not empty; the numpy engine needs an empty database")
+
+
+# Generate the numpy dataset with a process pool, one shard file per worker,
+# then merge the shards into args.db and build the indexes once
+def generate_sharded(args):
+    conn = sqlite3.connect(args.db)
+    if bulk_load.ensure_schema(conn):
+        print("Created tables from base.sql")
+    require_empty(conn, args.db)
+    conn.close()
+
+    dataset = synthetic_dataset(args)
+    ranges = shard_ranges(dataset, args.workers)
+    base, _ = os.path.splitext(args.db)
+    paths = [f"{base}.shard{i}.db" for i in range(len(ranges))]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = [
+            pool.submit(write_shard, path, args, first_user, last_user)
+            for path, (first_user, last_user) in zip(paths, ranges)
+        ]
+        for future, (first_user, last_user) in zip(futures, ranges):
+            path, seconds = future.result()
+            print(f"Shard {path} (users {first_user}-{last_user}) written in {seconds:.2f}s")
+    print(f"Generated {len(paths)} shards in {time.perf_counter() - start:.2f}s")
+
+    conn = sqlite3.connect(args.db)
+    with bulk_load.load_pragmas(conn, args.journal_mode, args.synchronous, args.cache_size):
+        dropped = bulk_load.drop_indexes(conn)
+        try:
+            for table, (count, seconds) in bulk_load.merge_shards(conn, paths, synthetic_data.TABLES).items():
+                print(bulk_load.format_rate(f"{table} (merge)", count, seconds))
+        finally:
+            seconds = bulk_load.rebuild_indexes(conn, dropped)
+            print(f"Built {len(dropped)} indexes in {seconds:.2f}s")
+    conn.close()
+
+    for path in paths:
+        os.remove(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Populate the health & fitness database with fake data")
+    parser.add_argument("--db", default="health_fitness_app.db", help="SQLite database file")
+    parser.add_argument("--engine", choices=("faker", "numpy"), default=None,
+                        help="row generator (default: numpy when --scale-factor is given, else faker)")
+    parser.add_argument("--scale-factor", type=float, default=None,
+                        help=f"numpy engine dataset size; 1 = {synthetic_data.USERS_PER_SCALE:,} users")
+    parser.add_argument("--seed", type=int, default=0, help="numpy engine random seed")
+    parser.add_argument("--users", type=int, default=None,
+                        help="number of users (default 100, or derived from --scale-factor)")
+    parser.add_argument("--logs-per-user", type=int, default=10,
+                        help="ExerciseLogs rows per user (an average for the numpy engine)")
+    parser.add_argument("--goals-per-user", type=int, default=5)
+    parser.add_argument("--metrics-per-user", type=int, default=5)
+    parser.add_argument("--meals-per-user", type=int, default=5)
+    parser.add_argument("--sleep-per-user", type=int, default=5)
+    parser.add_argument("--epoch-timestamps", action="store_true",
+                        help="store DateTime, MealTime, RecordedAt and sleep start/end as integer epoch seconds (UTC)")
+    parser.add_argument("--chunk-size", type=int, default=bulk_load.DEFAULT_CHUNK_SIZE,
+                        help="rows per executemany/transaction")
+    parser.add_argument("--journal-mode", default=bulk_load.DEFAULT_JOURNAL_MODE,
+                        help="journal_mode used during the load (e.g. MEMORY, OFF, WAL, DELETE)")
+    parser.add_argument("--synchronous", default=bulk_load.DEFAULT_SYNCHRONOUS,
+                        help="synchronous level used during the load (OFF, NORMAL, FULL)")
+    parser.add_argument("--cache-size", type=int, default=bulk_load.DEFAULT_CACHE_SIZE,
+                        help="cache_size used during the load (negative = KiB)")
+    parser.add_argument("--drop-indexes", action="store_true",
+                        help="drop the idx_* indexes before loading and rebuild them afterwards")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="generate shards in this many processes and merge them (numpy engine)")
+    args = parser.parse_args(argv)
+    if args.engine is None:
+        args.engine = "numpy" if args.scale_factor is not None or args.workers > 1 else "faker"
+    if args.workers > 1 and args.engine != "numpy":
+        parser.error("--workers requires the numpy engine")
+    if args.scale_factor is None:
+        args.scale_factor = 1
+    if args.users is None and args.engine == "faker":
+        args.users = 100
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1:
+        generate_sharded(args)
+        return
+
+    # Connect to the SQLite database
+    conn = sqlite3.connect(args.db)
+    if bulk_load.ensure_schema(conn):
+        print("Created tables from base.sql")
+    if args.engine == "numpy":
+        require_empty(conn, args.db)
+
+    with bulk_load.load_pragmas(conn, args.journal_mode, args.synchronous, args.cache_size):
+        dropped = bulk_load.drop_indexes(conn) if args.drop_indexes else []
+        # Rebuild the indexes even when the load fails part way, so an
+        # interrupted run never leaves the database without them
+        try:
+            for table, columns, rows in table_loads(args):
+                count, seconds = bulk_load.bulk_insert(conn, table, columns, rows, args.chunk_size)
+                print(bulk_load.format_rate(table, count, seconds))
+        finally:
+            if dropped:
+                seconds = bulk_load.rebuild_indexes(conn, dropped)
+                print(f"Rebuilt {len(dropped)} indexes in {seconds:.2f}s")
+
+    # Close the database connection
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import bulk_load
+import export
+import ingest
+import timeutil
+
+# Records converted and inserted per executemany
+DEFAULT_BATCH_SIZE = 10000
+
+# Rows per transaction. Large transactions amortize the commit; committed
+# batches survive if the import fails half way through.
+DEFAULT_COMMIT_ROWS = 500000
+
+# Seconds between progress callbacks
+PROGRESS_INTERVAL = 1.0
+
+FORMATS = ("csv", "jsonl")
+
+# Rejected record numbers kept per reason in the report
+_EXAMPLES = 5
+
+
+# One feed file, read lazily as dicts (CSV header row or one JSON object per
+# line). Gzipped files (.gz) are decompressed on the fly. `position` is the
+# number of bytes of the file read so far, for progress reporting.
+class Feed:
+    def __init__(self, path, fmt=None):
+        name = path[:-3] if path.endswith(".gz") else path
+        ext = os.path.splitext(name)[1].lstrip(".").lower()
+        self.format = fmt or {"json": "jsonl", "ndjson": "jsonl"}.get(ext, ext)
+        if self.format not in FORMATS:
+            raise ValueError(f"Cannot tell the feed format of {path}; pass fmt")
+        self.size = os.path.getsize(path)
+        self.raw = open(path, "rb")
+        stream = gzip.GzipFile(fileobj=self.raw) if path.endswith(".gz") else self.raw
+        self.text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+    @property
+    def position(self):
+        return self.raw.tell()
+
+    def __iter__(self):
+        if self.format == "csv":
+            return iter(csv.DictReader(self.text))
+        return (json.loads(line) for line in self.text if line.strip())
+
+    def close(self):
+        self.text.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _normalize(name):
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+# (source fields, table columns) for a feed. `mapping` ({field: column})
+# wins; other fields map onto columns with the same name ignoring case and
+# punctuation, so duration_minutes lands in DurationMinutes. The primary key
+# is only filled from an explicit mapping, since partner IDs would collide
+# with ours. Fields that match nothing are skipped.
+def resolve_mapping(conn, table, fields, mapping=None):
+    mapping = dict(mapping or {})
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    unknown = set(mapping.values()) - set(columns)
+    if unknown:
+        raise ValueError(f"{table} has no column {', '.join(sorted(unknown))}")
+    key = bulk_load.primary_key(conn, table)
+    by_name = {_normalize(c): c for c in columns if c != key or table == "UserPreferences"}
+    sources, targets = [], []
+    for field in fields:
+        column = mapping.get(field) or by_name.get(_normalize(field))
+        if column and column not in targets:
+            sources.append(field)
+            targets.append(column)
+    if not targets:
+        raise ValueError(f"No feed field maps onto a column of {table}")
+    return sources, targets
+
+
+# True when the database keeps timestamps as epoch integers, judged from the
+# table itself or, while it is still empty, from the other timestamped tables
+def stores_epoch(conn, table):
+    tables = [table] + [t for t in timeutil.TEMPORAL_COLUMNS if t != table]
+    for name in tables:
+        if name not in timeutil.TEMPORAL_COLUMNS:
+            continue
+        column = timeutil.TEMPORAL_COLUMNS[name][0]
+        if conn.execute(f"SELECT 1 FROM {name} WHERE {column} IS NOT NULL LIMIT 1").fetchone():
+            return export.stores_epoch(conn, name, column)
+    return False
+
+
+def _blank(value):
+    return value is None or value == ""
+
+
+def _to_int(value):
+    if _blank(value):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def _to_float(value):
+    if _blank(value):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _to_text(value):
+    return None if _blank(value) else value
+
+
+# Epoch seconds for an ISO 8601 string (T separator, fractional seconds,
+# Z or +hh:mm offsets) or an epoch number in seconds or milliseconds.
+# Unparseable values come back unchanged so validation can reject them.
+def _parse_timestamp(value):
+    if isinstance(value, str):
+        if value.isdigit():
+            value = int(value)
+        else:
+            try:
+                return timeutil.to_epoch(datetime.fromisoformat(value))
+            except ValueError:
+                return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value // 1000 if value > 100000000000 else value
+    return value
+
+
+def _timestamp_converter(epoch):
+    def convert(value):
+        if _blank(value):
+            return None
+        # Fast path: already in the text storage format
+        if not epoch and isinstance(value, str) and len(value) == 19 and value[10] == " ":
+            return value
+        parsed = _parse_timestamp(value)
+        if epoch or not isinstance(parsed, int):
+            return parsed
+        return timeutil.from_epoch(parsed)
+
+    return convert
+
+
+# One converter per column from the declared SQL type
+def converters(conn, table, columns, epoch=False):
+    declared = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    result = []
+    for column in columns:
+        kind = declared.get(column, "")
+        if kind.startswith("DATETIME"):
+            result.append(_timestamp_converter(epoch))
+        elif kind.startswith("INT"):
+            result.append(_to_int)
+        elif kind.startswith(("NUMERIC", "REAL", "FLOAT", "DOUBLE", "DECIMAL")):
+            result.append(_to_float)
+        else:
+            result.append(_to_text)
+    return result
+
+
+# Turn a batch of feed records into row tuples, one column at a time
+def convert_batch(records, sources, column_converters):
+    columns = [list(map(convert, (record.get(source) for record in records)))
+               for source, convert in zip(sources, column_converters)]
+    return list(zip(*columns))
+
+
+# Stream a feed file into `table`. Records are read lazily, converted and
+# inserted `batch_size` at a time, and committed every `commit_rows` rows, so
+# memory stays flat however large the file is. With `validate`, each batch
+# goes through ingest.ingest and bad records are rejected instead of failing
+# the import; without it, batches go straight to executemany. With
+# `defer_indexes`, the table's secondary indexes are dropped for the load and
+# rebuilt once at the end. `progress(stats)` is called about once a second.
+# Returns a report dict:
+#   {"table", "file", "received", "inserted", "rejected", "examples",
+#    "mapping", "seconds", "index_seconds"}
+# where "rejected" counts records per reason and "examples" keeps the first
+# few record numbers (0-based) for each reason.
+def import_feed(conn, path, table, mapping=None, fmt=None, batch_size=DEFAULT_BATCH_SIZE,
+                commit_rows=DEFAULT_COMMIT_ROWS, validate=True, defer_indexes=False,
+                epoch=None, progress=None):
+    start = time.perf_counter()
+    report = {"table": table, "file": path, "received": 0, "inserted": 0, "rejected": Counter(),
+              "examples": {}, "mapping": {}, "seconds": 0.0, "index_seconds": 0.0}
+    epoch = stores_epoch(conn, table) if epoch is None else epoch
+    dropped = bulk_load.drop_indexes(conn, [table]) if defer_indexes else []
+    last_report = start
+    try:
+        with Feed(path, fmt) as feed:
+            batches = bulk_load.chunked(feed, batch_size)
+            first = next(batches, [])
+            if not first:
+                return report
+            sources, columns = resolve_mapping(conn, table, list(first[0]), mapping)
+            report["mapping"] = dict(zip(sources, columns))
+            column_converters = converters(conn, table, columns, epoch)
+            known = ingest.load_known_users(conn) if validate and ingest.RULES.get(table, {}).get("user_fk") else None
+            sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+            uncommitted = 0
+            conn.execute("BEGIN")
+            try:
+                for records in _prepend(first, batches):
+                    rows = convert_batch(records, sources, column_converters)
+                    if validate:
+                        result = ingest.ingest(conn, table, columns, rows, batch_size, known_users=known)
+                        inserted = result["inserted"]
+                        for index, reason in result["rejected"].items():
+                            report["rejected"][reason] += 1
+                            examples = report["examples"].setdefault(reason, [])
+                            if len(examples) < _EXAMPLES:
+                                examples.append(report["received"] + index)
+                    else:
+                        conn.executemany(sql, rows)
+                        inserted = len(rows)
+                    report["received"] += len(rows)
+                    report["inserted"] += inserted
+                    uncommitted += len(rows)
+                    if uncommitted >= commit_rows:
+                        conn.commit()
+                        conn.execute("BEGIN")
+                        uncommitted = 0
+                    now = time.perf_counter()
+                    if progress and now - last_report >= PROGRESS_INTERVAL:
+                        last_report = now
+                        progress(_stats(report, feed, now - start))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            if progress:
+                progress(_stats(report, feed, time.perf_counter() - start))
+    finally:
+        if dropped:
+            report["index_seconds"] = bulk_load.rebuild_indexes(conn, dropped)
+        report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def _stats(report, feed, seconds):
+    return {
+        "received": report["received"],
+        "inserted": report["inserted"],
+        "fraction": feed.position / feed.size if feed.size else 1.0,
+        "seconds": seconds,
+        "rows_per_s": report["received"] / seconds if seconds else 0.0,
+    }
+
+
+def format_progress(stats):
+    return (f"{stats['received']:>12,} records {stats['fraction']:>6.1%} "
+            f"{stats['rows_per_s']:>10,.0f} rows/s {stats['seconds']:>7.1f}s")
+
+
+def format_report(report):
+    rate = report["received"] / report["seconds"] if report["seconds"] else 0.0
+    lines = [f"{report['file']} -> {report['table']}: {report['inserted']:,} of {report['received']:,} records "
+             f"inserted, {sum(report['rejected'].values()):,} rejected in {report['seconds']:.2f}s "
+             f"({rate:,.0f} records/s)"]
+    if report["index_seconds"]:
+        lines.append(f"  indexes rebuilt in {report['index_seconds']:.2f}s")
+    for reason, count in report["rejected"].most_common():
+        sample = ", ".join(str(i) for i in report["examples"][reason])
+        more = ", ..." if count > len(report["examples"][reason]) else ""
+        lines.append(f"  {count:>9,}  {reason}  (records {sample}{more})")
+    return "\n".join(lines)
+
+
+def parse_mapping(text):
+    mapping = {}
+    for pair in filter(None, (text or "").split(",")):
+        field, _, column = pair.partition("=")
+        mapping[field.strip()] = column.strip()
+    return mapping
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a CSV/JSONL device feed into a table")
+    parser.add_argument("feed", help="CSV or JSONL file, optionally gzipped")
+    parser.add_argument("table")
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+    parser.add_argument("--map", default="", help="field=Column pairs, e.g. duration=DurationMinutes,start=DateTime")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--commit-rows", type=int, default=DEFAULT_COMMIT_ROWS)
+    parser.add_argument("--no-validate", action="store_true", help="trusted feed: skip validation and bisection")
+    parser.add_argument("--defer-indexes", action="store_true", help="drop the table's indexes and rebuild at the end")
+    parser.add_argument("--fast", action="store_true", help="load-time PRAGMAs (no fsync, in-memory journal)")
+    parser.add_argument("--quiet", action="store_true", help="no progress lines")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    bulk_load.ensure_schema(conn)
+    progress = None if args.quiet else (lambda stats: print(format_progress(stats), file=sys.stderr))
+    options = dict(mapping=parse_mapping(args.map), fmt=args.format, batch_size=args.batch_size,
+                   commit_rows=args.commit_rows, validate=not args.no_validate,
+                   defer_indexes=args.defer_indexes, progress=progress)
+    if args.fast:
+        with bulk_load.load_pragmas(conn):
+            report = import_feed(conn, args.feed, args.table, **options)
+    else:
+        report = import_feed(conn, args.feed, args.table, **options)
+    conn.close()
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
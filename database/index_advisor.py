@@ -0,0 +1,329 @@
+import argparse
+import os
+import re
+import sqlite3
+import tempfile
+import time
+
+import benchmark
+import query_catalog
+
+# Functions that hide a column from the index when wrapped around it
+_WRAPPING_FUNCTIONS = ("DATE", "DATETIME", "STRFTIME", "JULIANDAY", "SUBSTR", "LOWER", "UPPER", "TRIM")
+_KEYWORDS = {"WHERE", "JOIN", "ON", "GROUP", "ORDER", "LIMIT", "INNER", "LEFT", "CROSS", "USING", "AS"}
+_QUALIFIED = r"(?:(\w+)\.)?(\w+)"
+
+# Widest covering index the advisor will propose
+MAX_INDEX_COLUMNS = 6
+
+
+# EXPLAIN QUERY PLAN detail lines for a statement
+def query_plan(conn, sql, params=()):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+# Names of the indexes a query plan reads, taken from its "USING [COVERING]
+# INDEX <name>" tokens so idx_T_A is not mistaken for idx_T_A_B
+def plan_indexes(plan):
+    return {match.group(1) for detail in plan
+            for match in [re.search(r"USING (?:COVERING )?INDEX (\w+)", detail)] if match}
+
+
+# Problems visible in a query plan: full table scans, temp B-tree sorts and
+# index lookups that still have to visit the table for every row
+def plan_issues(plan):
+    issues = []
+    for detail in plan:
+        if re.match(r"SCAN \w+$", detail) or re.match(r"SCAN \w+ USING INDEX", detail):
+            issues.append(("full scan", detail))
+        elif detail.startswith("USE TEMP B-TREE"):
+            issues.append(("temp b-tree", detail))
+        elif re.match(r"SEARCH \w+ USING INDEX", detail):
+            issues.append(("non-covering lookup", detail))
+    return issues
+
+
+def _strip_literals(sql):
+    return re.sub(r"'(?:[^']|'')*'", "?", sql)
+
+
+def _clause(text, keyword, stops):
+    match = re.search(keyword, text, re.I)
+    if not match:
+        return ""
+    rest = text[match.end():]
+    end = re.search("|".join(stops), rest, re.I) if stops else None
+    return rest[:end.start()] if end else rest
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _primary_key(conn, table):
+    for row in conn.execute(f"PRAGMA table_info({table})"):
+        if row[5]:
+            return row[1]
+    return None
+
+
+# Work out which columns of each table a query filters, sorts, groups and
+# projects on. Returns {alias: usage dict}. This is a heuristic reading of the
+# SQL text, which is good enough for the simple statements in this project;
+# every proposal is verified by measurement before it is recommended.
+def column_usage(conn, sql):
+    text = _strip_literals(sql)
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    aliases = {}
+    for match in re.finditer(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", text, re.I):
+        table, alias = match.group(1), match.group(2)
+        if table not in existing:
+            continue
+        if not alias or alias.upper() in _KEYWORDS:
+            alias = table
+        aliases[alias] = table
+
+    where = _clause(text, r"\bWHERE\b", [r"\bGROUP\s+BY\b", r"\bORDER\s+BY\b", r"\bLIMIT\b"])
+    group = _clause(text, r"\bGROUP\s+BY\b", [r"\bORDER\s+BY\b", r"\bLIMIT\b", r"\bHAVING\b"])
+    order = _clause(text, r"\bORDER\s+BY\b", [r"\bLIMIT\b"])
+
+    usage = {}
+    for alias, table in aliases.items():
+        columns = set(_table_columns(conn, table))
+
+        def owned(matches):
+            found = []
+            for qualifier, name in matches:
+                if name in columns and (qualifier in ("", None) or qualifier == alias) and name not in found:
+                    found.append(name)
+            return found
+
+        usage[alias] = {
+            "table": table,
+            "equality": owned(re.findall(_QUALIFIED + r"\s*(?:=|\bIN\b|\bIS\b)", where, re.I)),
+            "range": owned(re.findall(_QUALIFIED + r"\s*(?:<|>|\bBETWEEN\b)", where, re.I)),
+            "wrapped": owned(re.findall(
+                r"\b(?:%s)\s*\(\s*%s" % ("|".join(_WRAPPING_FUNCTIONS), _QUALIFIED), where, re.I)),
+            "group": owned(re.findall(_QUALIFIED, group)),
+            "order": owned(re.findall(_QUALIFIED, order)),
+            "referenced": owned(re.findall(_QUALIFIED, text)),
+        }
+    return usage
+
+
+# Composite and covering index proposals for one query, as
+# [(table, columns tuple)]
+def propose_indexes(conn, sql):
+    proposals = []
+    for usage in column_usage(conn, sql).values():
+        table = usage["table"]
+        pk = _primary_key(conn, table)
+        equality = [c for c in usage["equality"] if c != pk]
+        if not equality and pk in usage["equality"]:
+            continue
+        key = list(equality)
+        for column in usage["group"] + usage["order"] + usage["range"] + usage["wrapped"]:
+            if column not in key and column != pk:
+                key.append(column)
+        if not key:
+            continue
+        proposals.append((table, tuple(key)))
+        covering = key + [c for c in usage["referenced"] if c not in key and c != pk]
+        if len(covering) > len(key) and len(covering) <= MAX_INDEX_COLUMNS:
+            proposals.append((table, tuple(covering)))
+    return proposals
+
+
+# Warnings that cannot be fixed with an index alone
+def rewrite_hints(conn, sql):
+    hints = []
+    for usage in column_usage(conn, sql).values():
+        for column in usage["wrapped"]:
+            hints.append(
+                f"{usage['table']}.{column} is wrapped in a function; "
+                f"use a range predicate ({column} >= ? AND {column} < ?) so an index can seek on it"
+            )
+    return hints
+
+
+def index_name(table, columns):
+    return "idx_" + table + "_" + "_".join(columns)
+
+
+def _existing_index_columns(conn, table):
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list({table})"):
+        indexes.append(tuple(info[2] for info in conn.execute(f"PRAGMA index_info({row[1]})")))
+    return indexes
+
+
+# True when an existing index of `table` starts with `columns`: SQLite seeks
+# and sorts on any leading prefix of an index, so a (UserID,) proposal adds
+# nothing next to a (UserID, DateTime) index
+def is_redundant(conn, table, columns):
+    return any(index[:len(columns)] == tuple(columns) for index in _existing_index_columns(conn, table))
+
+
+def _used_pages(conn):
+    return conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+# Seconds to insert a sample of existing rows into `table`, best of `repeat`
+# runs. The inserts are rolled back so the table is left unchanged.
+def insert_cost(conn, table, rows=2000, repeat=3):
+    pk = _primary_key(conn, table)
+    columns = [c for c in _table_columns(conn, table) if c != pk]
+    sample = conn.execute(f"SELECT {', '.join(columns)} FROM {table} LIMIT ?", (rows,)).fetchall()
+    if not sample:
+        return None
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    best = None
+    for _ in range(repeat):
+        conn.commit()
+        start = time.perf_counter()
+        conn.executemany(sql, sample)
+        elapsed = time.perf_counter() - start
+        conn.rollback()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _p50(db_path, name, sql, iterations):
+    return benchmark.measure(db_path, name, sql, iterations=iterations, warmup=2)["p50_ms"]
+
+
+# Try every proposed index on a scratch copy of the database, one at a time,
+# and measure how much it speeds up the queries that asked for it and how
+# much it slows down inserts into its table
+def evaluate(db_path, queries, iterations=20, insert_rows=2000):
+    source = sqlite3.connect(db_path)
+    proposals = {}
+    report = []
+    for name, sql in queries.items():
+        plan = query_plan(source, sql)
+        entry = {
+            "name": name,
+            "plan": plan,
+            "issues": plan_issues(plan),
+            "hints": rewrite_hints(source, sql),
+        }
+        report.append(entry)
+        if not entry["issues"] and not entry["hints"]:
+            continue
+        for table, columns in propose_indexes(source, sql):
+            if is_redundant(source, table, columns):
+                continue
+            proposals.setdefault((table, columns), []).append(name)
+
+    fd, scratch_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    scratch = sqlite3.connect(scratch_path)
+    try:
+        source.backup(scratch)
+        source.close()
+
+        baseline = {name: _p50(scratch_path, name, queries[name], iterations)
+                    for names in proposals.values() for name in names}
+        base_insert = {}
+        candidates = []
+        for (table, columns), names in proposals.items():
+            if table not in base_insert:
+                base_insert[table] = insert_cost(scratch, table, insert_rows)
+            name = index_name(table, columns)
+            statement = f"CREATE INDEX {name} ON {table} ({', '.join(columns)});"
+            pages_before = _used_pages(scratch)
+            scratch.execute(statement)
+            scratch.commit()
+            size = (_used_pages(scratch) - pages_before) * scratch.execute("PRAGMA page_size").fetchone()[0]
+
+            used_by = [q for q in names if name in plan_indexes(query_plan(scratch, queries[q]))]
+            before = sum(baseline[q] for q in names)
+            after = sum(_p50(scratch_path, q, queries[q], iterations) for q in names)
+            write = insert_cost(scratch, table, insert_rows)
+            scratch.execute(f"DROP INDEX {name}")
+            scratch.commit()
+
+            write_overhead = (write / base_insert[table] - 1) if write and base_insert[table] else 0.0
+            candidates.append({
+                "statement": statement,
+                "table": table,
+                "columns": columns,
+                "queries": names,
+                "used_by": used_by,
+                "speedup": before / after if after else float("inf"),
+                "write_overhead": write_overhead,
+                "size_bytes": size,
+            })
+    finally:
+        scratch.close()
+        os.remove(scratch_path)
+    return report, candidates
+
+
+# Candidates that meet the thresholds, fastest first. A candidate whose
+# columns are a leading prefix of another qualifying candidate on the same
+# table that is used by the same queries is left out: the wider index
+# serves those queries already.
+def recommend(candidates, min_speedup=1.2, max_write_overhead=0.5):
+    eligible = [c for c in candidates if c["used_by"] and c["speedup"] >= min_speedup
+                and c["write_overhead"] <= max_write_overhead]
+
+    def widened(candidate):
+        columns = candidate["columns"]
+        return any(other["table"] == candidate["table"] and len(other["columns"]) > len(columns)
+                   and other["columns"][:len(columns)] == columns
+                   and set(candidate["used_by"]) <= set(other["used_by"]) for other in eligible)
+
+    return [c for c in sorted(eligible, key=lambda c: -c["speedup"]) if not widened(c)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Find plan problems and test index proposals")
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--iterations", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--insert-rows", type=int, default=2000, help="rows inserted to measure write cost")
+    parser.add_argument("--min-speedup", type=float, default=1.2)
+    parser.add_argument("--max-write-overhead", type=float, default=0.5,
+                        help="largest acceptable relative slowdown of inserts (0.5 = 50%%)")
+    parser.add_argument("--output", help="write the recommended CREATE INDEX statements to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    conn = sqlite3.connect(args.db)
+    epoch = query_catalog.stores_epoch(conn)
+    conn.close()
+    queries = dict(query_catalog.sql_file_registry(epoch=epoch))
+    queries.update(query_catalog.registry(epoch))
+
+    report, candidates = evaluate(args.db, queries, args.iterations, args.insert_rows)
+    for entry in report:
+        if not entry["issues"] and not entry["hints"]:
+            continue
+        print(entry["name"])
+        for kind, detail in entry["issues"]:
+            print(f"  {kind}: {detail}")
+        for hint in entry["hints"]:
+            print(f"  rewrite: {hint}")
+
+    print()
+    print(f"{'speedup':>8} {'writes':>8} {'size KiB':>9}  index")
+    for candidate in sorted(candidates, key=lambda c: -c["speedup"]):
+        print(f"{candidate['speedup']:>7.2f}x {candidate['write_overhead']:>+8.0%} "
+              f"{candidate['size_bytes'] / 1024:>9.0f}  {candidate['statement']}"
+              + ("" if candidate["used_by"] else "  (not used by the planner)"))
+
+    chosen = recommend(candidates, args.min_speedup, args.max_write_overhead)
+    print()
+    print("Recommended:" if chosen else "No index met the speedup/write-cost thresholds")
+    for candidate in chosen:
+        print(f"  {candidate['statement']}  -- {', '.join(candidate['used_by'])}")
+    if args.output:
+        with open(args.output, "w") as f:
+            for candidate in chosen:
+                f.write(candidate["statement"] + "\n")
+
+
+if __name__ == "__main__":
+    main()
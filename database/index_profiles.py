@@ -0,0 +1,166 @@
+import argparse
+import os
+import re
+import sqlite3
+import tempfile
+import time
+
+import bulk_load
+import query_catalog
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COVERING_SQL = os.path.join(HERE, "covering_indexes.sql")
+
+# Index sets a node can run with:
+#   default       every index in base.sql
+#   read-heavy    base.sql plus the covering variants from covering_indexes.sql
+#   ingest-heavy  only the base.sql indexes that the query catalog's plans use
+PROFILES = ("default", "read-heavy", "ingest-heavy")
+
+# Tables written by wearable syncs, used by the write benchmark
+INGEST_TABLES = ("ExerciseLogs", "HealthMetrics", "NutritionLogs", "SleepData")
+
+
+# The active query catalog: queries.sql plus the analysis.py pairs, with
+# windows in the storage format given by `epoch`
+def catalog_queries(epoch=False):
+    queries = dict(query_catalog.sql_file_registry(epoch=epoch))
+    queries.update(query_catalog.registry(epoch))
+    return queries
+
+
+# Names of the indexes that appear in the plans of `queries`
+def used_indexes(conn, queries):
+    used = set()
+    for sql in queries.values():
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+            match = re.search(r"USING (?:COVERING )?INDEX (\w+)", row[3])
+            if match:
+                used.add(match.group(1))
+    return used
+
+
+# {index name: CREATE INDEX statement} for a profile, worked out on an empty
+# in-memory copy of the schema
+def profile_indexes(profile, queries=None, epoch=False):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown index profile: {profile}")
+    conn = sqlite3.connect(":memory:")
+    try:
+        bulk_load.ensure_schema(conn)
+        if profile == "read-heavy":
+            with open(COVERING_SQL) as f:
+                conn.executescript(f.read())
+        indexes = dict(bulk_load.secondary_indexes(conn))
+        if profile == "ingest-heavy":
+            used = used_indexes(conn, catalog_queries(epoch) if queries is None else queries)
+            indexes = {name: sql for name, sql in indexes.items() if name in used}
+        return indexes
+    finally:
+        conn.close()
+
+
+# Drop the idx_* indexes that are not part of the profile and create the
+# missing ones in one transaction, so a failure leaves the indexes as they
+# were. Returns (dropped names, created names). Profiles index the
+# base.sql tables, so a database whose tables were turned into views by
+# partitions.py or encode_categoricals.py is refused before anything is
+# dropped; the idx_* indexes there belong to the partitions and *Encoded tables.
+def apply_profile(conn, profile, queries=None):
+    wanted = profile_indexes(profile, queries, query_catalog.stores_epoch(conn))
+    indexed = {re.search(r"\bON (\w+)", sql).group(1) for sql in wanted.values()}
+    views = sorted(name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view'")
+                   if name in indexed)
+    if views:
+        raise ValueError(f"cannot apply an index profile to a partitioned or encoded layout, "
+                         f"these tables are views: {', '.join(views)}")
+    current = dict(bulk_load.secondary_indexes(conn))
+    dropped = [name for name in current if name not in wanted]
+    created = [name for name in wanted if name not in current]
+    conn.execute("BEGIN")
+    try:
+        for name in dropped:
+            conn.execute(f"DROP INDEX {name}")
+        for name in created:
+            conn.execute(wanted[name])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return dropped, created
+
+
+# Insert the same rows into a fresh database for each profile, committing every
+# `batch_size` rows like a device sync would, and record insert throughput and
+# the resulting file size. Returns [{profile, table, rows, seconds, rows_per_s,
+# size_bytes}], with one "total" row per profile.
+def write_benchmark(profiles=PROFILES, scale_factor=1, seed=0, batch_size=100, tables=INGEST_TABLES):
+    import synthetic_data
+
+    dataset = synthetic_data.SyntheticDataset(scale_factor, seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in profiles:
+            path = os.path.join(tmp, f"{profile}.db")
+            conn = sqlite3.connect(path)
+            bulk_load.ensure_schema(conn)
+            apply_profile(conn, profile)
+            total_rows, total_seconds = 0, 0.0
+            for table in tables:
+                start = time.perf_counter()
+                rows, _ = bulk_load.bulk_insert(
+                    conn, table, synthetic_data.COLUMNS[table], dataset.rows(table), chunk_size=batch_size
+                )
+                seconds = time.perf_counter() - start
+                total_rows += rows
+                total_seconds += seconds
+                results.append({"profile": profile, "table": table, "rows": rows, "seconds": seconds,
+                                "rows_per_s": rows / seconds if seconds else 0.0, "size_bytes": None})
+            conn.close()
+            results.append({"profile": profile, "table": "total", "rows": total_rows, "seconds": total_seconds,
+                            "rows_per_s": total_rows / total_seconds if total_seconds else 0.0,
+                            "size_bytes": os.path.getsize(path)})
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Index profiles and write-amplification benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    show = sub.add_parser("show", help="list the indexes of a profile")
+    show.add_argument("--profile", choices=PROFILES, default="ingest-heavy")
+
+    apply = sub.add_parser("apply", help="switch a database to a profile")
+    apply.add_argument("--db", default="health_fitness_app.db")
+    apply.add_argument("--profile", choices=PROFILES, required=True)
+
+    bench = sub.add_parser("bench", help="measure insert throughput and file size per profile")
+    bench.add_argument("--profile", choices=PROFILES, action="append",
+                       help="profile to measure (repeatable, default: all)")
+    bench.add_argument("--scale-factor", type=float, default=1)
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--batch-size", type=int, default=100, help="rows per committed transaction")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "show":
+        for sql in profile_indexes(args.profile).values():
+            print(sql + ";")
+    elif args.command == "apply":
+        conn = sqlite3.connect(args.db)
+        dropped, created = apply_profile(conn, args.profile)
+        conn.close()
+        print(f"Dropped {len(dropped)} indexes: {', '.join(dropped) or '-'}")
+        print(f"Created {len(created)} indexes: {', '.join(created) or '-'}")
+    else:
+        results = write_benchmark(args.profile or PROFILES, args.scale_factor, args.seed, args.batch_size)
+        print(f"{'profile':<13} {'table':<14} {'rows':>9} {'rows/s':>10} {'size MiB':>9}")
+        for r in results:
+            size = f"{r['size_bytes'] / 2**20:9.1f}" if r["size_bytes"] is not None else ""
+            print(f"{r['profile']:<13} {r['table']:<14} {r['rows']:>9,} {r['rows_per_s']:>10,.0f} {size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import sqlite3
+import time
+from collections import Counter
+
+import numpy as np
+
+import bulk_load
+import timeutil
+
+# Rows per SAVEPOINT-scoped executemany
+DEFAULT_CHUNK_SIZE = 1000
+
+# Validation rules per table:
+#   required  columns that must not be NULL
+#   ranges    {column: (low, high)} inclusive bounds for numeric columns
+#   user_fk   UserID must exist in Users
+# Timestamp columns (timeutil.TEMPORAL_COLUMNS) must be epoch integers or
+# 'YYYY-MM-DD[ HH:MM:SS]' text. Anything the rules miss is still caught by the
+# database's own constraints and isolated by bisection.
+RULES = {
+    "Users": {
+        "required": ("UserName",),
+        "ranges": {"Age": (0, 130), "Weight": (0, 1500), "Height": (0, 10)},
+    },
+    "ExerciseLogs": {
+        "required": ("UserID",),
+        "ranges": {"DurationMinutes": (0, 1440), "CaloriesBurned": (0, 20000), "DistanceCovered": (0, 1000),
+                   "HeartRate": (20, 250), "WeightLiftedLbs": (0, 5000)},
+        "user_fk": True,
+    },
+    "GoalsAndProgress": {
+        "required": ("UserID",),
+        "ranges": {"GoalValue": (0, 100000), "ProgressValue": (0, 100000)},
+        "user_fk": True,
+    },
+    "HealthMetrics": {
+        "required": ("UserID",),
+        "ranges": {"Weight": (0, 1500), "WaistCircumference": (0, 200), "HipCircumference": (0, 200),
+                   "BodyFatPercentage": (0, 100), "MuscleMass": (0, 1000), "StepCount": (0, 200000),
+                   "SystolicBP": (40, 300), "DiastolicBP": (20, 200)},
+        "user_fk": True,
+    },
+    "NutritionLogs": {
+        "required": ("UserID",),
+        "ranges": {},
+        "user_fk": True,
+    },
+    "SleepData": {
+        "required": ("UserID",),
+        "ranges": {"SleepDurationMinutes": (0, 1440), "SleepQualityRating": (1, 5)},
+        "user_fk": True,
+    },
+    "UserPreferences": {
+        "required": ("UserID",),
+        "ranges": {},
+        "user_fk": True,
+    },
+}
+
+
+def _as_float(value):
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_as_float_column = np.frompyfunc(_as_float, 1, 1)
+
+
+# Mask of values that are epoch integers (or digit strings, which SQLite's
+# NUMERIC affinity stores as integers) or 'YYYY-MM-DD[ HH:MM[:SS]]' text,
+# checked on the UTF-32 code points of the whole column at once
+def _timestamp_mask(column):
+    text = np.asarray(column, dtype=str)
+    length = np.char.str_len(text)
+    if text.dtype.itemsize < 19 * 4:
+        text = text.astype("U19")
+    codes = text.view(np.uint32).reshape(len(text), -1)[:, :19]
+    digit = (codes >= 48) & (codes <= 57)
+    date = (length >= 10) & digit[:, [0, 1, 2, 3, 5, 6, 8, 9]].all(axis=1) & (codes[:, 4] == 45) & (codes[:, 7] == 45)
+    clock = (codes[:, 10] == 32) & digit[:, [11, 12, 14, 15]].all(axis=1) & (codes[:, 13] == 58)
+    seconds = (codes[:, 16] == 58) & digit[:, [17, 18]].all(axis=1)
+    dated = date & ((length == 10) | ((length == 16) & clock) | ((length == 19) & clock & seconds))
+    epoch = (length >= 1) & (length <= 12) & (digit | (np.arange(19) >= length[:, None])).all(axis=1)
+    return dated | epoch
+
+
+# Numeric view of a column: (values as float64 with NaN for NULL, mask of
+# values that are not numbers at all). Clean columns convert in one call.
+def _numeric(column):
+    try:
+        return np.asarray(column, dtype=np.float64), np.zeros(len(column), dtype=bool)
+    except (TypeError, ValueError):
+        converted = _as_float_column(np.asarray(column, dtype=object))
+        bad = np.equal(converted, None)
+        converted[bad] = np.nan
+        return converted.astype(np.float64), bad
+
+
+# Check a batch column by column. Returns {row index: reason} for every row
+# that breaks a rule; the first failing rule per row is reported.
+def validate(table, columns, rows, known_users=None):
+    rules = RULES.get(table, {"required": (), "ranges": {}})
+    n = len(rows)
+    reasons = np.full(n, None, dtype=object)
+    if not n:
+        return {}
+    data = dict(zip(columns, (np.asarray(c, dtype=object) for c in zip(*rows))))
+
+    def flag(mask, reason):
+        mask = mask & np.equal(reasons, None)
+        reasons[mask] = reason
+
+    for column in rules["required"]:
+        if column in data:
+            flag(np.equal(data[column], None), f"{column}: missing")
+        else:
+            reasons[np.equal(reasons, None)] = f"{column}: missing"
+
+    for column, (low, high) in rules["ranges"].items():
+        if column not in data:
+            continue
+        values, not_numeric = _numeric(data[column])
+        flag(not_numeric, f"{column}: not a number")
+        with np.errstate(invalid="ignore"):
+            flag((values < low) | (values > high), f"{column}: out of range [{low}, {high}]")
+
+    for column in timeutil.TEMPORAL_COLUMNS.get(table, ()):
+        if column in data:
+            present = ~np.equal(data[column], None)
+            valid = _timestamp_mask(data[column])
+            flag(present & ~valid, f"{column}: not a timestamp")
+
+    if rules.get("user_fk") and known_users is not None and "UserID" in data:
+        ids, not_numeric = _numeric(data["UserID"])
+        flag(~not_numeric & ~np.isnan(ids) & ~np.isin(ids, known_users), "UserID: unknown user")
+
+    bad = np.flatnonzero(~np.equal(reasons, None))
+    return {int(i): reasons[i] for i in bad}
+
+
+# UserIDs in Users as a float array for np.isin
+def load_known_users(conn):
+    return np.fromiter((row[0] for row in conn.execute("SELECT UserID FROM Users")), dtype=np.float64)
+
+
+# Insert one chunk inside a savepoint. If it fails, roll back to the
+# savepoint and retry each half, down to single rows, which are rejected with
+# the database error. `indexes` are the rows' positions in the caller's batch.
+# Returns rows inserted.
+def _insert_chunk(conn, sql, rows, indexes, rejected, depth=0):
+    name = f"ingest_{depth}"
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        conn.executemany(sql, rows)
+    except sqlite3.DatabaseError as e:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        if len(rows) == 1:
+            rejected[indexes[0]] = f"database: {e}"
+            return 0
+        middle = len(rows) // 2
+        return (_insert_chunk(conn, sql, rows[:middle], indexes[:middle], rejected, depth + 1)
+                + _insert_chunk(conn, sql, rows[middle:], indexes[middle:], rejected, depth + 1))
+    conn.execute(f"RELEASE {name}")
+    return len(rows)
+
+
+# Validate a batch of row tuples (ordered like `columns`) and insert the valid
+# ones in one transaction, `chunk_size` rows per executemany. One bad row never
+# aborts the batch. Callers ingesting many batches can pass `known_users`
+# (from load_known_users) to skip the Users lookup per batch. With a
+# dal.QueryCache, the cached queries of every user that received rows are
+# invalidated once the rows are committed. Returns a report dict:
+#   {"table", "received", "inserted", "rejected": {row index: reason}, "seconds"}
+def ingest(conn, table, columns, rows, chunk_size=DEFAULT_CHUNK_SIZE, check_users=True, known_users=None,
+           cache=None):
+    start = time.perf_counter()
+    rows = rows if isinstance(rows, list) else list(rows)
+    rules = RULES.get(table, {})
+    known = None
+    if check_users and rules.get("user_fk"):
+        known = known_users if known_users is not None else load_known_users(conn)
+    rejected = validate(table, columns, rows, known)
+
+    if rejected:
+        indexes = [i for i in range(len(rows)) if i not in rejected]
+        valid = [rows[i] for i in indexes]
+    else:
+        indexes, valid = range(len(rows)), rows
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    inserted = 0
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN")
+    try:
+        for offset in range(0, len(valid), chunk_size):
+            inserted += _insert_chunk(conn, sql, valid[offset:offset + chunk_size],
+                                      indexes[offset:offset + chunk_size], rejected)
+    except BaseException:
+        if own_transaction:
+            conn.rollback()
+        raise
+    if own_transaction:
+        conn.commit()
+    if cache is not None and inserted and "UserID" in columns:
+        position = list(columns).index("UserID")
+        for user_id in {row[position] for row in valid} - {None}:
+            if own_transaction:
+                cache.invalidate(user_id, table)
+            else:
+                cache.defer(conn, user_id, table)
+    return {
+        "table": table,
+        "received": len(rows),
+        "inserted": inserted,
+        "rejected": dict(sorted(rejected.items())),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+# Compact summary: counts per reason with a few example row indexes
+def format_report(report, examples=5):
+    lines = [f"{report['table']}: {report['inserted']:,} of {report['received']:,} rows inserted, "
+             f"{len(report['rejected']):,} rejected in {report['seconds']:.2f}s"]
+    by_reason = {}
+    for index, reason in report["rejected"].items():
+        by_reason.setdefault(reason, []).append(index)
+    for reason, count in Counter({r: len(i) for r, i in by_reason.items()}).most_common():
+        sample = ", ".join(str(i) for i in by_reason[reason][:examples])
+        more = ", ..." if count > examples else ""
+        lines.append(f"  {count:>7,}  {reason}  (rows {sample}{more})")
+    return "\n".join(lines)
+
+
+# Raw bulk_insert vs ingest on the same synthetic rows, with a fraction of
+# them corrupted so validation and bisection have something to do
+def throughput_benchmark(rows=100000, bad_ratio=0.01, chunk_size=DEFAULT_CHUNK_SIZE, seed=0):
+    import synthetic_data
+
+    dataset = synthetic_data.SyntheticDataset(max(rows / 10 / synthetic_data.USERS_PER_SCALE, 0.001), seed)
+    columns = synthetic_data.COLUMNS["ExerciseLogs"][1:]
+    sample = [row[1:] for row in dataset.rows("ExerciseLogs")][:rows]
+    rng = np.random.default_rng(seed)
+    dirty = list(sample)
+    for i in rng.choice(len(dirty), int(len(dirty) * bad_ratio), replace=False):
+        row = list(dirty[i])
+        kind = i % 3
+        if kind == 0:
+            row[2] = -5                       # DurationMinutes out of range
+        elif kind == 1:
+            row[0] = dataset.users + 1000     # unknown user
+        else:
+            row[4] = "yesterday"              # not a timestamp
+        dirty[i] = tuple(row)
+
+    results = {}
+    for label, data in (("raw bulk_insert", sample), ("ingest (clean)", sample), ("ingest (dirty)", dirty)):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        conn.execute("PRAGMA foreign_keys = ON")
+        bulk_load.bulk_insert(conn, "Users", synthetic_data.COLUMNS["Users"], dataset.rows("Users"))
+        start = time.perf_counter()
+        if label.startswith("raw"):
+            count, _ = bulk_load.bulk_insert(conn, "ExerciseLogs", columns, data, chunk_size)
+            rejected = 0
+        else:
+            report = ingest(conn, "ExerciseLogs", columns, data, chunk_size)
+            count, rejected = report["inserted"], len(report["rejected"])
+        seconds = time.perf_counter() - start
+        results[label] = {"rows": count, "rejected": rejected, "seconds": seconds,
+                          "rows_per_s": count / seconds if seconds else 0.0}
+        conn.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validated bulk ingestion throughput")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--bad-ratio", type=float, default=0.01, help="fraction of rows to corrupt")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = throughput_benchmark(args.rows, args.bad_ratio, args.chunk_size, args.seed)
+    for label, r in results.items():
+        print(f"{label:<16} {r['rows']:>9,} rows {r['rejected']:>7,} rejected {r['rows_per_s']:>11,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
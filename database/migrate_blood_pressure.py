@@ -0,0 +1,117 @@
+import argparse
+import re
+import sqlite3
+import time
+
+import bulk_load
+
+# Rows backfilled per transaction
+DEFAULT_BATCH_SIZE = 50000
+
+NEW_COLUMNS = (("SystolicBP", "INTEGER"), ("DiastolicBP", "INTEGER"), ("RecordedAt", "DATETIME"))
+
+# Only "<digits>/<digits>" readings are split; anything else ("12a/8b",
+# "1/2/3") is left NULL, as in the base.sql triggers
+_PARSEABLE = ("BloodPressure GLOB '[0-9]*/[0-9]*' AND BloodPressure NOT GLOB '*[^0-9/]*' "
+              "AND BloodPressure NOT GLOB '*/*/*'")
+_SYSTOLIC = "CAST(substr(BloodPressure, 1, instr(BloodPressure, '/') - 1) AS INTEGER)"
+_DIASTOLIC = "CAST(substr(BloodPressure, instr(BloodPressure, '/') + 1) AS INTEGER)"
+
+# The split triggers, read from base.sql so there is one definition. Each is
+# dropped and recreated, so migrating again brings old databases up to date.
+TRIGGER_NAMES = ("trg_HealthMetrics_BloodPressure_Insert", "trg_HealthMetrics_BloodPressure_Update")
+
+
+def trigger_sql(schema_path=bulk_load.BASE_SQL):
+    with open(schema_path) as f:
+        schema = f.read()
+    statements = []
+    for name in TRIGGER_NAMES:
+        statements.append(f"DROP TRIGGER IF EXISTS {name}")
+        statements.append(re.search(rf"CREATE TRIGGER {name}\b.*?\nEND;", schema, re.S).group(0))
+    return statements
+
+
+# Same indexes as base.sql
+INDEX_SQL = """
+DROP INDEX IF EXISTS idx_HealthMetrics_UserID;
+CREATE INDEX IF NOT EXISTS idx_HealthMetrics_UserID_RecordedAt ON HealthMetrics (UserID, RecordedAt);
+DROP INDEX IF EXISTS idx_HealthMetrics_SystolicBP_DiastolicBP_RecordedAt;
+CREATE INDEX IF NOT EXISTS idx_HealthMetrics_Hypertensive_RecordedAt
+    ON HealthMetrics (RecordedAt) WHERE SystolicBP >= 140 OR DiastolicBP >= 90;
+"""
+
+
+# Add the structured columns that are missing. Returns their names.
+def add_columns(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(HealthMetrics)")}
+    added = []
+    for name, kind in NEW_COLUMNS:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE HealthMetrics ADD COLUMN {name} {kind}")
+            added.append(name)
+    conn.commit()
+    return added
+
+
+# Split BloodPressure into SystolicBP/DiastolicBP for rows that have not been
+# split yet, `batch_size` MetricIDs per transaction. Returns rows updated.
+def backfill(conn, batch_size=DEFAULT_BATCH_SIZE):
+    low, high = conn.execute("SELECT MIN(MetricID), MAX(MetricID) FROM HealthMetrics").fetchone()
+    total = 0
+    if low is None:
+        return total
+    for start in range(low, high + 1, batch_size):
+        cur = conn.execute(
+            f"""
+            UPDATE HealthMetrics SET SystolicBP = {_SYSTOLIC}, DiastolicBP = {_DIASTOLIC}
+            WHERE MetricID >= ? AND MetricID < ? AND SystolicBP IS NULL AND {_PARSEABLE}
+            """,
+            (start, start + batch_size),
+        )
+        total += cur.rowcount
+        conn.commit()
+    return total
+
+
+# Rows whose BloodPressure text could not be split
+def unparsed(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM HealthMetrics WHERE SystolicBP IS NULL AND BloodPressure IS NOT NULL"
+    ).fetchone()[0]
+
+
+# Full migration: columns, backfill, insert trigger and indexes. The indexes
+# are built after the backfill so they are written once.
+def migrate(conn, batch_size=DEFAULT_BATCH_SIZE):
+    added = add_columns(conn)
+    rows = backfill(conn, batch_size)
+    for sql in trigger_sql():
+        conn.execute(sql)
+    conn.executescript(INDEX_SQL)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return added, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split HealthMetrics.BloodPressure into indexed integer columns")
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per transaction")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    if bulk_load.ensure_schema(conn):
+        print("Created tables from base.sql")
+    start = time.perf_counter()
+    added, rows = migrate(conn, args.batch_size)
+    print(f"Added columns: {', '.join(added) or '-'}")
+    print(f"Backfilled {rows:,} rows in {time.perf_counter() - start:.2f}s")
+    skipped = unparsed(conn)
+    if skipped:
+        print(f"{skipped:,} rows have a BloodPressure value that is not <systolic>/<diastolic>; left NULL")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
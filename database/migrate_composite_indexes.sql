@@ -0,0 +1,12 @@
+-- Migrate an existing database to the composite per-user time-range indexes.
+-- The (UserID, <time>) indexes also serve plain UserID lookups, so the old
+-- single-column UserID indexes are dropped.
+DROP INDEX IF EXISTS idx_ExerciseLogs_UserID;
+DROP INDEX IF EXISTS idx_NutritionLogs_UserID;
+DROP INDEX IF EXISTS idx_SleepData_UserID;
+
+CREATE INDEX IF NOT EXISTS idx_ExerciseLogs_UserID_DateTime ON ExerciseLogs (UserID, DateTime);
+CREATE INDEX IF NOT EXISTS idx_NutritionLogs_UserID_MealTime ON NutritionLogs (UserID, MealTime);
+CREATE INDEX IF NOT EXISTS idx_SleepData_UserID_SleepStartTime ON SleepData (UserID, SleepStartTime);
+
+ANALYZE;
@@ -0,0 +1,512 @@
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import benchmark
+import bulk_load
+import encode_categoricals
+import export
+import timeutil
+
+# ExerciseLogs is split into one table per calendar month (ExerciseLogs_202309
+# and so on) plus ExerciseLogs_Default for rows no monthly partition covers
+# (NULL DateTime, months without a partition yet, late rows for archived
+# months). The name ExerciseLogs becomes a UNION ALL view over the partitions
+# kept in the main file, with INSTEAD OF triggers routing writes.
+TABLE = "ExerciseLogs"
+COLUMN = "DateTime"
+DEFAULT_PARTITION = TABLE + "_Default"
+
+# Month -> partition table, its [StartsAt, EndsAt) bounds in the storage
+# format of DateTime, and the archive file once it has been moved out
+CATALOG = "ExerciseLogPartitions"
+
+# Next LogID to hand out, shared by every partition, and whether timestamps
+# are stored as epoch integers
+STATE = "ExerciseLogPartitionState"
+
+# Every LogID held by any partition, hot or archived. Its primary key is what
+# keeps LogIDs unique across partitions: the routing triggers and
+# insert_many register each new LogID here first, and a duplicate fails
+# with a UNIQUE constraint error before any partition is written.
+KEYS = "ExerciseLogKeys"
+
+# Monthly partitions kept in the main file by `maintain`
+DEFAULT_HOT_MONTHS = 3
+
+# Schema name prefix for attached archive files
+ARCHIVE_SCHEMA = "archive_"
+
+
+def is_partitioned(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (CATALOG,)
+    ).fetchone() is not None
+
+
+def partition_name(month):
+    return f"{TABLE}_{month.replace('-', '')}"
+
+
+def _next_month(month):
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12}-{mon % 12 + 1:02d}"
+
+
+# 'YYYY-MM' of a stored DateTime value, or None
+def month_of(value):
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return datetime.fromtimestamp(value, timezone.utc).strftime("%Y-%m")
+    return value[:7] if re.match(r"\d{4}-\d{2}", value) else None
+
+
+# [start, end) of a month in the storage format. Text bounds are bare dates,
+# so '2023-09-01' and '2023-09-01 00:00:00' both fall in September.
+def month_bounds(month, epoch=False):
+    start, end = f"{month}-01", f"{_next_month(month)}-01"
+    if epoch:
+        return timeutil.to_epoch(start), timeutil.to_epoch(end)
+    return start, end
+
+
+def _epoch(conn):
+    return bool(conn.execute(f"SELECT Epoch FROM {STATE}").fetchone()[0])
+
+
+def _columns(conn, table=DEFAULT_PARTITION):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+# CREATE TABLE and CREATE INDEX statements for a new partition, copied from
+# ExerciseLogs_Default. Archive copies (schema given) drop the foreign key,
+# since Users does not exist in the archive file.
+def partition_ddl(conn, name, schema=None):
+    table_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (DEFAULT_PARTITION,)
+    ).fetchone()[0]
+    index_sql = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL ORDER BY name",
+        (DEFAULT_PARTITION,))]
+    prefix = f"{schema}." if schema else ""
+    statements = [re.sub(rf"\b{DEFAULT_PARTITION}\b", prefix + name, table_sql, count=1)]
+    if schema:
+        statements[0] = re.sub(r",\s*FOREIGN KEY\s*\([^)]*\)\s*REFERENCES\s+\w+\s*\([^)]*\)", "", statements[0])
+    for sql in index_sql:
+        sql = sql.replace(DEFAULT_PARTITION, name)
+        statements.append(re.sub(r"^CREATE INDEX (\w+)", rf"CREATE INDEX {prefix}\1", sql))
+    return statements
+
+
+# Monthly partitions in month order as (name, month, starts_at, ends_at,
+# archive), optionally only those overlapping [start, end)
+def partitions(conn, start=None, end=None):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("EndsAt > ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("StartsAt < ?")
+        params.append(end)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return conn.execute(
+        f"SELECT Name, Month, StartsAt, EndsAt, Archive FROM {CATALOG}{where} ORDER BY Month", params
+    ).fetchall()
+
+
+def _hot(conn):
+    return [row for row in partitions(conn) if row[4] is None]
+
+
+# Recreate the ExerciseLogs view over the partitions in the main file and the
+# INSTEAD OF triggers behind it. Inserts go to the partition whose bounds
+# cover NEW.DateTime, else to the default partition, taking the next shared
+# LogID when none is given. Updates delete and re-insert, so a row whose
+# DateTime changes moves to the right partition.
+def install_view(conn):
+    columns = _columns(conn)
+    hot = _hot(conn)
+    tables = [row[0] for row in hot] + [DEFAULT_PARTITION]
+    conn.execute(f"DROP VIEW IF EXISTS {TABLE}")
+    conn.execute(f"CREATE VIEW {TABLE} AS\n" + "\nUNION ALL\n".join(f"SELECT * FROM {t}" for t in tables))
+
+    log_id = f"COALESCE(NEW.LogID, (SELECT NextLogID FROM {STATE}))"
+    values = ", ".join([log_id] + [f"NEW.{c}" for c in columns[1:]])
+
+    def route(name, condition):
+        return (
+            f"CREATE TRIGGER trg_{TABLE}_Insert_{name[len(TABLE) + 1:]} INSTEAD OF INSERT ON {TABLE}\n"
+            f"WHEN {condition}\nBEGIN\n"
+            f"    INSERT INTO {KEYS} (LogID) VALUES ({log_id});\n"
+            f"    INSERT INTO {name} ({', '.join(columns)}) VALUES ({values});\n"
+            f"    UPDATE {STATE} SET NextLogID = MAX(NextLogID, last_insert_rowid() + 1);\nEND;"
+        )
+
+    epoch = _epoch(conn)
+    for name, _, starts_at, ends_at, _ in hot:
+        if epoch:
+            conn.execute(route(name, f"NEW.{COLUMN} >= {starts_at} AND NEW.{COLUMN} < {ends_at}"))
+        else:
+            conn.execute(route(name, f"NEW.{COLUMN} >= '{starts_at}' AND NEW.{COLUMN} < '{ends_at}'"))
+    conn.execute(route(DEFAULT_PARTITION,
+                       f"NOT EXISTS (SELECT 1 FROM {CATALOG} WHERE Archive IS NULL "
+                       f"AND NEW.{COLUMN} >= StartsAt AND NEW.{COLUMN} < EndsAt)"))
+    deletes = "".join(f"    DELETE FROM {t} WHERE LogID = OLD.LogID;\n" for t in tables + [KEYS])
+    conn.execute(f"CREATE TRIGGER trg_{TABLE}_Delete INSTEAD OF DELETE ON {TABLE}\nBEGIN\n{deletes}END;")
+    conn.execute(
+        f"CREATE TRIGGER trg_{TABLE}_Update INSTEAD OF UPDATE ON {TABLE}\nBEGIN\n{deletes}"
+        f"    INSERT INTO {TABLE} ({', '.join(columns)}) VALUES ({', '.join(f'NEW.{c}' for c in columns)});\nEND;"
+    )
+
+
+# Create the partition for `month` ('YYYY-MM') if it does not exist yet and
+# move any of its rows out of the default partition. Returns the partition
+# name. Runs inside the caller's transaction.
+def ensure_partition(conn, month, refresh_view=True):
+    name = partition_name(month)
+    row = conn.execute(f"SELECT Archive FROM {CATALOG} WHERE Month = ?", (month,)).fetchone()
+    if row:
+        return name
+    starts_at, ends_at = month_bounds(month, _epoch(conn))
+    for sql in partition_ddl(conn, name):
+        conn.execute(sql)
+    conn.execute(f"INSERT INTO {CATALOG} (Name, Month, StartsAt, EndsAt) VALUES (?, ?, ?, ?)",
+                 (name, month, starts_at, ends_at))
+    condition = f"{COLUMN} >= ? AND {COLUMN} < ?"
+    conn.execute(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {condition} ORDER BY LogID",
+                 (starts_at, ends_at))
+    conn.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE {condition}", (starts_at, ends_at))
+    if refresh_view:
+        install_view(conn)
+    return name
+
+
+# Split ExerciseLogs into monthly partitions in place. Rows are copied month
+# by month in LogID order, each partition gets its own copy of the idx_*
+# indexes, and ExerciseLogs is replaced by the view. As with
+# encode_categoricals.migrate, triggers on the old table (e.g. UserStats) are
+# dropped with it and their names returned. Returns (partitions, dropped).
+def migrate(conn):
+    if is_partitioned(conn):
+        raise ValueError("ExerciseLogs is already partitioned")
+    if encode_categoricals.is_encoded(conn):
+        raise ValueError("partitioning needs the plain layout; ExerciseLogs is an encoded view")
+    epoch = export.stores_epoch(conn, TABLE, COLUMN)
+    month = f"strftime('%Y-%m', {COLUMN}, 'unixepoch')" if epoch else f"substr({COLUMN}, 1, 7)"
+    conn.execute("BEGIN")
+    try:
+        table_sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,)).fetchone()[0]
+        conn.execute(re.sub(rf"CREATE TABLE {TABLE}\b", f"CREATE TABLE {DEFAULT_PARTITION}", table_sql, count=1))
+        for name, sql in bulk_load.secondary_indexes(conn, [TABLE]):
+            sql = re.sub(rf"\bON {TABLE}\b", f"ON {DEFAULT_PARTITION}", sql, count=1)
+            conn.execute(sql.replace(name, name.replace(TABLE, DEFAULT_PARTITION, 1)))
+        conn.execute(f"CREATE TABLE {CATALOG} (\n"
+                     f"    Name TEXT NOT NULL PRIMARY KEY, \n"
+                     f"    Month TEXT NOT NULL UNIQUE, \n"
+                     f"    StartsAt NOT NULL, \n"
+                     f"    EndsAt NOT NULL, \n"
+                     f"    Archive TEXT\n);")
+        conn.execute(f"CREATE TABLE {STATE} (NextLogID INTEGER NOT NULL, Epoch INTEGER NOT NULL);")
+        conn.execute(f"INSERT INTO {STATE} SELECT COALESCE(MAX(LogID), 0) + 1, ? FROM {TABLE}", (int(epoch),))
+        conn.execute(f"CREATE TABLE {KEYS} (LogID INTEGER NOT NULL PRIMARY KEY);")
+        conn.execute(f"INSERT INTO {KEYS} SELECT LogID FROM {TABLE} ORDER BY LogID")
+
+        months = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT {month} FROM {TABLE} WHERE {COLUMN} IS NOT NULL ORDER BY 1")
+            if row[0] and re.fullmatch(r"\d{4}-\d{2}", row[0])]
+        for m in months:
+            name = partition_name(m)
+            starts_at, ends_at = month_bounds(m, epoch)
+            for sql in partition_ddl(conn, name):
+                conn.execute(sql)
+            conn.execute(f"INSERT INTO {CATALOG} (Name, Month, StartsAt, EndsAt) VALUES (?, ?, ?, ?)",
+                         (name, m, starts_at, ends_at))
+            conn.execute(f"INSERT INTO {name} SELECT * FROM {TABLE} "
+                         f"WHERE {COLUMN} >= ? AND {COLUMN} < ? ORDER BY LogID", (starts_at, ends_at))
+        conn.execute(f"INSERT INTO {DEFAULT_PARTITION} SELECT * FROM {TABLE} t WHERE NOT EXISTS "
+                     f"(SELECT 1 FROM {CATALOG} c WHERE t.{COLUMN} >= c.StartsAt AND t.{COLUMN} < c.EndsAt) "
+                     f"ORDER BY LogID")
+
+        dropped = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (TABLE,))]
+        conn.execute(f"DROP TABLE {TABLE}")
+        install_view(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return months, dropped
+
+
+# Insert rows (tuples ordered like `columns`) straight into their partitions,
+# skipping the view's per-row triggers. Missing monthly partitions are
+# created; rows without a usable DateTime, or for archived months, go to the
+# default partition. Rows without a LogID take one from the shared sequence,
+# all in one step; a LogID that already exists in any partition raises
+# sqlite3.IntegrityError and nothing is inserted. Returns the number of
+# rows inserted.
+def insert_many(conn, columns, rows):
+    columns = list(columns)
+    rows = list(rows)
+    if not rows:
+        return 0
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN")
+    try:
+        if "LogID" not in columns:
+            columns = ["LogID"] + columns
+            rows = [(None,) + tuple(row) for row in rows]
+        key = columns.index("LogID")
+        missing = [i for i, row in enumerate(rows) if row[key] is None]
+        if missing:
+            first = conn.execute(f"UPDATE {STATE} SET NextLogID = NextLogID + ? RETURNING NextLogID - ?",
+                                 (len(missing), len(missing))).fetchone()[0]
+            for offset, i in enumerate(missing):
+                rows[i] = rows[i][:key] + (first + offset,) + rows[i][key + 1:]
+        top = max(row[key] for row in rows)
+        conn.execute(f"UPDATE {STATE} SET NextLogID = MAX(NextLogID, ?)", (top + 1,))
+        conn.executemany(f"INSERT INTO {KEYS} (LogID) VALUES (?)", ((row[key],) for row in rows))
+        archived = {row[1] for row in partitions(conn) if row[4] is not None}
+        position = columns.index(COLUMN) if COLUMN in columns else None
+        groups = {}
+        for row in rows:
+            month = month_of(row[position]) if position is not None else None
+            groups.setdefault(month, []).append(row)
+        created = False
+        sql = f"INSERT INTO {{}} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        for month, group in groups.items():
+            if month is None or month in archived:
+                target = DEFAULT_PARTITION
+            else:
+                exists = conn.execute(f"SELECT 1 FROM {CATALOG} WHERE Month = ?", (month,)).fetchone()
+                target = ensure_partition(conn, month, refresh_view=False)
+                created = created or not exists
+            conn.executemany(sql.format(target), group)
+        if created:
+            install_view(conn)
+    except BaseException:
+        if own_transaction:
+            conn.rollback()
+        raise
+    if own_transaction:
+        conn.commit()
+    return len(rows)
+
+
+def _archive_schema(month):
+    return ARCHIVE_SCHEMA + month.replace("-", "")
+
+
+# Attach the archive files of `rows` read-only, detaching archives that are
+# not needed when SQLite's attach limit would be exceeded. Returns
+# {partition name: qualified table name}.
+def _attach(conn, rows):
+    attached = {row[1]: row[2] for row in conn.execute("PRAGMA database_list")}
+    needed = {_archive_schema(month) for _, month, _, _, archive in rows if archive}
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    missing = [schema for schema in needed if schema not in attached]
+    in_use = len([s for s in attached if s not in ("main", "temp")])
+    if missing and in_use + len(missing) > limit:
+        for schema in [s for s in attached if s.startswith(ARCHIVE_SCHEMA) and s not in needed]:
+            conn.execute(f"DETACH {schema}")
+            in_use -= 1
+    if in_use + len(missing) > limit:
+        raise ValueError(f"window spans {len(needed)} archived months; SQLite can attach at most {limit} files")
+    names = {}
+    for name, month, _, _, archive in rows:
+        if archive:
+            schema = _archive_schema(month)
+            if schema not in attached:
+                conn.execute(f"ATTACH ? AS {schema}", (f"file:{quote(os.path.abspath(archive))}?mode=ro",))
+                attached[schema] = archive
+            names[name] = f"{schema}.{name}"
+        else:
+            names[name] = name
+    return names
+
+
+# (sql, params) for a SELECT over only the partitions that can hold rows in
+# [start, end), with the window applied in every arm. Archive files in range
+# are attached read-only. `where` is an extra condition with `params`, added
+# to each arm; wrap the result to aggregate, e.g.
+#   SELECT UserID, SUM(CaloriesBurned) FROM (<sql>) GROUP BY UserID
+def select(conn, columns="*", start=None, end=None, where=None, params=()):
+    names = _attach(conn, partitions(conn, start, end))
+    tables = list(names.values()) + [DEFAULT_PARTITION]
+    clauses, arm_params = [], []
+    if start is not None:
+        clauses.append(f"{COLUMN} >= ?")
+        arm_params.append(start)
+    if end is not None:
+        clauses.append(f"{COLUMN} < ?")
+        arm_params.append(end)
+    if where:
+        clauses.append(f"({where})")
+        arm_params += list(params)
+    condition = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    if not isinstance(columns, str):
+        columns = ", ".join(columns)
+    sql = "\nUNION ALL\n".join(f"SELECT {columns} FROM {table}{condition}" for table in tables)
+    return sql, arm_params * len(tables)
+
+
+def query(conn, columns="*", start=None, end=None, where=None, params=()):
+    sql, params = select(conn, columns, start, end, where, params)
+    return conn.execute(sql, params).fetchall()
+
+
+# Move monthly partitions that end on or before `before` ('YYYY-MM') out of
+# the main file. Each is copied to <directory>/<partition>.db with its
+# indexes, the file is made read-only, and only then is the table dropped
+# from the main file and the view rebuilt. The hot partitions are not
+# touched; the space freed in the main file is reused by later inserts.
+# Returns the archive paths written.
+def archive(conn, before, directory):
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for name, month, _, _, location in partitions(conn):
+        if location or month >= before:
+            continue
+        path = os.path.abspath(os.path.join(directory, f"{name}.db"))
+        if os.path.exists(path):
+            raise ValueError(f"{path} already exists")
+        conn.execute("ATTACH ? AS archive_new", (path,))
+        try:
+            conn.execute("BEGIN")
+            for sql in partition_ddl(conn, name, "archive_new"):
+                conn.execute(sql)
+            conn.execute(f"INSERT INTO archive_new.{name} SELECT * FROM main.{name} ORDER BY LogID")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            conn.execute("DETACH archive_new")
+            os.remove(path)
+            raise
+        conn.execute("DETACH archive_new")
+        os.chmod(path, 0o444)
+        conn.execute("BEGIN")
+        try:
+            conn.execute(f"DROP TABLE main.{name}")
+            conn.execute(f"UPDATE {CATALOG} SET Archive = ? WHERE Name = ?", (path, name))
+            install_view(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        written.append(path)
+    return written
+
+
+# Monthly upkeep: create partitions for the current month and `ahead` months
+# after it, so writes never land in the default partition, and archive
+# everything older than the newest `hot_months` months up to today.
+def maintain(conn, directory, hot_months=DEFAULT_HOT_MONTHS, ahead=1, today=None):
+    current = (today or datetime.now(timezone.utc)).strftime("%Y-%m")
+    conn.execute("BEGIN")
+    try:
+        month = current
+        for _ in range(ahead + 1):
+            ensure_partition(conn, month, refresh_view=False)
+            month = _next_month(month)
+        install_view(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    cutoff = current
+    for _ in range(hot_months - 1):
+        year, mon = int(cutoff[:4]), int(cutoff[5:7])
+        cutoff = f"{year - (mon == 1)}-{(mon - 2) % 12 + 1:02d}"
+    return archive(conn, cutoff, directory)
+
+
+# Time a 90-day window aggregate and a per-user window query on the same
+# synthetic data stored three ways: one ExerciseLogs table, the partitioned
+# view, and the pruned partition query. All but `hot_months` partitions are
+# archived first, as `maintain` would.
+def prune_benchmark(scale_factor=10, seed=0, iterations=30, hot_months=DEFAULT_HOT_MONTHS):
+    import synthetic_data
+
+    workdir = tempfile.mkdtemp()
+    try:
+        plain = os.path.join(workdir, "plain.db")
+        conn = sqlite3.connect(plain)
+        bulk_load.ensure_schema(conn)
+        dataset = synthetic_data.SyntheticDataset(scale_factor, seed)
+        with bulk_load.load_pragmas(conn):
+            for table in ("Users", "ExerciseLogs"):
+                bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.close()
+        partitioned = os.path.join(workdir, "partitioned.db")
+        shutil.copy(plain, partitioned)
+        conn = sqlite3.connect(partitioned, isolation_level=None)
+        migrate(conn)
+        last_day = datetime.fromtimestamp(synthetic_data.END_EPOCH - 1, timezone.utc)
+        maintain(conn, os.path.join(workdir, "archive"), hot_months, ahead=0, today=last_day)
+        conn.execute("ANALYZE")
+
+        start_at, end_at = timeutil.window("2023-10-01", "2024-01-01")
+        user = conn.execute(f"SELECT UserID FROM {TABLE} WHERE {COLUMN} >= ? LIMIT 1", (start_at,)).fetchone()[0]
+        window = f"{COLUMN} >= ? AND {COLUMN} < ?"
+        aggregate = "SELECT UserID, SUM(CaloriesBurned) FROM ({}) GROUP BY UserID"
+        per_user = "SELECT LogID, ExerciseType, CaloriesBurned FROM ({}) WHERE UserID = %d ORDER BY DateTime" % user
+        pruned, pruned_params = select(conn, "LogID, UserID, ExerciseType, CaloriesBurned, DateTime", start_at, end_at)
+        conn.close()
+        cases = [
+            ("single table", plain, f"SELECT * FROM {TABLE} WHERE {window}", (start_at, end_at)),
+            ("partitioned view", partitioned, f"SELECT * FROM {TABLE} WHERE {window}", (start_at, end_at)),
+            ("pruned partitions", partitioned, pruned, pruned_params),
+        ]
+        results = []
+        for label, path, source, params in cases:
+            for query_name, template in (("90-day aggregate", aggregate), ("user window", per_user)):
+                results.append(benchmark.measure(path, f"{query_name} ({label})", template.format(source),
+                                                 iterations, params=tuple(params)))
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly partitions for ExerciseLogs")
+    parser.add_argument("command", choices=("migrate", "maintain", "list", "bench"))
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--archive-dir", default="archive")
+    parser.add_argument("--hot-months", type=int, default=DEFAULT_HOT_MONTHS)
+    parser.add_argument("--ahead", type=int, default=1, help="future months to create partitions for")
+    parser.add_argument("--scale-factor", type=float, default=10)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        for r in prune_benchmark(args.scale_factor, iterations=args.iterations, hot_months=args.hot_months):
+            print(f"{r['name']:<40} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  rows {r['rows']:,}")
+        return
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    if args.command == "migrate":
+        months, dropped = migrate(conn)
+        print(f"Split {TABLE} into {len(months)} monthly partitions")
+        if dropped:
+            print(f"Dropped triggers {', '.join(dropped)}; reinstall them if still needed")
+    elif args.command == "maintain":
+        for path in maintain(conn, args.archive_dir, args.hot_months, args.ahead):
+            print(f"Archived to {path}")
+    for name, month, _, _, location in partitions(conn):
+        count = "" if location else f"{conn.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]:>10,}"
+        print(f"{month}  {name:<22} {count:>10}  {location or 'main'}")
+    print(f"{'':7}  {DEFAULT_PARTITION:<22} {conn.execute(f'SELECT COUNT(*) FROM {DEFAULT_PARTITION}').fetchone()[0]:>10,}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import benchmark
+import bulk_load
+import query_catalog
+import synthetic_data
+from dal import profile
+
+# Query 5 of queries.sql reads the meals of this day
+MEAL_DAY = "2023-10-01"
+
+
+# Latency of rendering one user's profile: the fourteen queries.sql
+# statements one after another (strings built with || in SQL), against one
+# profile statement with the lines built in Python afterwards. Both run on
+# one warm connection over the same random users.
+def run(db_path, iterations=2000, warmup=100, seed=1):
+    conn = sqlite3.connect(db_path)
+    try:
+        epoch = query_catalog.stores_epoch(conn)
+        queries = [(sql, count) for _, (sql, count) in sorted(query_catalog.user_queries(epoch=epoch).items())]
+        max_user = conn.execute("SELECT MAX(UserID) FROM Users").fetchone()[0]
+        users = random.Random(seed).choices(range(1, max_user + 1), k=warmup + iterations)
+
+        def per_query(user_id):
+            return [conn.execute(sql, (user_id,) * count).fetchall() for sql, count in queries]
+
+        def single(user_id):
+            return profile.fetch_profile(conn, user_id, MEAL_DAY)
+
+        def single_lines(user_id):
+            return profile.profile_lines(profile.fetch_profile(conn, user_id, MEAL_DAY))
+
+        results = []
+        for name, fn in (("14 queries", per_query), ("profile", single), ("profile + lines", single_lines)):
+            for user_id in users[:warmup]:
+                fn(user_id)
+            samples = []
+            for user_id in users[warmup:]:
+                start = time.perf_counter_ns()
+                fn(user_id)
+                samples.append(time.perf_counter_ns() - start)
+            results.append(benchmark.summarize(name, "warm", samples, 0))
+        return results
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fourteen per-user queries vs one profile fetch")
+    parser.add_argument("--db", help="database to read (default: generate one with --scale-factor)")
+    parser.add_argument("--scale-factor", type=float, default=10)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "profile.db")
+            conn = sqlite3.connect(db_path)
+            bulk_load.ensure_schema(conn)
+            dataset = synthetic_data.SyntheticDataset(args.scale_factor, seed=1)
+            with bulk_load.load_pragmas(conn):
+                for table in synthetic_data.TABLES:
+                    bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+            conn.close()
+        results = run(db_path, args.iterations)
+    baseline = results[0]["mean_ms"]
+    print(f"{'approach':<16} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'speedup':>8}")
+    for r in results:
+        print(f"{r['name']:<16} {r['mean_ms']:>6.3f}ms {r['p50_ms']:>6.3f}ms {r['p95_ms']:>6.3f}ms "
+              f"{r['p99_ms']:>6.3f}ms {baseline / r['mean_ms']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
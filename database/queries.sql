@@ -27,7 +27,7 @@ SELECT
     'Meal Name: ' || MealName || ', Food Items: ' || FoodItems || ', Meal Time: ' || MealTime
 FROM NutritionLogs
 WHERE UserID = 1
-  AND DATE(MealTime) = '2023-10-01';
+  AND MealTime >= '2023-10-01' AND MealTime < '2023-10-02';
 
 -- Query 6: Retrieve the user's sleep data (sleep duration, sleep quality rating, start time, and end time) for UserID 1
 SELECT 
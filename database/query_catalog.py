@@ -0,0 +1,466 @@
+import os
+import re
+from typing import NamedTuple
+
+import timeutil
+
+# Named catalog of the benchmark queries. Each entry pairs the original form
+# of a query with its optimized rewrite.
+
+QUERIES_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.sql")
+
+# Original Query 1 (uses a subquery)
+query1_original = """
+SELECT ExerciseType, DurationMinutes, CaloriesBurned
+FROM ExerciseLogs
+WHERE UserID IN (SELECT UserID FROM Users WHERE UserName = 'JohnDoe');
+"""
+
+# Optimized Query 1 (Same as Original, but without subquery)
+query1_optimized = """
+SELECT ExerciseType, DurationMinutes, CaloriesBurned
+FROM ExerciseLogs
+WHERE UserID = 1;
+"""
+
+# Original Query 2 (performing a self-join)
+query2_original = """
+SELECT G1.GoalType, G1.GoalValue, P1.ProgressValue
+FROM GoalsAndProgress G1
+JOIN GoalsAndProgress P1 ON G1.UserID = P1.UserID
+WHERE G1.UserID = 1;
+"""
+
+# Optimized Query 2 (Same as Original, but without self-join)
+query2_optimized = """
+SELECT GoalType, GoalValue, ProgressValue
+FROM GoalsAndProgress
+WHERE UserID = 1;
+"""
+
+# Original Query 3 (adding unnecessary filtering)
+query3_original = """
+SELECT COUNT(*) AS NumberOfGoals
+FROM GoalsAndProgress
+WHERE UserID = 1 AND GoalValue > 0;
+"""
+
+# Optimized Query 3 (Same as Original, but without unnecessary filtering)
+query3_optimized = """
+SELECT COUNT(*) AS NumberOfGoals
+FROM GoalsAndProgress
+WHERE UserID = 1;
+"""
+
+# Original Query 4 (adding additional joins)
+query4_original = """
+SELECT H.Weight, H.WaistCircumference, H.HipCircumference, H.BodyFatPercentage
+FROM HealthMetrics H
+JOIN ExerciseLogs E ON H.UserID = E.UserID
+WHERE H.UserID = 1;
+"""
+
+# Optimized Query 4 (Same as Original, but without additional joins)
+query4_optimized = """
+SELECT Weight, WaistCircumference, HipCircumference, BodyFatPercentage
+FROM HealthMetrics
+WHERE UserID = 1;
+"""
+
+# Original Query 5 (using a subquery)
+query5_original = """
+SELECT MealName, FoodItems, MealTime
+FROM NutritionLogs
+WHERE UserID = (SELECT UserID FROM Users WHERE UserName = 'JohnDoe')
+  AND DATE(MealTime) = '2023-10-01';
+"""
+
+# Optimized Query 5 (Same as Original, but without subquery and with a half-open range on MealTime)
+query5_optimized = """
+SELECT MealName, FoodItems, MealTime
+FROM NutritionLogs
+WHERE UserID = 1
+  AND MealTime >= '2023-10-01' AND MealTime < '2023-10-02';
+"""
+
+# Original Query 6 (performing a self-join)
+query6_original = """
+SELECT S1.SleepDurationMinutes, S1.SleepQualityRating, S2.SleepStartTime, S2.SleepEndTime
+FROM SleepData S1
+JOIN SleepData S2 ON S1.UserID = S2.UserID
+WHERE S1.UserID = 1;
+"""
+
+# Optimized Query 6 (Same as Original, but without self-joinin)
+query6_optimized = """
+SELECT SleepDurationMinutes, SleepQualityRating, SleepStartTime, SleepEndTime
+FROM SleepData
+WHERE UserID = 1;
+"""
+
+# Original Query 7 (adding unnecessary filtering)
+query7_original = """
+SELECT FitnessGoal, DietaryRestrictions, PreferredExercises
+FROM UserPreferences
+WHERE UserID = 1 AND FitnessGoal = 'Lose Weight';
+"""
+
+# Optimized Query 7 (Same as Original, but with different filtering)
+query7_optimized = """
+SELECT FitnessGoal, DietaryRestrictions, PreferredExercises
+FROM UserPreferences
+WHERE UserID = 1;
+"""
+
+# Original Query 8 (using a subquery)
+query8_original = """
+SELECT SUM(DurationMinutes) AS TotalExerciseDuration
+FROM ExerciseLogs
+WHERE UserID = (SELECT UserID FROM Users WHERE UserName = 'JohnDoe');
+"""
+
+# Optimized Query 8 (Same as Original, but without subquery)
+query8_optimized = """
+SELECT SUM(DurationMinutes) AS TotalExerciseDuration
+FROM ExerciseLogs
+WHERE UserID = 1;
+"""
+
+# Original Query 9 (performing a self-join)
+query9_original = """
+SELECT AVG(E1.Intensity) AS AverageExerciseIntensity
+FROM ExerciseLogs E1
+JOIN ExerciseLogs E2 ON E1.UserID = E2.UserID
+WHERE E1.UserID = 1;
+"""
+
+# Optimized Query 9 (Same as Original, but without self-join)
+query9_optimized = """
+SELECT AVG(Intensity) AS AverageExerciseIntensity
+FROM ExerciseLogs
+WHERE UserID = 1;
+"""
+
+# Original Query 10 (using a subquery)
+query10_original = """
+SELECT ExerciseType AS MostFrequentExerciseType
+FROM ExerciseLogs
+WHERE UserID = (SELECT UserID FROM Users WHERE UserName = 'JohnDoe')
+GROUP BY ExerciseType
+ORDER BY COUNT(*) DESC
+LIMIT 1;
+"""
+
+# Optimized Query 10 (Same as Original, but without subquery)
+query10_optimized = """
+SELECT ExerciseType AS MostFrequentExerciseType
+FROM ExerciseLogs
+WHERE UserID = 1
+GROUP BY ExerciseType
+ORDER BY COUNT(*) DESC
+LIMIT 1;
+"""
+
+# Original Query 11 (performing a self-join)
+query11_original = """
+SELECT (U1.Weight / (U2.Height * U2.Height)) AS BMI
+FROM Users U1
+JOIN Users U2 ON U1.UserID = U2.UserID
+WHERE U1.UserID = 1;
+"""
+
+# Optimized Query 11 (Same as Original, but without self-join)
+query11_optimized = """
+SELECT (Weight / (Height * Height)) AS BMI
+FROM Users
+WHERE UserID = 1;
+"""
+
+# Original Query 13 (using a subquery)
+query13_original = """
+SELECT AVG(SleepDurationMinutes / 60.0) AS AverageDailySleepDurationHours
+FROM SleepData
+WHERE UserID = (SELECT UserID FROM Users WHERE UserName = 'JohnDoe');
+"""
+
+# Optimized Query 13 (Same as Original, but without subquery)
+query13_optimized = """
+SELECT AVG(SleepDurationMinutes / 60.0) AS AverageDailySleepDurationHours
+FROM SleepData
+WHERE UserID = 1;
+"""
+
+# Original Query 14 (adding additional joins)
+query14_original = """
+SELECT AVG(S.SleepQualityRating) AS AverageDailySleepQualityRating
+FROM SleepData S
+JOIN Users U ON S.UserID = U.UserID
+WHERE S.UserID = 1;
+"""
+
+# Optimized Query 14 (Same as Original, but without additional joins)
+query14_optimized = """
+SELECT AVG(SleepQualityRating) AS AverageDailySleepQualityRating
+FROM SleepData
+WHERE UserID = 1;
+"""
+
+# Original Query 15 (using a subquery)
+query15_original = """
+SELECT E.ExerciseType, E.DurationMinutes, E.DateTime AS LastExerciseDate
+FROM ExerciseLogs E
+WHERE E.UserID = (SELECT UserID FROM Users WHERE UserName = 'JohnDoe')
+ORDER BY E.DateTime DESC
+LIMIT 1;
+"""
+
+# Optimized Query 15 (Same as Original, but without subquery)
+query15_optimized = """
+SELECT ExerciseType, DurationMinutes, DateTime AS LastExerciseDate
+FROM ExerciseLogs
+WHERE UserID = 1
+ORDER BY DateTime DESC
+LIMIT 1;
+"""
+
+# Original Exercise Window (per-user time window with the column wrapped in DATE())
+exercise_window_original = """
+SELECT ExerciseType, DurationMinutes, CaloriesBurned, DateTime
+FROM ExerciseLogs
+WHERE UserID = 1
+  AND DATE(DateTime) BETWEEN '2023-09-01' AND '2023-09-30';
+"""
+
+# Optimized Exercise Window (Same as Original, but as a half-open range that can seek (UserID, DateTime))
+exercise_window_optimized = """
+SELECT ExerciseType, DurationMinutes, CaloriesBurned, DateTime
+FROM ExerciseLogs
+WHERE UserID = 1
+  AND DateTime >= '2023-09-01' AND DateTime < '2023-10-01';
+"""
+
+# Original Meal Window (per-user time window with the column wrapped in DATE())
+meal_window_original = """
+SELECT MealName, FoodItems, MealTime
+FROM NutritionLogs
+WHERE UserID = 1
+  AND DATE(MealTime) BETWEEN '2023-09-01' AND '2023-09-07';
+"""
+
+# Optimized Meal Window (Same as Original, but as a half-open range that can seek (UserID, MealTime))
+meal_window_optimized = """
+SELECT MealName, FoodItems, MealTime
+FROM NutritionLogs
+WHERE UserID = 1
+  AND MealTime >= '2023-09-01' AND MealTime < '2023-09-08';
+"""
+
+# Original Sleep Window (the user's sleep sessions started in September, with the column wrapped in DATE())
+sleep_window_original = """
+SELECT SleepStartTime, SleepEndTime, SleepDurationMinutes, SleepQualityRating
+FROM SleepData
+WHERE UserID = 1
+  AND DATE(SleepStartTime) BETWEEN '2023-09-01' AND '2023-09-30';
+"""
+
+# Optimized Sleep Window (Same as Original, but as a half-open range that can seek (UserID, SleepStartTime))
+sleep_window_optimized = """
+SELECT SleepStartTime, SleepEndTime, SleepDurationMinutes, SleepQualityRating
+FROM SleepData
+WHERE UserID = 1
+  AND SleepStartTime >= '2023-09-01' AND SleepStartTime < '2023-10-01';
+"""
+
+# Original Hypertensive Readings (readings at or above 140/90 in the last 30 days, parsed from the "120/80" text).
+# 140/90 is the clinical threshold: systolic >= 140 OR diastolic >= 90, either one is enough.
+hypertensive_original = """
+SELECT MetricID, UserID, BloodPressure, RecordedAt
+FROM HealthMetrics
+WHERE (CAST(substr(BloodPressure, 1, instr(BloodPressure, '/') - 1) AS INTEGER) >= 140
+       OR CAST(substr(BloodPressure, instr(BloodPressure, '/') + 1) AS INTEGER) >= 90)
+  AND RecordedAt >= '2023-12-02';
+"""
+
+# Optimized Hypertensive Readings (Same as Original, but a range scan on RecordedAt in the partial
+# idx_HealthMetrics_Hypertensive_RecordedAt index; the OR term must match the index's WHERE clause as written)
+hypertensive_optimized = """
+SELECT MetricID, UserID, BloodPressure, RecordedAt
+FROM HealthMetrics
+WHERE (SystolicBP >= 140 OR DiastolicBP >= 90)
+  AND RecordedAt >= '2023-12-02';
+"""
+
+# (label, original sql, optimized sql) for every pair, in display order
+QUERY_PAIRS = [
+    ("Query 1", query1_original, query1_optimized),
+    ("Query 2", query2_original, query2_optimized),
+    ("Query 3", query3_original, query3_optimized),
+    ("Query 4", query4_original, query4_optimized),
+    ("Query 5", query5_original, query5_optimized),
+    ("Query 6", query6_original, query6_optimized),
+    ("Query 7", query7_original, query7_optimized),
+    ("Query 8", query8_original, query8_optimized),
+    ("Query 9", query9_original, query9_optimized),
+    ("Query 10", query10_original, query10_optimized),
+    ("Query 11", query11_original, query11_optimized),
+    ("Query 13", query13_original, query13_optimized),
+    ("Query 14", query14_original, query14_optimized),
+    ("Query 15", query15_original, query15_optimized),
+    ("Exercise Window", exercise_window_original, exercise_window_optimized),
+    ("Meal Window", meal_window_original, meal_window_optimized),
+    ("Sleep Window", sleep_window_original, sleep_window_optimized),
+    ("Hypertensive Readings", hypertensive_original, hypertensive_optimized),
+]
+
+
+_TEMPORAL = "|".join(sorted({column for columns in timeutil.TEMPORAL_COLUMNS.values() for column in columns}))
+_DATE_OF = re.compile(rf"\bDATE\(((?:\w+\.)?(?:{_TEMPORAL}))\)", re.I)
+_COMPARED = re.compile(rf"\b((?:\w+\.)?(?:{_TEMPORAL})\s*(?:>=|<=|<>|!=|=|<|>)\s*)"
+                       r"'(\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2})?)'")
+
+
+# True when the database keeps its timestamps as epoch seconds (see
+# convert_timestamps), False when it keeps text, and None while no table has
+# a timestamp to tell by
+def stores_epoch(conn):
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+    for table, (column, *_) in timeutil.TEMPORAL_COLUMNS.items():
+        if table in tables:
+            sample = conn.execute(f"SELECT typeof({column}) FROM {table} WHERE {column} IS NOT NULL LIMIT 1"
+                                  ).fetchone()
+            if sample:
+                return sample[0] == "integer"
+    return None
+
+
+# The catalog writes its windows as 'YYYY-MM-DD' text, which compares wrong
+# against epoch integers. For an epoch database, spell them the way
+# epoch_queries.sql does: a literal compared with a temporal column becomes
+# epoch seconds (timeutil.to_epoch), so the half-open ranges still seek their
+# indexes, and DATE(<column>) reads the column as 'unixepoch'.
+def for_storage(sql, epoch=False):
+    if not epoch:
+        return sql
+    sql = _DATE_OF.sub(r"DATE(\1, 'unixepoch')", sql)
+    return _COMPARED.sub(lambda m: f"{m.group(1)}{timeutil.to_epoch(m.group(2))}", sql)
+
+
+# Flat registry: {"Query 1 (Original)": sql, "Query 1 (Optimized)": sql, ...},
+# in the storage format given by `epoch`
+def registry(epoch=False):
+    queries = {}
+    for label, original, optimized in QUERY_PAIRS:
+        queries[f"{label} (Original)"] = for_storage(original, epoch)
+        queries[f"{label} (Optimized)"] = for_storage(optimized, epoch)
+    return queries
+
+
+# Parse a file laid out like queries.sql, where every statement is preceded by
+# a "-- Query N: description" comment. Returns [(number, description, sql)].
+def parse_sql_file(path=QUERIES_SQL):
+    with open(path) as f:
+        text = f.read()
+    header = re.compile(r"^--\s*Query\s+(\d+):\s*(.*)$", re.M)
+    matches = list(header.finditer(text))
+    queries = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        sql = text[match.end():end].strip()
+        queries.append((int(match.group(1)), match.group(2).strip(), sql))
+    return queries
+
+
+# Registry of the queries.sql statements: {"queries.sql Query 1": sql, ...}
+def sql_file_registry(path=QUERIES_SQL, epoch=False):
+    name = os.path.basename(path)
+    return {f"{name} Query {number}": for_storage(sql, epoch) for number, _, sql in parse_sql_file(path)}
+
+
+# The per-user statements of queries.sql with the hard-coded "UserID = 1"
+# turned into a parameter, in the storage format given by `epoch`. Returns
+# {number: (sql, placeholder count)}; bind the UserID that many times.
+def user_queries(path=QUERIES_SQL, epoch=False):
+    queries = {}
+    for number, _, sql in parse_sql_file(path):
+        sql, count = re.subn(r"\bUserID\s*=\s*1\b", "UserID = ?", for_storage(sql, epoch))
+        if count:
+            queries[number] = (sql, count)
+    return queries
+
+
+# Tables a statement reads (every FROM/JOIN target)
+def tables_in(sql):
+    return sorted(set(re.findall(r"\b(?:FROM|JOIN)\s+(\w+)", sql, re.I)))
+
+
+# Temp table of UserIDs that batch_sql() statements join against
+BATCH_USERS = "BatchUsers"
+
+_USER_FILTER = re.compile(r"\bUserID\s*=\s*1\b")
+_STATEMENT = re.compile(r"^SELECT\s+(?P<select>.*?)\s+FROM\s+(?P<table>\w+)\s+WHERE\s+(?P<where>.*?)"
+                        r"(?:\s+GROUP\s+BY\s+(?P<group>.*?))?(?:\s+ORDER\s+BY\s+(?P<order>.*?))?"
+                        r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$", re.S | re.I)
+_AGGREGATE = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(", re.I)
+
+
+# A per-user statement in both forms. `sql` binds the UserID `placeholders`
+# times; `batch_sql` returns the same rows for every user in temp.BatchUsers,
+# prefixed with the UserID and ordered by it. `kind` says how to read it:
+#   "rows"      - one output row per matching row
+#   "aggregate" - one row per user; users without rows get the per-user
+#                 statement's empty result (COUNT 0, SUM NULL, ...)
+#   "ranked"    - ORDER BY ... LIMIT n per user, via ROW_NUMBER() or, for
+#                 LIMIT 1 on one column, MIN/MAX; the last column is the rank
+class CatalogQuery(NamedTuple):
+    name: str
+    sql: str
+    placeholders: int
+    batch_sql: str
+    kind: str
+
+
+# The set-based form of a single-table "WHERE UserID = 1 ..." statement:
+# (batch sql, kind), or None when the statement has another shape
+def batch_sql(sql):
+    match = _STATEMENT.match(" ".join(sql.split()))
+    if match is None or len(_USER_FILTER.findall(sql)) != 1:
+        return None
+    select, table, where, group, order, limit = match.group("select", "table", "where", "group", "order", "limit")
+    if _USER_FILTER.search(where) is None or re.search(r"\bOR\b", where, re.I):
+        return None
+    rest = re.sub(r"\s+AND\s+UserID\s*=\s*1\b|\bUserID\s*=\s*1\b(?:\s+AND\s+)?", "", where, flags=re.I).strip()
+    # CROSS JOIN keeps BatchUsers as the outer loop: one index seek per user,
+    # rows already in UserID order
+    source = f"temp.{BATCH_USERS} CROSS JOIN {table} USING (UserID)" + (f" WHERE {rest}" if rest else "")
+    grouped = f" GROUP BY UserID, {group}" if group else ""
+    single = re.fullmatch(r"(\w+)(?:\s+(ASC|DESC))?", order or "", re.I)
+    if limit == "1" and not group and single:
+        # SQLite takes the bare columns from the row that holds the MIN/MAX,
+        # which avoids sorting every row for ROW_NUMBER()
+        pick = "MAX" if (single.group(2) or "").upper() == "DESC" else "MIN"
+        return (f"SELECT UserID, {select}, {pick}({single.group(1)}) AS BatchRank FROM {source} "
+                f"GROUP BY UserID ORDER BY UserID", "ranked")
+    if limit is not None:
+        return (f"SELECT * FROM (SELECT UserID, {select}, ROW_NUMBER() OVER (PARTITION BY UserID "
+                f"ORDER BY {order or 'NULL'}) AS BatchRank FROM {source}{grouped}) "
+                f"WHERE BatchRank <= {limit} ORDER BY UserID, BatchRank", "ranked")
+    if not group and _AGGREGATE.search(select):
+        return f"SELECT UserID, {select} FROM {source} GROUP BY UserID ORDER BY UserID", "aggregate"
+    ordering = f"UserID, {order}" if order else "UserID"
+    return f"SELECT UserID, {select} FROM {source}{grouped} ORDER BY {ordering}", "rows"
+
+
+# Every per-user statement of the catalog that has a set-based form, by name:
+# "queries.sql Query N" for `path` and "<label> (Optimized)" for QUERY_PAIRS,
+# in the storage format given by `epoch`
+def batch_queries(path=QUERIES_SQL, epoch=False):
+    named = list(sql_file_registry(path, epoch).items())
+    named += [(f"{label} (Optimized)", for_storage(optimized, epoch)) for label, _, optimized in QUERY_PAIRS]
+    queries = {}
+    for name, sql in named:
+        rewritten = batch_sql(sql)
+        if rewritten is None:
+            continue
+        per_user, count = _USER_FILTER.subn("UserID = ?", sql)
+        queries[name] = CatalogQuery(name, per_user, count, *rewritten)
+    return queries
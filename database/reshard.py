@@ -0,0 +1,109 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import bulk_load
+from dal.shards import SHARD_INFO, SHARDED_TABLES, create_shards, shard_of
+
+
+def shard_paths(prefix, shards):
+    return [f"{prefix}.shard{i}.db" for i in range(shards)]
+
+
+def _columns(conn, table, schema="main"):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _has_table(conn, table, schema="main"):
+    return conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?",
+                        (table,)).fetchone() is not None
+
+
+# Next free UserID over all sources: their shard sequences and the largest ID
+def _next_user_id(sources):
+    next_id = 1
+    for source in sources:
+        conn = sqlite3.connect(source)
+        next_id = max(next_id, (conn.execute("SELECT MAX(UserID) FROM Users").fetchone()[0] or 0) + 1)
+        if _has_table(conn, SHARD_INFO):
+            next_id = max(next_id, conn.execute(f"SELECT NextUserID FROM {SHARD_INFO}").fetchone()[0])
+        conn.close()
+    return next_id
+
+
+# Copy every user's rows from `sources` (a single database, or the files of
+# an existing shard set) into new shard files `targets`, placing each user by
+# shard_of(UserID, len(targets)). Each target is filled with ATTACH +
+# INSERT ... SELECT under load-time PRAGMAs, with its indexes rebuilt once at
+# the end. Users and UserPreferences keep their keys; the other tables are
+# renumbered in each target, since their row IDs were only unique per source.
+# Sources are not modified. Returns {target: {table: rows}}.
+def reshard(sources, targets):
+    existing = [path for path in targets if os.path.exists(path)]
+    if existing:
+        raise ValueError(f"Target files already exist: {', '.join(existing)}")
+    create_shards(targets, _next_user_id(sources))
+    counts = {}
+    for index, target in enumerate(targets):
+        conn = sqlite3.connect(target)
+        conn.create_function("shard_of", 2, shard_of, deterministic=True)
+        counts[target] = dict.fromkeys(SHARDED_TABLES, 0)
+        with bulk_load.load_pragmas(conn):
+            dropped = bulk_load.drop_indexes(conn)
+            for source in sources:
+                conn.execute("ATTACH ? AS source", (source,))
+                for table in SHARDED_TABLES:
+                    if not _has_table(conn, table, "source"):
+                        continue
+                    key = bulk_load.primary_key(conn, table)
+                    available = set(_columns(conn, table, "source"))
+                    columns = [c for c in _columns(conn, table)
+                               if c in available and (c != key or key == "UserID")]
+                    select = ", ".join(columns)
+                    cur = conn.execute(
+                        f"INSERT INTO main.{table} ({select}) SELECT {select} FROM source.{table} "
+                        f"WHERE shard_of(UserID, ?) = ? ORDER BY {key}", (len(targets), index))
+                    counts[target][table] += cur.rowcount
+                conn.commit()
+                conn.execute("DETACH source")
+            bulk_load.rebuild_indexes(conn, dropped)
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.close()
+    return counts
+
+
+# Share of users whose shard changes when going from `old` to `new` shards
+def moved_fraction(user_ids, old, new):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0.0
+    return sum(shard_of(u, old) != shard_of(u, new) for u in user_ids) / len(user_ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split a database into UserID shards, or reshard a shard set")
+    parser.add_argument("sources", nargs="+", help="database file, or every file of the current shard set in order")
+    parser.add_argument("--shards", type=int, required=True, help="number of target shards")
+    parser.add_argument("--prefix", default="health_fitness_app", help="targets are <prefix>.shard<i>.db")
+    args = parser.parse_args(argv)
+
+    targets = shard_paths(args.prefix, args.shards)
+    start = time.perf_counter()
+    counts = reshard(args.sources, targets)
+    seconds = time.perf_counter() - start
+    for target, tables in counts.items():
+        print(f"{target}: " + ", ".join(f"{table} {rows:,}" for table, rows in tables.items()))
+    if len(args.sources) > 1:
+        ids = []
+        for target in targets:
+            conn = sqlite3.connect(target)
+            ids += [row[0] for row in conn.execute("SELECT UserID FROM Users")]
+            conn.close()
+        print(f"{moved_fraction(ids, len(args.sources), args.shards):.1%} of users changed shard")
+    print(f"Resharded into {len(targets)} files in {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import benchmark
+import bulk_load
+import export
+
+# Per source table: its primary key (the high-water mark), the timestamp
+# that places a row in a period, and the measures summed per period
+SOURCES = {
+    "ExerciseLogs": ("LogID", "DateTime", ("DurationMinutes", "CaloriesBurned")),
+    "SleepData": ("SleepID", "SleepStartTime", ("SleepDurationMinutes", "SleepQualityRating")),
+}
+
+# Sleep counts towards the night it started on: sessions starting before
+# noon belong to the previous date, as SleepDataReadable.Night
+SHIFTS = {"SleepData": ("'-12 hours'",)}
+
+# Period label per grain, as date() modifiers: the day, or the Monday that
+# starts the week
+GRAINS = {
+    "daily": (),
+    "weekly": ("'weekday 0'", "'-6 days'"),
+}
+
+WATERMARKS = "RollupWatermarks"
+
+
+def rollup_table(table, grain):
+    return f"{table}{grain.capitalize()}Rollup"
+
+
+def _measure_columns(table):
+    columns = []
+    for measure in SOURCES[table][2]:
+        columns += [f"{measure}Sum", f"{measure}Count"]
+    return columns
+
+
+def _period(conn, table, grain):
+    _, column, _ = SOURCES[table]
+    modifiers = ["'unixepoch'"] if export.stores_epoch(conn, table, column) else []
+    modifiers += list(SHIFTS.get(table, ())) + list(GRAINS[grain])
+    return f"date({', '.join([column] + modifiers)})"
+
+
+# Create the rollup tables (one row per user and period, WITHOUT ROWID so
+# the (UserID, Period) key is the table) and the watermark table
+def create(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {WATERMARKS} (SourceTable TEXT NOT NULL PRIMARY KEY, "
+                 f"LastID INTEGER NOT NULL)")
+    for table in SOURCES:
+        measures = "".join(f", {column} {'INTEGER' if column.endswith('Count') else 'NUMERIC'} NOT NULL DEFAULT 0"
+                           for column in _measure_columns(table))
+        for grain in GRAINS:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {rollup_table(table, grain)} (UserID INTEGER NOT NULL, "
+                         f"Period TEXT NOT NULL, RowCount INTEGER NOT NULL DEFAULT 0{measures}, "
+                         f"PRIMARY KEY (UserID, Period)) WITHOUT ROWID")
+        conn.execute(f"INSERT OR IGNORE INTO {WATERMARKS} VALUES (?, 0)", (table,))
+    conn.commit()
+
+
+def watermark(conn, table):
+    row = conn.execute(f"SELECT LastID FROM {WATERMARKS} WHERE SourceTable = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+# Fold the rows added to `table` since the last refresh into its rollups:
+# one range scan on the primary key above the watermark, aggregated per
+# (UserID, Period) and added onto the existing rollup rows. The cost follows
+# the number of new rows, not the size of the history. Runs inside the
+# caller's transaction; returns the number of source rows folded in.
+def _fold(conn, table):
+    key, column, measures = SOURCES[table]
+    columns = _measure_columns(table)
+    aggregates = "".join(f", COALESCE(SUM({m}), 0), COUNT({m})" for m in measures)
+    updates = "".join(f", {c} = {c} + excluded.{c}" for c in columns)
+    last = watermark(conn, table)
+    high, rows = conn.execute(f"SELECT MAX({key}), COUNT(*) FROM {table} WHERE {key} > ?", (last,)).fetchone()
+    if high is not None:
+        for grain in GRAINS:
+            conn.execute(
+                f"INSERT INTO {rollup_table(table, grain)} (UserID, Period, RowCount, {', '.join(columns)}) "
+                f"SELECT UserID, {_period(conn, table, grain)} AS Period, COUNT(*){aggregates} FROM {table} "
+                f"WHERE {key} > ? AND {key} <= ? AND UserID IS NOT NULL AND {column} IS NOT NULL "
+                f"GROUP BY UserID, Period "
+                f"ON CONFLICT (UserID, Period) DO UPDATE SET RowCount = RowCount + excluded.RowCount{updates}",
+                (last, high))
+        conn.execute(f"UPDATE {WATERMARKS} SET LastID = ? WHERE SourceTable = ?", (high, table))
+    return rows
+
+
+# Fold new rows into `table`'s rollups in one write transaction. Only inserts
+# are picked up; after UPDATEs or DELETEs of rolled-up rows, rebuild().
+def refresh(conn, table):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = _fold(conn, table)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return rows
+
+
+def refresh_all(conn):
+    return {table: refresh(conn, table) for table in SOURCES}
+
+
+# Recompute every rollup from the raw rows. The clears, watermark resets and
+# refill are one transaction, so readers never see emptied rollups behind a
+# reset watermark and a failure leaves the old rollups in place.
+def rebuild(conn):
+    create(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in SOURCES:
+            for grain in GRAINS:
+                conn.execute(f"DELETE FROM {rollup_table(table, grain)}")
+            conn.execute(f"UPDATE {WATERMARKS} SET LastID = 0 WHERE SourceTable = ?", (table,))
+        counts = {table: _fold(conn, table) for table in SOURCES}
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return counts
+
+
+# One user's trend from `table` at `grain`, for periods in [start, end)
+# ('YYYY-MM-DD', either may be None). Rollup rows are stitched with the
+# source rows above the watermark in one statement, so the result is exact
+# however long ago the last refresh ran. Returns a dict per period with
+# Period, RowCount and, per measure, its total and average (None when the
+# period has no values).
+def trend(conn, table, grain, user_id, start=None, end=None):
+    key, column, measures = SOURCES[table]
+    columns = _measure_columns(table)
+    period = _period(conn, table, grain)
+    bounds = "Period >= :start AND Period < :end"
+    params = {"user_id": user_id, "start": start or "0000-00-00", "end": end or "9999-99-99", "table": table}
+    tail = ", ".join(f"COALESCE(SUM({m}), 0), COUNT({m})" for m in measures)
+    sql = (f"SELECT Period, SUM(RowCount), {', '.join(f'SUM({c})' for c in columns)} FROM ("
+           f"SELECT Period, RowCount, {', '.join(columns)} FROM {rollup_table(table, grain)} "
+           f"WHERE UserID = :user_id AND {bounds} "
+           f"UNION ALL "
+           f"SELECT {period} AS Period, COUNT(*), {tail} FROM {table} "
+           f"WHERE {key} > (SELECT LastID FROM {WATERMARKS} WHERE SourceTable = :table) "
+           f"AND UserID = :user_id AND {column} IS NOT NULL GROUP BY Period HAVING {bounds}"
+           f") GROUP BY Period ORDER BY Period")
+    result = []
+    for row in conn.execute(sql, params):
+        out = {"Period": row[0], "RowCount": row[1]}
+        for i, measure in enumerate(measures):
+            total, count = row[2 + 2 * i], row[3 + 2 * i]
+            out[measure] = total if count else None
+            out[f"{measure}Avg"] = total / count if count else None
+        result.append(out)
+    return result
+
+
+# Refresh time for one day of new rows on top of a history of
+# `scale_factor` users, next to a full rebuild and the stitched trend
+# query against aggregating the raw rows
+def refresh_benchmark(scale_factor=100, seed=1, iterations=20):
+    import synthetic_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "rollups.db"), isolation_level=None)
+        bulk_load.ensure_schema(conn)
+        dataset = synthetic_data.SyntheticDataset(scale_factor, seed)
+        with bulk_load.load_pragmas(conn):
+            for table in ("Users",) + tuple(SOURCES):
+                bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        history = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in SOURCES}
+
+        start = time.perf_counter()
+        rebuild(conn)
+        results = {"history": history, "rebuild_s": time.perf_counter() - start}
+
+        # A day's worth of new rows: 1/365 of the history, dated 2024-01-01
+        new = {table: max(rows // 365, 1) for table, rows in history.items()}
+        users = synthetic_data.num_users(scale_factor)
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes, DateTime, CaloriesBurned) "
+                         "VALUES (?, 'Running', 30, '2024-01-01 07:00:00', 250.0)",
+                         ((i % users + 1,) for i in range(new["ExerciseLogs"])))
+        conn.executemany("INSERT INTO SleepData (UserID, SleepDurationMinutes, SleepQualityRating, SleepStartTime) "
+                         "VALUES (?, 420, 4, '2024-01-01 23:00:00')", ((i % users + 1,) for i in range(new["SleepData"])))
+        conn.execute("COMMIT")
+        start = time.perf_counter()
+        refresh_all(conn)
+        results["refresh_ms"] = (time.perf_counter() - start) * 1000
+        results["new_rows"] = new
+
+        user_id = conn.execute("SELECT UserID FROM ExerciseLogs GROUP BY UserID ORDER BY COUNT(*) DESC LIMIT 1"
+                               ).fetchone()[0]
+        raw = ("SELECT date(DateTime, 'weekday 0', '-6 days') AS Period, COUNT(*), SUM(DurationMinutes) "
+               "FROM ExerciseLogs WHERE UserID = ? GROUP BY Period ORDER BY Period")
+        conn.execute("INSERT INTO ExerciseLogs (UserID, DurationMinutes, DateTime) VALUES (?, 45, '2024-01-02 18:00:00')",
+                     (user_id,))
+        for name, fn in (("raw", lambda: conn.execute(raw, (user_id,)).fetchall()),
+                         ("stitched", lambda: trend(conn, "ExerciseLogs", "weekly", user_id))):
+            samples = []
+            for _ in range(iterations):
+                t = time.perf_counter_ns()
+                fn()
+                samples.append(time.perf_counter_ns() - t)
+            samples.sort()
+            results[f"{name}_trend_p50_ms"] = benchmark.percentile(samples, 50) / 1e6
+        conn.close()
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daily and weekly rollups of ExerciseLogs and SleepData")
+    parser.add_argument("command", choices=("refresh", "rebuild", "show", "bench"))
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--table", choices=tuple(SOURCES), default="ExerciseLogs", help="source for show")
+    parser.add_argument("--grain", choices=tuple(GRAINS), default="weekly", help="grain for show")
+    parser.add_argument("--user", type=int, default=1, help="UserID for show")
+    parser.add_argument("--since", help="first period for show (YYYY-MM-DD)")
+    parser.add_argument("--scale-factor", type=float, default=100)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        r = refresh_benchmark(args.scale_factor)
+        for table, rows in r["history"].items():
+            print(f"{table}: {rows:,} rows of history, {r['new_rows'][table]:,} new")
+        print(f"full rebuild   {r['rebuild_s']:8.2f} s")
+        print(f"refresh        {r['refresh_ms']:8.2f} ms")
+        print(f"weekly trend   raw {r['raw_trend_p50_ms']:.3f} ms, stitched {r['stitched_trend_p50_ms']:.3f} ms (p50)")
+        return
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    create(conn)
+    if args.command == "show":
+        _, _, measures = SOURCES[args.table]
+        for row in trend(conn, args.table, args.grain, args.user, args.since):
+            values = ", ".join(f"{m} {row[m]} (avg {row[m + 'Avg']:.1f})" for m in measures if row[m] is not None)
+            print(f"{row['Period']}  {row['RowCount']:>4} rows  {values}")
+    else:
+        counts = rebuild(conn) if args.command == "rebuild" else refresh_all(conn)
+        for table, rows in counts.items():
+            print(f"{table}: {rows:,} rows rolled up (watermark {watermark(conn, table)})")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
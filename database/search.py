@@ -0,0 +1,353 @@
+import argparse
+import contextlib
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from typing import NamedTuple, Optional, Tuple
+
+import benchmark
+import bulk_load
+import encode_categoricals
+
+# Free-text columns with a full-text index, per source table: the integer
+# primary key (the FTS rowid), the searchable text columns, and the column
+# indexed alongside them as a token for the per-user filter (None where the
+# key is the UserID itself)
+SOURCES = {
+    "NutritionLogs": ("LogID", ("FoodItems",), "UserID"),
+    "UserPreferences": ("UserID", ("DietaryRestrictions", "PreferredExercises"), None),
+}
+
+# Porter stemming so "berry" finds "berries"; prefix indexes on the first
+# two and three characters so short type-ahead prefixes don't scan the
+# whole term list
+TOKENIZE = "porter unicode61 remove_diacritics 2"
+PREFIX = "2 3"
+
+DEFAULT_LIMIT = 20
+
+
+class SearchHit(NamedTuple):
+    key: int
+    user_id: Optional[int]
+    values: Tuple
+    score: float
+
+
+def search_table(table):
+    return f"{table}Search"
+
+
+# The table that holds the rows: the source itself, or <Table>Encoded once
+# encode_categoricals has turned the source into a view
+def _content(conn, table):
+    kind = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    return encode_categoricals.encoded_table(table) if kind and kind[0] == "view" else table
+
+
+def _indexed(table):
+    _, columns, user = SOURCES[table]
+    return columns + ((user,) if user else ())
+
+
+# External-content FTS5 table (the text stays only in the source table) and
+# the AFTER triggers that keep it in step with every INSERT, UPDATE and
+# DELETE. An external-content index is told about removals with the old
+# values, so an update is a 'delete' of the old row and an insert of the new.
+def ddl(conn, table):
+    key = SOURCES[table][0]
+    columns = _indexed(table)
+    content = _content(conn, table)
+    fts = search_table(table)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    names = ", ".join(columns)
+    insert = f"    INSERT INTO {fts} (rowid, {names}) VALUES (new.{key}, {new});\n"
+    delete = f"    INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.{key}, {old});\n"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{content}', content_rowid='{key}', "
+        f"tokenize='{TOKENIZE}', prefix='{PREFIX}')",
+        f"CREATE TRIGGER trg_{table}_Search_Insert AFTER INSERT ON {content}\nBEGIN\n{insert}END;",
+        f"CREATE TRIGGER trg_{table}_Search_Delete AFTER DELETE ON {content}\nBEGIN\n{delete}END;",
+        f"CREATE TRIGGER trg_{table}_Search_Update AFTER UPDATE OF {key}, {names} ON {content}\n"
+        f"BEGIN\n{delete}{insert}END;",
+    ]
+
+
+def trigger_names(table):
+    return [f"trg_{table}_Search_{action}" for action in ("Insert", "Delete", "Update")]
+
+
+def drop_ddl(table):
+    return [f"DROP TRIGGER IF EXISTS {name}" for name in trigger_names(table)] + [
+        f"DROP TABLE IF EXISTS {search_table(table)}"]
+
+
+def uninstall(conn, tables=None):
+    for table in tables or SOURCES:
+        for sql in drop_ddl(table):
+            conn.execute(sql)
+    conn.commit()
+
+
+# Create (or recreate) the indexes and triggers, then index the existing
+# rows. encode_categoricals.migrate() reinstalls them on the encoded tables.
+def install(conn, tables=None):
+    uninstall(conn, tables)
+    for table in tables or SOURCES:
+        for sql in ddl(conn, table):
+            conn.execute(sql)
+    conn.commit()
+    rebuild(conn, tables)
+
+
+# Re-index every row from the source table, for repair after bulk changes
+# made with the triggers dropped
+def rebuild(conn, tables=None):
+    for table in tables or SOURCES:
+        fts = search_table(table)
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.commit()
+
+
+# Merge the index segments left by many small trigger inserts into one
+def optimize(conn, tables=None):
+    for table in tables or SOURCES:
+        fts = search_table(table)
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    conn.commit()
+
+
+# For bulk loads: every statement a trigger runs ends in a savepoint, and
+# FTS5 writes its pending terms out as a new index segment at each one, so
+# indexing row by row through the insert trigger costs several times the
+# load itself. Inside this block the insert trigger is dropped; on exit the
+# rows above the primary key seen on entry are indexed in one statement and
+# the trigger is put back. Only inserts with ascending keys may run inside:
+# the update and delete triggers would tell the index about rows it has not
+# seen yet. If the block raises, its uncommitted rows are rolled back and
+# nothing is indexed; run rebuild() if it had committed rows before failing.
+@contextlib.contextmanager
+def suspended(conn, table):
+    key = SOURCES[table][0]
+    content = _content(conn, table)
+    fts = search_table(table)
+    names = ", ".join(_indexed(table))
+    conn.commit()
+    last = conn.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {content}").fetchone()[0]
+    conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_Search_Insert")
+    conn.commit()
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        conn.execute(ddl(conn, table)[1])
+        conn.commit()
+        raise
+    conn.commit()
+    conn.execute(f"INSERT INTO {fts} (rowid, {names}) SELECT {key}, {names} FROM {content} WHERE {key} > ?",
+                 (last,))
+    conn.execute(ddl(conn, table)[1])
+    conn.commit()
+
+
+# Raises sqlite3.DatabaseError when an index disagrees with its source rows
+def check(conn, tables=None):
+    for table in tables or SOURCES:
+        fts = search_table(table)
+        conn.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('integrity-check', 1)")
+
+
+# Turn user input into an FTS5 query: every word must appear (in any order),
+# each quoted so punctuation and words like AND/NOT are plain text. With
+# `prefix` the last word matches as a prefix, for search-as-you-type. None
+# when the input has no words.
+def match_expression(text, prefix=False):
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+# Rows of `table` whose text matches `text`, optionally only one user's rows
+# and only one text column. Hits come best first by bm25 (lower scores are
+# better). With a user, the user's token is ANDed into the query, so FTS5
+# steps through the user's short doclist and skips ahead in the term's, and
+# only those matches are scored; the user column gets weight 0 in bm25, so
+# each hit scores as it would in the unfiltered search.
+def search(conn, table, text, user_id=None, column=None, limit=DEFAULT_LIMIT, prefix=False):
+    key, columns, user = SOURCES[table]
+    if column is not None and column not in columns:
+        raise ValueError(f"{table}.{column} is not indexed for search")
+    query = match_expression(text, prefix)
+    if query is None:
+        return []
+    query = f"{{{column or ' '.join(columns)}}} : ({query})"
+    fts = search_table(table)
+    content = _content(conn, table)
+    score = f"bm25({fts}{', 1.0' * len(columns)}, 0.0)" if user else f"bm25({fts})"
+    sql = (f"SELECT f.rowid, c.UserID, {', '.join(f'c.{c}' for c in columns)}, {score} "
+           f"FROM {fts} f JOIN {content} c ON c.{key} = f.rowid WHERE {fts} MATCH :query ")
+    if user_id is not None and user:
+        query += f' AND {user} : "{int(user_id)}"'
+    elif user_id is not None:
+        sql += "AND f.rowid = :user_id "
+    rows = conn.execute(sql + f"ORDER BY {score} LIMIT :limit", {"query": query, "user_id": user_id, "limit": limit})
+    return [SearchHit(row[0], row[1], tuple(row[2:-1]), row[-1]) for row in rows]
+
+
+# The LIKE '%word%' scan the index replaces: one pattern per word, every
+# word required. Used as the baseline by compare().
+def like_sql(table, column, words, user_id=None):
+    key = SOURCES[table][0]
+    where = " AND ".join(f"{column} LIKE ?" for _ in words)
+    if user_id is not None:
+        where = f"UserID = ? AND {where}"
+    return f"SELECT {key} FROM {table} WHERE {where}"
+
+
+# (label, words, prefix, whether to filter by one user) for compare()
+BENCHMARK_SEARCHES = (
+    ("one word", "salmon", False, False),
+    ("two words", "salmon quinoa", False, False),
+    ("two-word food", "peanut butter", False, False),
+    ("prefix", "sal", True, False),
+    ("one word, one user", "salmon", False, True),
+)
+
+
+# Load the NutritionLogs rows into a new database: with no index ("bare"),
+# through the insert trigger ("trigger") or inside suspended() ("suspended")
+def _load(db_path, dataset, mode):
+    import synthetic_data
+
+    conn = sqlite3.connect(db_path)
+    bulk_load.ensure_schema(conn)
+    if mode != "bare":
+        install(conn, ["NutritionLogs"])
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(bulk_load.load_pragmas(conn))
+        start = time.perf_counter()
+        if mode == "suspended":
+            stack.enter_context(suspended(conn, "NutritionLogs"))
+        rows, _ = bulk_load.bulk_insert(conn, "NutritionLogs", synthetic_data.COLUMNS["NutritionLogs"],
+                                        dataset.rows("NutritionLogs"))
+    return conn, rows, time.perf_counter() - start
+
+
+# Ingest and search cost of the NutritionLogs index at `scale_factor`
+# (about 5,000 meal logs per unit): loading bare and indexing afterwards,
+# through the triggers, and inside suspended(); then LIKE scans against
+# MATCH for BENCHMARK_SEARCHES, both for every match and through search()
+def compare(scale_factor=400, seed=1, iterations=5, limit=DEFAULT_LIMIT):
+    import synthetic_data
+
+    dataset = synthetic_data.SyntheticDataset(scale_factor, seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, rows, seconds = _load(os.path.join(tmp, "bare.db"), dataset, "bare")
+        results.update(rows=rows, bare_load_s=seconds)
+        start = time.perf_counter()
+        install(conn, ["NutritionLogs"])
+        results["index_after_load_s"] = time.perf_counter() - start
+        conn.close()
+
+        conn, _, results["trigger_load_s"] = _load(os.path.join(tmp, "trigger.db"), dataset, "trigger")
+        conn.close()
+
+        conn, _, results["suspended_load_s"] = _load(os.path.join(tmp, "search.db"), dataset, "suspended")
+        sizes = encode_categoricals.object_sizes(conn) or {}
+        results["index_bytes"] = sum(size for name, size in sizes.items()
+                                     if name.startswith(search_table("NutritionLogs")))
+        results["table_bytes"] = sizes.get("NutritionLogs")
+
+        user_id = conn.execute("SELECT UserID FROM NutritionLogs GROUP BY UserID ORDER BY COUNT(*) DESC LIMIT 1"
+                               ).fetchone()[0]
+        fts = search_table("NutritionLogs")
+
+        def p50(fn):
+            fn()
+            samples = []
+            for _ in range(iterations):
+                t = time.perf_counter_ns()
+                fn()
+                samples.append(time.perf_counter_ns() - t)
+            samples.sort()
+            return benchmark.percentile(samples, 50) / 1e6
+
+        searches = []
+        for label, text, prefix, per_user in BENCHMARK_SEARCHES:
+            words = re.findall(r"\w+", text)
+            user = user_id if per_user else None
+            like = like_sql("NutritionLogs", "FoodItems", words, user)
+            like_params = ((user,) if per_user else ()) + tuple(f"%{word}%" for word in words)
+            query = f"FoodItems : ({match_expression(text, prefix)})"
+            if per_user:
+                query += f' AND UserID : "{user}"'
+            match = f"SELECT rowid FROM {fts} WHERE {fts} MATCH ?"
+            match_params = (query,)
+            searches.append({
+                "label": label,
+                "match_rows": len(conn.execute(match, match_params).fetchall()),
+                "like_ms": p50(lambda: conn.execute(like, like_params).fetchall()),
+                "match_ms": p50(lambda: conn.execute(match, match_params).fetchall()),
+                "search_ms": p50(lambda: search(conn, "NutritionLogs", text, user, limit=limit, prefix=prefix)),
+            })
+        results["searches"] = searches
+        conn.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text search over meal foods and user preferences")
+    parser.add_argument("command", choices=("install", "uninstall", "rebuild", "optimize", "check", "query", "bench"))
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--table", choices=tuple(SOURCES), default="NutritionLogs", help="source for query")
+    parser.add_argument("--text", default="", help="words to search for")
+    parser.add_argument("--column", help="search only this indexed column")
+    parser.add_argument("--user", type=int, help="only this UserID's rows")
+    parser.add_argument("--prefix", action="store_true", help="match the last word as a prefix")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--scale-factor", type=float, default=400)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        r = compare(args.scale_factor, limit=args.limit)
+        print(f"{r['rows']:,} meal logs")
+        print(f"load without index   {r['bare_load_s']:8.2f} s, then index {r['index_after_load_s']:.2f} s")
+        for mode in ("trigger", "suspended"):
+            seconds = r[f"{mode}_load_s"]
+            print(f"load, {mode + ' index':<15}{seconds:8.2f} s ({seconds / r['bare_load_s'] - 1:+.0%})")
+        if r["table_bytes"]:
+            print(f"index size           {r['index_bytes'] / 2 ** 20:8.1f} MiB "
+                  f"(table {r['table_bytes'] / 2 ** 20:.1f} MiB)")
+        print(f"{'search':<20} {'rows':>9} {'LIKE':>9} {'MATCH':>9} {'search()':>9} {'speedup':>8}")
+        for s in r["searches"]:
+            print(f"{s['label']:<20} {s['match_rows']:>9,} {s['like_ms']:>7.2f}ms {s['match_ms']:>7.2f}ms "
+                  f"{s['search_ms']:>7.2f}ms {s['like_ms'] / s['match_ms']:>7.1f}x")
+        return
+    conn = sqlite3.connect(args.db)
+    if args.command == "install":
+        install(conn)
+    elif args.command == "uninstall":
+        uninstall(conn)
+    elif args.command == "rebuild":
+        rebuild(conn)
+    elif args.command == "optimize":
+        optimize(conn)
+    elif args.command == "check":
+        check(conn)
+        print("ok")
+    else:
+        for hit in search(conn, args.table, args.text, args.user, args.column, args.limit, args.prefix):
+            print(f"{hit.key:>8}  user {hit.user_id}  {hit.score:7.2f}  {' | '.join(map(str, hit.values))}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
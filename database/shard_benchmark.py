@@ -0,0 +1,111 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import benchmark
+import bulk_load
+import query_catalog
+import reshard
+import synthetic_data
+from dal import ShardedDatabase, apply_pragma_profile
+
+# Cross-user aggregate timed for each layout
+AGGREGATE = ("ExerciseLogs", "ExerciseType", {"calories": ("avg", "CaloriesBurned"), "sessions": ("count", "*")})
+
+
+def _worker(db, stop, latencies, errors, max_user, write_ratio, seed):
+    rng = random.Random(seed)
+    numbers = list(query_catalog.user_queries())
+    while not stop.is_set():
+        user_id = rng.randint(1, max_user)
+        start = time.perf_counter_ns()
+        try:
+            if rng.random() < write_ratio:
+                db.for_user(user_id).exercise_logs.insert(UserID=user_id, ExerciseType="Running", DurationMinutes=30,
+                                                          Intensity="Moderate", DateTime="2023-12-31 12:00:00")
+                kind = "writes"
+            else:
+                db.user_query(rng.choice(numbers), user_id)
+                kind = "reads"
+            latencies[kind].append(time.perf_counter_ns() - start)
+        except sqlite3.OperationalError:
+            errors.append(1)
+
+
+# Per-user mixed load from `threads` workers for `seconds`, then the
+# scatter-gather aggregate, against the same data split into `shards` files
+def run(source, shards, threads=8, seconds=5.0, write_ratio=0.2, synchronous="NORMAL", iterations=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = reshard.shard_paths(os.path.join(tmp, "bench"), shards)
+        reshard.reshard([source], paths)
+        for path in paths:
+            conn = sqlite3.connect(path)
+            apply_pragma_profile(conn, "wal", synchronous)
+            conn.close()
+        db = ShardedDatabase(paths, pool_size=threads)
+        max_user = db.count("Users")
+        stop = threading.Event()
+        latencies = {"reads": [], "writes": []}
+        errors = []
+        workers = [threading.Thread(target=_worker, args=(db, stop, latencies, errors, max_user, write_ratio, i))
+                   for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        time.sleep(seconds)
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+        aggregate = []
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            db.grouped(*AGGREGATE)
+            aggregate.append(time.perf_counter_ns() - start)
+        db.close()
+
+    result = {"shards": shards, "errors": len(errors)}
+    for kind, samples in latencies.items():
+        samples.sort()
+        result[f"{kind}_per_s"] = len(samples) / seconds
+        result[f"{kind}_p99_ms"] = benchmark.percentile(samples, 99) / 1e6 if samples else 0.0
+    aggregate.sort()
+    result["aggregate_p50_ms"] = benchmark.percentile(aggregate, 50) / 1e6
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of 1 shard vs N shards")
+    parser.add_argument("--db", help="source database (default: generate one with --scale-factor)")
+    parser.add_argument("--scale-factor", type=float, default=10)
+    parser.add_argument("--shards", type=int, action="append", help="shard counts to compare (default: 1 and 4)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--synchronous", choices=("OFF", "NORMAL", "FULL"), default="NORMAL")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.db
+        if source is None:
+            source = os.path.join(tmp, "source.db")
+            conn = sqlite3.connect(source)
+            bulk_load.ensure_schema(conn)
+            dataset = synthetic_data.SyntheticDataset(args.scale_factor, seed=1)
+            with bulk_load.load_pragmas(conn):
+                for table in synthetic_data.TABLES:
+                    bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+            conn.close()
+        print(f"{'shards':>6} {'reads/s':>9} {'read p99':>9} {'writes/s':>9} {'write p99':>10} {'busy':>5} "
+              f"{'aggregate':>10}")
+        for shards in args.shards or [1, 4]:
+            r = run(source, shards, args.threads, args.seconds, args.write_ratio, args.synchronous)
+            print(f"{shards:>6} {r['reads_per_s']:>9,.0f} {r['reads_p99_ms']:>7.2f}ms {r['writes_per_s']:>9,.0f} "
+                  f"{r['writes_p99_ms']:>8.2f}ms {r['errors']:>5} {r['aggregate_p50_ms']:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
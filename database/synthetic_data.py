@@ -0,0 +1,292 @@
+import numpy as np
+
+# Users per unit of scale factor (scale factor 1 = 1,000 users, 10 = 10,000 ...)
+USERS_PER_SCALE = 1000
+
+# Users are generated in fixed-size blocks, each with its own random stream
+# derived from (seed, table, block). A block's contents therefore never depend
+# on how many users are generated in total, so the first 1,000 users of a 10x
+# dataset are the same as the whole 1x dataset, and any block can be generated
+# independently of the others.
+BLOCK_USERS = 1000
+
+# Average rows per user for the per-user tables
+DEFAULT_MEANS = {
+    "ExerciseLogs": 10,
+    "GoalsAndProgress": 5,
+    "HealthMetrics": 5,
+    "NutritionLogs": 5,
+    "SleepData": 5,
+}
+
+# Activity per user follows a Pareto distribution: most users log a little,
+# a few log a lot. Tables listed here scale with a user's activity.
+PARETO_SHAPE = 2.0
+PARETO_MEAN = PARETO_SHAPE / (PARETO_SHAPE - 1)
+MAX_ACTIVITY = 25.0
+ACTIVITY_TABLES = ("ExerciseLogs", "HealthMetrics", "NutritionLogs", "SleepData")
+
+# Timestamps fall in the year before a fixed reference point so that runs are
+# reproducible regardless of the current date
+END_EPOCH = 1704067200  # 2024-01-01 00:00:00
+WINDOW_SECONDS = 365 * 24 * 3600
+
+COLUMNS = {
+    "Users": ("UserID", "UserName", "Age", "Gender", "Weight", "Height", "ContactInfo"),
+    "ExerciseLogs": ("LogID", "UserID", "ExerciseType", "DurationMinutes", "Intensity", "DateTime",
+                     "CaloriesBurned", "DistanceCovered", "HeartRate", "WeightLiftedLbs"),
+    "GoalsAndProgress": ("GoalID", "UserID", "GoalType", "GoalValue", "ProgressValue"),
+    "HealthMetrics": ("MetricID", "UserID", "Weight", "WaistCircumference", "HipCircumference",
+                      "BodyFatPercentage", "MuscleMass", "BloodPressure", "StepCount",
+                      "SystolicBP", "DiastolicBP", "RecordedAt"),
+    "NutritionLogs": ("LogID", "UserID", "MealName", "FoodItems", "MealTime"),
+    "SleepData": ("SleepID", "UserID", "SleepDurationMinutes", "SleepQualityRating",
+                  "SleepStartTime", "SleepEndTime"),
+    "UserPreferences": ("UserID", "FitnessGoal", "DietaryRestrictions", "PreferredExercises"),
+}
+
+# Tables in foreign-key order
+TABLES = tuple(COLUMNS)
+
+# Stream ids used to derive independent random generators
+_STREAMS = {table: i + 1 for i, table in enumerate(TABLES)}
+_ACTIVITY_STREAM = 100
+_COUNT_STREAM = 200
+
+EXERCISE_TYPES = np.array(["Running", "Swimming", "Strength Training", "Cycling"])
+EXERCISE_TYPE_P = [0.4, 0.15, 0.25, 0.2]
+INTENSITIES = np.array(["Low", "Moderate", "High"])
+INTENSITY_P = [0.3, 0.5, 0.2]
+GENDERS = np.array(["Male", "Female"])
+GOAL_TYPES = np.array(["Weight Loss", "Muscle Gain", "General Fitness"])
+MEAL_NAMES = np.array(["Breakfast", "Lunch", "Dinner", "Snack"])
+FITNESS_GOALS = np.array(["Lose Weight", "Build Muscle", "General Fitness"])
+FOODS = np.array([
+    "oatmeal", "eggs", "toast", "banana", "apple", "yogurt", "granola", "coffee", "rice",
+    "chicken", "salmon", "tuna", "beef", "tofu", "beans", "lentils", "salad", "spinach",
+    "broccoli", "carrots", "potatoes", "pasta", "bread", "cheese", "milk", "almonds",
+    "peanut butter", "avocado", "berries", "orange", "soup", "quinoa", "turkey", "pizza",
+])
+DIETARY_RESTRICTIONS = np.array([
+    "None", "Vegetarian", "Vegan", "Gluten free", "Lactose intolerant", "Nut allergy",
+    "Low sodium", "Low carb", "Pescatarian", "Halal", "Kosher", "Diabetic friendly",
+])
+
+
+def num_users(scale_factor):
+    return max(1, int(round(scale_factor * USERS_PER_SCALE)))
+
+
+def _rng(seed, stream, block):
+    return np.random.default_rng([seed, stream, block])
+
+
+# Format epoch seconds as 'YYYY-MM-DD HH:MM:SS' strings for a whole column
+def format_datetimes(epochs):
+    text = np.datetime_as_string(epochs.astype("datetime64[s]"), unit="s")
+    return np.char.replace(text, "T", " ")
+
+
+def _join_words(words, sep=" "):
+    joined = words[:, 0]
+    for i in range(1, words.shape[1]):
+        joined = np.char.add(np.char.add(joined, sep), words[:, i])
+    return joined
+
+
+# Per-row timestamps sorted in time order within each user
+def _time_ordered(rng, user_ids):
+    epochs = END_EPOCH - rng.integers(0, WINDOW_SECONDS, len(user_ids))
+    order = np.lexsort((epochs, user_ids))
+    return epochs[order]
+
+
+# Temporal columns hold integer epoch seconds (UTC) when `epoch` is set and
+# 'YYYY-MM-DD HH:MM:SS' text otherwise
+class SyntheticDataset:
+    def __init__(self, scale_factor=1, seed=0, users=None, means=None, epoch=False):
+        self.seed = int(seed)
+        self.epoch = bool(epoch)
+        self.users = int(users) if users is not None else num_users(scale_factor)
+        self.means = dict(DEFAULT_MEANS)
+        if means:
+            self.means.update(means)
+        self._counts = {}
+        self._first_ids = {}
+
+    def blocks(self, first_user=1, last_user=None):
+        last_user = self.users if last_user is None else min(last_user, self.users)
+        first_block = (first_user - 1) // BLOCK_USERS
+        last_block = (last_user - 1) // BLOCK_USERS
+        return range(first_block, last_block + 1)
+
+    def _block_users(self, block):
+        start = block * BLOCK_USERS + 1
+        return np.arange(start, min(start + BLOCK_USERS, self.users + 1), dtype=np.int64)
+
+    def _activity(self, block):
+        rng = _rng(self.seed, _ACTIVITY_STREAM, block)
+        weights = (rng.pareto(PARETO_SHAPE, BLOCK_USERS) + 1) / PARETO_MEAN
+        return np.minimum(weights, MAX_ACTIVITY)
+
+    def _block_counts(self, table, block):
+        rng = _rng(self.seed, _COUNT_STREAM + _STREAMS[table], block)
+        if table in ACTIVITY_TABLES:
+            lam = self.means[table] * self._activity(block)
+        else:
+            lam = np.full(BLOCK_USERS, float(self.means[table]))
+        return rng.poisson(lam)[: len(self._block_users(block))]
+
+    # Rows per user for the whole dataset (index 0 is UserID 1)
+    def counts(self, table):
+        if table not in self._counts:
+            self._counts[table] = np.concatenate(
+                [self._block_counts(table, b) for b in self.blocks()]
+            ).astype(np.int64)
+        return self._counts[table]
+
+    # Primary key of the first row belonging to each user
+    def first_ids(self, table):
+        if table not in self._first_ids:
+            counts = self.counts(table)
+            self._first_ids[table] = np.concatenate(([1], 1 + np.cumsum(counts)[:-1]))
+        return self._first_ids[table]
+
+    def row_count(self, table, first_user=1, last_user=None):
+        if table in ("Users", "UserPreferences"):
+            last_user = self.users if last_user is None else min(last_user, self.users)
+            return max(0, last_user - first_user + 1)
+        counts = self.counts(table)
+        return int(counts[first_user - 1:last_user].sum())
+
+    # Columns (as NumPy arrays) for every user in one block
+    def block_columns(self, table, block):
+        users = self._block_users(block)
+        rng = _rng(self.seed, _STREAMS[table], block)
+        if table == "Users":
+            return self._users(rng, users)
+        if table == "UserPreferences":
+            return self._user_preferences(rng, users)
+
+        counts = self.counts(table)[users[0] - 1:users[-1]]
+        user_ids = np.repeat(users, counts)
+        n = len(user_ids)
+        ids = self.first_ids(table)[users[0] - 1] + np.arange(n, dtype=np.int64)
+        if table == "ExerciseLogs":
+            return self._exercise_logs(rng, ids, user_ids, n)
+        if table == "GoalsAndProgress":
+            return self._goals(rng, ids, user_ids, n)
+        if table == "HealthMetrics":
+            return self._health_metrics(rng, ids, user_ids, n)
+        if table == "NutritionLogs":
+            return self._nutrition_logs(rng, ids, user_ids, n)
+        if table == "SleepData":
+            return self._sleep_data(rng, ids, user_ids, n)
+        raise ValueError(f"Unknown table: {table}")
+
+    def _timestamps(self, epochs):
+        return epochs if self.epoch else format_datetimes(epochs)
+
+    # Yield row tuples for users first_user..last_user, one block at a time
+    def rows(self, table, first_user=1, last_user=None):
+        last_user = self.users if last_user is None else min(last_user, self.users)
+        user_col = COLUMNS[table].index("UserID")
+        for block in self.blocks(first_user, last_user):
+            columns = self.block_columns(table, block)
+            users = columns[user_col]
+            keep = slice(
+                int(np.searchsorted(users, first_user, "left")),
+                int(np.searchsorted(users, last_user, "right")),
+            )
+            yield from zip(*(column[keep].tolist() for column in columns))
+
+    def _users(self, rng, users):
+        n = len(users)
+        names = np.char.add("user", users.astype(str))
+        return [
+            users,
+            names,
+            rng.integers(18, 71, n),
+            rng.choice(GENDERS, n),
+            np.round(rng.uniform(100, 300, n), 2),
+            np.round(rng.uniform(4.5, 7.0, n), 2),
+            np.char.add(names, "@example.com"),
+        ]
+
+    def _exercise_logs(self, rng, ids, user_ids, n):
+        return [
+            ids,
+            user_ids,
+            rng.choice(EXERCISE_TYPES, n, p=EXERCISE_TYPE_P),
+            rng.integers(10, 121, n),
+            rng.choice(INTENSITIES, n, p=INTENSITY_P),
+            self._timestamps(_time_ordered(rng, user_ids)),
+            np.round(rng.uniform(100, 600, n), 2),
+            np.round(rng.uniform(0.5, 10.0, n), 2),
+            rng.integers(80, 201, n),
+            np.round(rng.uniform(0, 300, n), 2),
+        ]
+
+    def _goals(self, rng, ids, user_ids, n):
+        goal_value = np.round(rng.uniform(5, 50, n), 2)
+        return [
+            ids,
+            user_ids,
+            rng.choice(GOAL_TYPES, n),
+            goal_value,
+            np.round(rng.uniform(0, 1, n) * goal_value, 2),
+        ]
+
+    def _health_metrics(self, rng, ids, user_ids, n):
+        # Systolic around 122 mmHg with a hypertensive tail; diastolic follows it
+        systolic = np.clip(rng.normal(122, 16, n), 85, 200).astype(np.int64)
+        diastolic = np.clip(systolic * 0.55 + rng.normal(12, 7, n), 50, 130).astype(np.int64)
+        blood_pressure = np.char.add(np.char.add(systolic.astype(str), "/"), diastolic.astype(str))
+        return [
+            ids,
+            user_ids,
+            np.round(rng.uniform(100, 300, n), 2),
+            np.round(rng.uniform(20, 50, n), 2),
+            np.round(rng.uniform(20, 60, n), 2),
+            np.round(rng.uniform(5, 30, n), 2),
+            np.round(rng.uniform(20, 80, n), 2),
+            blood_pressure,
+            rng.integers(1000, 20001, n),
+            systolic,
+            diastolic,
+            self._timestamps(_time_ordered(rng, user_ids)),
+        ]
+
+    def _nutrition_logs(self, rng, ids, user_ids, n):
+        return [
+            ids,
+            user_ids,
+            rng.choice(MEAL_NAMES, n),
+            _join_words(FOODS[rng.integers(0, len(FOODS), (n, 6))], ", "),
+            self._timestamps(_time_ordered(rng, user_ids)),
+        ]
+
+    def _sleep_data(self, rng, ids, user_ids, n):
+        # One session per sampled night, in start order per user. Bedtimes
+        # cluster around 23:00, so many sessions cross midnight.
+        nights = END_EPOCH - rng.integers(1, 366, n) * 86400
+        start = nights + rng.normal(23 * 3600, 5400, n).astype(np.int64)
+        start = start[np.lexsort((start, user_ids))]
+        duration = rng.integers(240, 541, n)
+        return [
+            ids,
+            user_ids,
+            duration,
+            rng.integers(1, 6, n),
+            self._timestamps(start),
+            self._timestamps(start + duration * 60),
+        ]
+
+    def _user_preferences(self, rng, users):
+        n = len(users)
+        return [
+            users,
+            rng.choice(FITNESS_GOALS, n),
+            rng.choice(DIETARY_RESTRICTIONS, n),
+            _join_words(EXERCISE_TYPES[rng.integers(0, len(EXERCISE_TYPES), (n, 3))], ", "),
+        ]
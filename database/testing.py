@@ -1,6 +1,40 @@
+import asyncio
+import contextlib
+import csv
+import datetime
+import gzip
+import io
+import json
 import unittest
 import sqlite3
 import os
+import tempfile
+
+import numpy as np
+
+import batch_catalog
+import benchmark
+import dal
+import bulk_load
+import cohorts
+import convert_timestamps
+import encode_categoricals
+import export
+import import_feed
+import index_advisor
+import index_profiles
+import ingest
+import migrate_blood_pressure
+import partitions
+import query_catalog
+import reshard
+import rollups
+import search
+import synthetic_data
+import threading
+import timeutil
+import transaction
+import user_stats
 
 class TestDatabaseOperations(unittest.TestCase):
     @classmethod
@@ -93,7 +127,7 @@ CREATE TABLE UserPreferences (
     FOREIGN KEY(UserForeignKey) REFERENCES Users (UserID)
 );
 -- Indexing for Users table
-CREATE INDEX idx_Users_UserName ON Users (UserName);
+CREATE INDEX idx_Users_Age ON Users (Age);
 CREATE INDEX idx_Users_Gender ON Users (Gender);
 
 -- Indexing for ExerciseLogs table
@@ -278,5 +312,1540 @@ CREATE INDEX idx_UserPreferences_FitnessGoal ON UserPreferences (FitnessGoal);
 
     # Add more test cases for other tables and CRUD operations
 
+
+class TestBulkLoad(unittest.TestCase):
+    def setUp(self):
+        # Fresh in-memory database built from base.sql for each test
+        self.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_bulk_insert_commits_in_chunks(self):
+        rows = ((f"user{i}", 20 + i % 50, "Male") for i in range(1050))
+        count, _ = bulk_load.bulk_insert(self.conn, "Users", ("UserName", "Age", "Gender"), rows, chunk_size=100)
+        self.assertEqual(count, 1050)
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM Users").fetchone()[0], 1050)
+
+    def test_drop_and_rebuild_indexes(self):
+        before = bulk_load.secondary_indexes(self.conn)
+        dropped = bulk_load.drop_indexes(self.conn, tables={"ExerciseLogs"})
+        self.assertTrue(dropped)
+        self.assertTrue(all("ExerciseLogs" in sql for _, sql in dropped))
+        self.assertEqual(len(bulk_load.secondary_indexes(self.conn)), len(before) - len(dropped))
+
+        bulk_load.rebuild_indexes(self.conn, dropped)
+        self.assertEqual(bulk_load.secondary_indexes(self.conn), before)
+
+    def test_load_pragmas_are_restored(self):
+        journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        with bulk_load.load_pragmas(self.conn, journal_mode="OFF", synchronous="OFF", cache_size=-1000):
+            self.assertEqual(self.conn.execute("PRAGMA cache_size").fetchone()[0], -1000)
+        self.assertEqual(self.conn.execute("PRAGMA journal_mode").fetchone()[0], journal_mode)
+
+    def test_merge_shards_in_key_order(self):
+        dataset = synthetic_data.SyntheticDataset(2, seed=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i, (first_user, last_user) in enumerate([(1001, 2000), (1, 1000)]):
+                path = os.path.join(tmp, f"shard{i}.db")
+                shard = sqlite3.connect(path)
+                bulk_load.ensure_schema(shard)
+                bulk_load.bulk_insert(shard, "Users", synthetic_data.COLUMNS["Users"], dataset.rows("Users", first_user, last_user))
+                bulk_load.bulk_insert(shard, "ExerciseLogs", synthetic_data.COLUMNS["ExerciseLogs"], dataset.rows("ExerciseLogs", first_user, last_user))
+                shard.close()
+                paths.append(path)
+
+            stats = bulk_load.merge_shards(self.conn, list(reversed(paths)), ["Users", "ExerciseLogs"])
+        self.assertEqual(stats["ExerciseLogs"][0], dataset.row_count("ExerciseLogs"))
+        merged = self.conn.execute("SELECT * FROM ExerciseLogs ORDER BY LogID").fetchall()
+        self.assertEqual(merged, list(dataset.rows("ExerciseLogs")))
+
+
+
+class TestSyntheticData(unittest.TestCase):
+    def test_same_seed_gives_same_rows(self):
+        first = list(synthetic_data.SyntheticDataset(0.5, seed=42).rows("ExerciseLogs"))
+        second = list(synthetic_data.SyntheticDataset(0.5, seed=42).rows("ExerciseLogs"))
+        other = list(synthetic_data.SyntheticDataset(0.5, seed=43).rows("ExerciseLogs"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_smaller_scale_is_prefix_of_larger_scale(self):
+        small = synthetic_data.SyntheticDataset(1, seed=5)
+        large = synthetic_data.SyntheticDataset(3, seed=5)
+        for table in synthetic_data.TABLES:
+            self.assertEqual(list(small.rows(table)), list(large.rows(table, 1, small.users)))
+
+    def test_keys_are_dense_and_timestamps_ordered_per_user(self):
+        dataset = synthetic_data.SyntheticDataset(1.5, seed=1)
+        rows = list(dataset.rows("ExerciseLogs"))
+        self.assertEqual([row[0] for row in rows], list(range(1, len(rows) + 1)))
+        self.assertEqual(len(rows), dataset.row_count("ExerciseLogs"))
+        self.assertEqual(sorted(rows, key=lambda row: (row[1], row[5])), rows)
+        self.assertTrue(all(1 <= row[1] <= dataset.users for row in rows))
+
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_percentile_nearest_rank(self):
+        samples = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(samples, 50), 50)
+        self.assertEqual(benchmark.percentile(samples, 95), 95)
+        self.assertEqual(benchmark.percentile(samples, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
+
+    def test_measure_materializes_rows(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            conn = sqlite3.connect(path)
+            bulk_load.ensure_schema(conn)
+            bulk_load.bulk_insert(conn, "Users", ("UserName", "Age"), ((f"u{i}", 30) for i in range(250)))
+            conn.close()
+            for mode in ("warm", "cold"):
+                result = benchmark.measure(path, "all users", "SELECT * FROM Users", iterations=5, warmup=1, mode=mode)
+                self.assertEqual(result["rows"], 250)
+                self.assertEqual(result["iterations"], 5)
+                self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": [{"name": "q", "mode": "warm", "p50_ms": 1.0},
+                                {"name": "r", "mode": "warm", "p50_ms": 1.0}]}
+        current = {"results": [{"name": "q", "mode": "warm", "p50_ms": 1.5},
+                               {"name": "r", "mode": "warm", "p50_ms": 1.05}]}
+        changes, regressions = benchmark.compare(baseline, current, threshold=0.10)
+        self.assertEqual(len(changes), 2)
+        self.assertEqual([entry[0] for entry in regressions], ["q"])
+
+
+
+class TestIndexAdvisor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(cls.conn)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def test_plan_issues(self):
+        issues = index_advisor.plan_issues([
+            "SCAN ExerciseLogs",
+            "SEARCH ExerciseLogs USING INDEX idx_ExerciseLogs_UserID (UserID=?)",
+            "SEARCH Users USING COVERING INDEX idx_Users_UserName (UserName=?)",
+            "USE TEMP B-TREE FOR ORDER BY",
+        ])
+        self.assertEqual([kind for kind, _ in issues], ["full scan", "non-covering lookup", "temp b-tree"])
+
+    def test_plan_indexes_match_whole_names(self):
+        plan = ["SEARCH ExerciseLogs USING INDEX idx_ExerciseLogs_UserID_DateTime (UserID=?)",
+                "SEARCH Users USING COVERING INDEX idx_Users_UserName (UserName=?)",
+                "SCAN NutritionLogs"]
+        used = index_advisor.plan_indexes(plan)
+        self.assertEqual(used, {"idx_ExerciseLogs_UserID_DateTime", "idx_Users_UserName"})
+        self.assertNotIn("idx_ExerciseLogs_UserID", used)
+
+    def test_skips_prefixes_of_existing_indexes(self):
+        self.assertTrue(index_advisor.is_redundant(self.conn, "ExerciseLogs", ("UserID",)))
+        self.assertTrue(index_advisor.is_redundant(self.conn, "ExerciseLogs", ("UserID", "DateTime")))
+        self.assertFalse(index_advisor.is_redundant(self.conn, "ExerciseLogs", ("UserID", "DateTime", "Intensity")))
+        self.assertFalse(index_advisor.is_redundant(self.conn, "ExerciseLogs", ("DateTime", "UserID")))
+
+    def test_recommend_drops_prefix_candidates(self):
+        def candidate(columns, used_by, speedup):
+            return {"statement": index_advisor.index_name("ExerciseLogs", columns), "table": "ExerciseLogs",
+                    "columns": columns, "queries": used_by, "used_by": used_by, "speedup": speedup,
+                    "write_overhead": 0.1, "size_bytes": 0}
+
+        narrow = candidate(("UserID", "Intensity"), ["q1"], 4.0)
+        wide = candidate(("UserID", "Intensity", "DurationMinutes"), ["q1", "q2"], 3.0)
+        other = candidate(("UserID", "Intensity"), ["q3"], 2.0)
+        chosen = index_advisor.recommend([narrow, wide, other])
+        self.assertEqual(chosen, [wide, other])
+        wide["speedup"] = 1.0
+        self.assertEqual(index_advisor.recommend([narrow, wide]), [narrow])
+
+    def test_proposes_composite_index_for_filtered_sort(self):
+        sql = query_catalog.query15_original
+        proposals = index_advisor.propose_indexes(self.conn, sql)
+        self.assertIn(("ExerciseLogs", ("UserID", "DateTime")), proposals)
+        self.assertIn(("ExerciseLogs", ("UserID", "DateTime", "ExerciseType", "DurationMinutes")), proposals)
+        self.assertIn(("Users", ("UserName",)), proposals)
+
+    def test_flags_function_wrapped_column(self):
+        hints = index_advisor.rewrite_hints(self.conn, query_catalog.meal_window_original)
+        self.assertEqual(len(hints), 1)
+        self.assertIn("NutritionLogs.MealTime", hints[0])
+        self.assertEqual(index_advisor.rewrite_hints(self.conn, query_catalog.meal_window_optimized), [])
+
+    def test_time_windows_seek_composite_indexes(self):
+        plan = " ".join(index_advisor.query_plan(self.conn, query_catalog.exercise_window_optimized))
+        self.assertIn("idx_ExerciseLogs_UserID_DateTime (UserID=? AND DateTime>? AND DateTime<?)", plan)
+        plan = " ".join(index_advisor.query_plan(self.conn, query_catalog.query5_optimized))
+        self.assertIn("(UserID=? AND MealTime>? AND MealTime<?)", plan)
+
+    def test_covering_indexes_give_index_only_plans(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "covering_indexes.sql")) as f:
+            conn.executescript(f.read())
+        for sql in (query_catalog.exercise_window_optimized, query_catalog.meal_window_optimized,
+                    query_catalog.query15_optimized):
+            self.assertIn("USING COVERING INDEX", " ".join(index_advisor.query_plan(conn, sql)))
+        conn.close()
+
+    def test_parse_sql_file(self):
+        queries = query_catalog.parse_sql_file()
+        self.assertEqual([number for number, _, _ in queries], list(range(1, len(queries) + 1)))
+        self.assertTrue(all(sql.rstrip().endswith(";") for _, _, sql in queries))
+
+
+
+class TestIndexProfiles(unittest.TestCase):
+    def test_ingest_profile_keeps_only_catalog_indexes(self):
+        indexes = index_profiles.profile_indexes("ingest-heavy")
+        self.assertIn("idx_ExerciseLogs_UserID_DateTime", indexes)
+        self.assertIn("idx_HealthMetrics_UserID_RecordedAt", indexes)
+        self.assertNotIn("idx_HealthMetrics_Weight", indexes)
+        self.assertNotIn("idx_NutritionLogs_MealName", indexes)
+        self.assertLess(set(indexes), set(index_profiles.profile_indexes("default")))
+
+    def test_apply_profile_round_trip(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        default = dict(bulk_load.secondary_indexes(conn))
+        dropped, created = index_profiles.apply_profile(conn, "ingest-heavy")
+        self.assertTrue(dropped)
+        self.assertEqual(created, [])
+        dropped, created = index_profiles.apply_profile(conn, "default")
+        self.assertEqual(dropped, [])
+        self.assertEqual(dict(bulk_load.secondary_indexes(conn)), default)
+        conn.close()
+
+    def test_apply_profile_rolls_back_on_failure(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        conn.execute("CREATE INDEX idx_Users_Age ON Users (Age)")
+        conn.execute("DROP INDEX idx_HealthMetrics_Weight")
+        # Takes the name the profile wants to create, so the CREATE INDEX fails
+        conn.execute("CREATE TABLE idx_HealthMetrics_Weight (x)")
+        conn.commit()
+        before = bulk_load.secondary_indexes(conn)
+        with self.assertRaises(sqlite3.OperationalError):
+            index_profiles.apply_profile(conn, "default")
+        self.assertEqual(bulk_load.secondary_indexes(conn), before)
+        self.assertIn("idx_Users_Age", dict(before))
+        conn.close()
+
+    def test_apply_profile_refuses_view_layouts(self):
+        for migrate in (partitions.migrate, encode_categoricals.migrate):
+            conn = sqlite3.connect(":memory:")
+            bulk_load.ensure_schema(conn)
+            migrate(conn)
+            before = bulk_load.secondary_indexes(conn)
+            with self.assertRaisesRegex(ValueError, "views: .*ExerciseLogs"):
+                index_profiles.apply_profile(conn, "ingest-heavy")
+            self.assertEqual(bulk_load.secondary_indexes(conn), before)
+            conn.close()
+
+
+class TestUserStats(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(self.conn)
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=9)
+        for table in ("ExerciseLogs", "SleepData", "GoalsAndProgress"):
+            bulk_load.bulk_insert(self.conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        user_stats.install(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    # The dashboard values computed the slow way, straight from the raw tables
+    def aggregate(self, user_id):
+        c = self.conn
+        most_frequent = c.execute(
+            "SELECT ExerciseType FROM ExerciseLogs WHERE UserID = ? GROUP BY ExerciseType "
+            "ORDER BY COUNT(*) DESC, ExerciseType LIMIT 1", (user_id,)).fetchone()
+        return {
+            "NumberOfGoals": c.execute("SELECT COUNT(*) FROM GoalsAndProgress WHERE UserID = ?", (user_id,)).fetchone()[0],
+            "TotalExerciseDuration": c.execute("SELECT SUM(DurationMinutes) FROM ExerciseLogs WHERE UserID = ?", (user_id,)).fetchone()[0],
+            "MostFrequentExerciseType": most_frequent[0] if most_frequent else None,
+            "AverageDailySleepDurationHours": c.execute("SELECT AVG(SleepDurationMinutes / 60.0) FROM SleepData WHERE UserID = ?", (user_id,)).fetchone()[0],
+            "AverageDailySleepQualityRating": c.execute("SELECT AVG(SleepQualityRating) FROM SleepData WHERE UserID = ?", (user_id,)).fetchone()[0],
+        }
+
+    def assertStatsMatch(self, user_ids):
+        for user_id in user_ids:
+            expected = self.aggregate(user_id)
+            actual = user_stats.dashboard(self.conn, user_id)
+            for key, value in expected.items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(actual[key], value, places=9)
+                else:
+                    self.assertEqual(actual[key], value, (user_id, key))
+
+    def test_install_matches_raw_aggregates(self):
+        self.assertStatsMatch(range(1, 51))
+
+    def test_triggers_follow_inserts_updates_and_deletes(self):
+        c = self.conn
+        for _ in range(6):
+            c.execute("INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes) VALUES (3, 'Yoga', 30)")
+        c.execute("INSERT INTO SleepData (UserID, SleepDurationMinutes, SleepQualityRating) VALUES (3, 480, NULL)")
+        c.execute("INSERT INTO GoalsAndProgress (UserID, GoalType) VALUES (99, 'Muscle Gain')")
+        c.execute("UPDATE ExerciseLogs SET UserID = 4, DurationMinutes = 45 WHERE UserID = 3 AND ExerciseType = 'Running'")
+        c.execute("UPDATE SleepData SET SleepQualityRating = 5 WHERE UserID = 4")
+        c.execute("DELETE FROM ExerciseLogs WHERE UserID = 5 AND ExerciseType = 'Cycling'")
+        c.execute("DELETE FROM GoalsAndProgress WHERE UserID = 6")
+        c.execute("UPDATE GoalsAndProgress SET UserID = 7 WHERE UserID = 8")
+        self.assertStatsMatch([3, 4, 5, 6, 7, 8, 99])
+        self.assertEqual(user_stats.dashboard(c, 3)["MostFrequentExerciseType"], "Yoga")
+
+    def test_rebuild_repairs_drift(self):
+        self.conn.execute("UPDATE UserStats SET GoalCount = 0, ExerciseMinutes = -1")
+        user_stats.rebuild(self.conn)
+        self.assertStatsMatch(range(1, 51))
+
+
+
+class TestEncodedLayout(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(self.conn)
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=4)
+        for table in encode_categoricals.CATEGORICAL:
+            bulk_load.bulk_insert(self.conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_views_preserve_rows_and_columns(self):
+        before = {table: self.conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+                  for table in encode_categoricals.CATEGORICAL}
+        encode_categoricals.migrate(self.conn)
+        for table, rows in before.items():
+            self.assertEqual(self.conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall(), rows)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(ExerciseLogsEncoded)")]
+        self.assertIn("ExerciseTypeID", columns)
+        self.assertNotIn("ExerciseType", columns)
+        indexed = [row[2] for row in self.conn.execute("PRAGMA index_info(idx_ExerciseLogs_ExerciseType)")]
+        self.assertEqual(indexed, ["ExerciseTypeID"])
+
+    def test_writes_through_views(self):
+        encode_categoricals.migrate(self.conn)
+        self.conn.execute("INSERT INTO ExerciseLogs (UserID, ExerciseType, Intensity, DurationMinutes) "
+                          "VALUES (500, 'Rowing', 'High', 40)")
+        self.conn.execute("INSERT INTO ExerciseLogs (UserID, ExerciseType, Intensity, DurationMinutes) "
+                          "VALUES (500, 'Rowing', 'Low', 20)")
+        self.conn.execute("UPDATE ExerciseLogs SET Intensity = 'Moderate' WHERE UserID = 500 AND DurationMinutes = 20")
+        rows = self.conn.execute("SELECT ExerciseType, Intensity FROM ExerciseLogs WHERE UserID = 500 ORDER BY LogID").fetchall()
+        self.assertEqual(rows, [("Rowing", "High"), ("Rowing", "Moderate")])
+        average = self.conn.execute("SELECT AVG(IntensityID) FROM ExerciseLogsEncoded WHERE UserID = 500").fetchone()[0]
+        self.assertEqual(average, 2.5)
+        self.conn.execute("DELETE FROM ExerciseLogs WHERE UserID = 500")
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ExerciseLogsEncoded WHERE UserID = 500").fetchone()[0], 0)
+
+    def test_foreign_keys_follow_the_encoded_tables(self):
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        encode_categoricals.migrate(self.conn)
+        self.assertEqual(self.conn.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+        self.assertEqual(self.conn.execute("PRAGMA integrity_check").fetchone()[0], "ok")
+        c = self.conn
+        c.execute("INSERT INTO Users (UserID, UserName, Gender) VALUES (9001, 'fk', 'Female')")
+        c.execute("INSERT INTO ExerciseLogs (UserID, ExerciseType) VALUES (9001, 'Running')")
+        c.execute("INSERT INTO GoalsAndProgress (UserID, GoalType) VALUES (9001, 'Muscle Gain')")
+        c.execute("INSERT INTO HealthMetrics (UserID, Weight) VALUES (9001, 70)")
+        c.execute("INSERT INTO NutritionLogs (UserID, MealName) VALUES (9001, 'Lunch')")
+        c.execute("INSERT INTO SleepData (UserID, SleepDurationMinutes) VALUES (9001, 420)")
+        c.execute("INSERT INTO UserPreferences (UserID, FitnessGoal, UserForeignKey) VALUES (9001, 'Build Muscle', 9001)")
+        c.commit()
+        for table in ("SleepData", "HealthMetrics", "ExerciseLogsEncoded"):
+            with self.assertRaises(sqlite3.IntegrityError):
+                c.execute(f"INSERT INTO {table} (UserID) VALUES (424242)")
+
+    def test_triggers_on_replaced_tables(self):
+        search.install(self.conn)
+        self.assertEqual(encode_categoricals.migrate(self.conn), list(search.SOURCES))
+        self.conn.execute("INSERT INTO NutritionLogs (UserID, FoodItems) VALUES (1, 'sauerkraut')")
+        self.assertEqual(len(search.search(self.conn, "NutritionLogs", "sauerkraut")), 1)
+        search.check(self.conn)
+
+    # The UserStats triggers move onto the encoded tables, whether they were
+    # installed before the migration or after it
+    def test_user_stats_follow_the_encoded_tables(self):
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=4)
+        bulk_load.bulk_insert(self.conn, "SleepData", synthetic_data.COLUMNS["SleepData"], dataset.rows("SleepData"))
+        other = sqlite3.connect(":memory:")
+        other.executescript("".join(self.conn.iterdump()))
+        user_stats.install(self.conn)
+        encode_categoricals.migrate(self.conn)
+        encode_categoricals.migrate(other)
+        user_stats.install(other)
+        for conn in (self.conn, other):
+            triggers = [row[0] for row in conn.execute(
+                "SELECT tbl_name FROM sqlite_master WHERE name = 'trg_ExerciseLogs_UserStats_Update'")]
+            self.assertEqual(triggers, ["ExerciseLogsEncoded"])
+            conn.execute("INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes) VALUES (1, 'Rowing', 40)")
+            conn.execute("INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes) VALUES (1, 'Rowing', 30)")
+            conn.execute("UPDATE ExerciseLogs SET ExerciseType = 'Swimming' WHERE UserID = 1 AND DurationMinutes = 30")
+            conn.execute("DELETE FROM ExerciseLogs WHERE LogID = (SELECT MIN(LogID) FROM ExerciseLogs)")
+            conn.execute("INSERT INTO GoalsAndProgress (UserID, GoalType) VALUES (1, 'Endurance')")
+            conn.commit()
+            kept = [conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+                    for table in ("UserStats", "UserExerciseTypeStats")]
+            user_stats.rebuild(conn)
+            self.assertEqual([conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+                              for table in ("UserStats", "UserExerciseTypeStats")], kept)
+            self.assertIn(("Rowing",), conn.execute(
+                "SELECT ExerciseType FROM UserExerciseTypeStats WHERE UserID = 1").fetchall())
+        other.close()
+
+
+class TestEpochTimestamps(unittest.TestCase):
+    def test_conversion_helpers(self):
+        self.assertEqual(timeutil.to_epoch("2024-01-01 00:00:00"), synthetic_data.END_EPOCH)
+        self.assertEqual(timeutil.to_epoch("2024-01-01"), synthetic_data.END_EPOCH)
+        self.assertEqual(timeutil.from_epoch(synthetic_data.END_EPOCH + 90), "2024-01-01 00:01:30")
+        self.assertEqual(timeutil.bucket(synthetic_data.END_EPOCH + 5000), synthetic_data.END_EPOCH)
+        self.assertEqual(timeutil.window("2023-09-01", "2023-10-01"), ("2023-09-01 00:00:00", "2023-10-01 00:00:00"))
+
+    def test_sleep_sessions_have_dates_and_cross_midnight(self):
+        rows = list(synthetic_data.SyntheticDataset(0.2, seed=3, epoch=True).rows("SleepData"))
+        self.assertTrue(all(isinstance(row[4], int) and row[5] - row[4] == row[2] * 60 for row in rows))
+        self.assertTrue(any(row[4] // timeutil.DAY != row[5] // timeutil.DAY for row in rows))
+        self.assertEqual(sorted(rows, key=lambda row: (row[1], row[4])), rows)
+        text_rows = list(synthetic_data.SyntheticDataset(0.2, seed=3).rows("SleepData"))
+        self.assertEqual([timeutil.to_epoch(row[4]) for row in text_rows], [row[4] for row in rows])
+
+    def test_convert_round_trip_and_readable_views(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=8)
+        for table in timeutil.TEMPORAL_COLUMNS:
+            bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        conn.execute("INSERT INTO SleepData (UserID, SleepStartTime, SleepEndTime) VALUES (1, '23:00:00', '07:00:00')")
+        before = conn.execute("SELECT SleepID, SleepStartTime, SleepEndTime FROM SleepData ORDER BY SleepID").fetchall()
+
+        converted = convert_timestamps.convert(conn, "epoch", batch_size=7)
+        self.assertEqual(converted["SleepData.SleepStartTime"], len(before) - 1)
+        self.assertEqual(convert_timestamps.undated(conn)["SleepData.SleepStartTime"], 1)
+        types = conn.execute("SELECT DISTINCT typeof(DateTime) FROM ExerciseLogs").fetchall()
+        self.assertEqual(types, [("integer",)])
+        readable = conn.execute("SELECT SleepID, SleepStartTime, SleepEndTime FROM SleepDataReadable "
+                                "WHERE typeof(SleepStartTime) = 'text' ORDER BY SleepID").fetchall()
+        self.assertEqual(readable, before[:-1])
+
+        convert_timestamps.convert(conn, "text")
+        self.assertEqual(conn.execute("SELECT SleepID, SleepStartTime, SleepEndTime FROM SleepData "
+                                      "ORDER BY SleepID").fetchall(), before)
+        conn.close()
+
+    def test_catalog_windows_follow_storage(self):
+        counts = {}
+        for epoch in (False, True):
+            conn = sqlite3.connect(":memory:")
+            bulk_load.ensure_schema(conn)
+            dataset = synthetic_data.SyntheticDataset(0.05, seed=4, epoch=epoch)
+            for table in synthetic_data.COLUMNS:
+                bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+            self.assertEqual(query_catalog.stores_epoch(conn), epoch)
+            queries = query_catalog.registry(query_catalog.stores_epoch(conn))
+            queries.update(query_catalog.sql_file_registry(epoch=epoch))
+            counts[epoch] = {name: len(conn.execute(sql).fetchall()) for name, sql in queries.items()}
+            plan = " ".join(index_advisor.query_plan(conn, queries["Exercise Window (Optimized)"]))
+            self.assertIn("(UserID=? AND DateTime>? AND DateTime<?)", plan)
+            conn.close()
+        self.assertEqual(counts[True], counts[False])
+        for label in ("Exercise Window", "Sleep Window", "Hypertensive Readings"):
+            self.assertTrue(counts[True][f"{label} (Optimized)"])
+            self.assertEqual(counts[True][f"{label} (Original)"], counts[True][f"{label} (Optimized)"])
+
+
+class TestBloodPressure(unittest.TestCase):
+    def test_backfill_splits_legacy_readings(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE HealthMetrics (MetricID INTEGER PRIMARY KEY, UserID INTEGER, BloodPressure VARCHAR(15))")
+        conn.executemany("INSERT INTO HealthMetrics (UserID, BloodPressure) VALUES (?, ?)",
+                         [(1, "120/80"), (1, "150/95"), (2, "n/a"), (2, None), (3, "141/88"), (2, "12a/8b"),
+                          (2, "1/2/3")])
+        added, rows = migrate_blood_pressure.migrate(conn, batch_size=2)
+        self.assertEqual(added, ["SystolicBP", "DiastolicBP", "RecordedAt"])
+        self.assertEqual(rows, 3)
+        self.assertEqual(migrate_blood_pressure.unparsed(conn), 3)
+        conn.execute("INSERT INTO HealthMetrics (UserID, BloodPressure) VALUES (4, '160/100')")
+        high = conn.execute("SELECT UserID, SystolicBP, DiastolicBP FROM HealthMetrics "
+                            "WHERE SystolicBP >= 140 OR DiastolicBP >= 90 ORDER BY UserID").fetchall()
+        self.assertEqual(high, [(1, 150, 95), (3, 141, 88), (4, 160, 100)])
+        self.assertEqual(migrate_blood_pressure.migrate(conn), ([], 0))
+        conn.close()
+
+    def test_update_resplits_the_reading(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        conn.execute("INSERT INTO HealthMetrics (UserID, BloodPressure) VALUES (1, '120/80')")
+        split = "SELECT SystolicBP, DiastolicBP FROM HealthMetrics WHERE MetricID = 1"
+        conn.execute("UPDATE HealthMetrics SET BloodPressure = '150/85' WHERE MetricID = 1")
+        self.assertEqual(conn.execute(split).fetchone(), (150, 85))
+        conn.execute("UPDATE HealthMetrics SET BloodPressure = '138/92', SystolicBP = 139 WHERE MetricID = 1")
+        self.assertEqual(conn.execute(split).fetchone(), (139, 85))
+        conn.execute("UPDATE HealthMetrics SET BloodPressure = 'n/a' WHERE MetricID = 1")
+        self.assertEqual(conn.execute(split).fetchone(), (None, None))
+        conn.execute("UPDATE HealthMetrics SET BloodPressure = '130/85' WHERE MetricID = 1")
+        conn.execute("UPDATE HealthMetrics SET BloodPressure = '12a/8b' WHERE MetricID = 1")
+        self.assertEqual(conn.execute(split).fetchone(), (None, None))
+        conn.execute("INSERT INTO HealthMetrics (MetricID, UserID, BloodPressure) VALUES (2, 1, '12a/8b')")
+        self.assertEqual(conn.execute(split.replace("= 1", "= 2")).fetchone(), (None, None))
+        conn.close()
+
+    def test_migration_installs_the_base_sql_triggers(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        triggers = "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'HealthMetrics' ORDER BY 1"
+        expected = conn.execute(triggers).fetchall()
+        self.assertEqual([name for name, _ in expected], sorted(migrate_blood_pressure.TRIGGER_NAMES))
+        migrate_blood_pressure.migrate(conn)
+        self.assertEqual(conn.execute(triggers).fetchall(), expected)
+        conn.close()
+
+    def test_hypertensive_query_is_an_index_range_scan(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        bulk_load.bulk_insert(conn, "HealthMetrics", synthetic_data.COLUMNS["HealthMetrics"],
+                              synthetic_data.SyntheticDataset(0.1, seed=2).rows("HealthMetrics"))
+        original = conn.execute(query_catalog.hypertensive_original).fetchall()
+        optimized = conn.execute(query_catalog.hypertensive_optimized).fetchall()
+        self.assertTrue(optimized)
+        self.assertEqual(sorted(original), sorted(optimized))
+        plan = " ".join(index_advisor.query_plan(conn, query_catalog.hypertensive_optimized))
+        self.assertIn("idx_HealthMetrics_Hypertensive_RecordedAt (RecordedAt>?)", plan)
+        self.assertTrue(any(s >= 140 and d < 90 for s, d in conn.execute(
+            "SELECT SystolicBP, DiastolicBP FROM HealthMetrics WHERE MetricID IN (%s)"
+            % ",".join(str(row[0]) for row in optimized))))
+        conn.close()
+
+
+class TestDataAccessLayer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "dal.db")
+        conn = sqlite3.connect(self.path)
+        bulk_load.ensure_schema(conn)
+        conn.close()
+        self.db = dal.Database(self.path, pool_size=2)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_writes_through_encoded_views(self):
+        conn = sqlite3.connect(self.path)
+        encode_categoricals.migrate(conn)
+        conn.close()
+        user_id = self.db.users.insert(UserName="jane", Gender="Female")
+        self.assertEqual(user_id, 1)
+        self.assertEqual(self.db.users.get(user_id).Gender, "Female")
+        self.assertEqual(self.db.users.insert(UserName="joe"), 2)
+        log_id = self.db.exercise_logs.insert(UserID=user_id, ExerciseType="Rowing", Intensity="High")
+        self.assertEqual(self.db.exercise_logs.get(log_id).ExerciseType, "Rowing")
+        self.assertEqual(self.db.exercise_logs.insert_many([(user_id, "Yoga", 20, "Low", None, 0, 0, 0, 0)]), 1)
+        self.assertEqual(self.db.exercise_logs.delete(log_id), 1)
+        self.assertEqual(self.db.exercise_logs.delete(log_id), 0)
+        self.assertEqual([log.ExerciseType for log in self.db.exercise_logs.by_user(user_id)], ["Yoga"])
+
+    def test_repositories_return_named_tuples(self):
+        with self.db.transaction() as conn:
+            user_id = self.db.users.insert(conn, UserName="jane", Age=31)
+            self.db.exercise_logs.insert_many(
+                [(user_id, "Running", 30, "High", "2023-09-0%d 07:00:00" % day, 300, 5, 150, 0) for day in (1, 2, 3)],
+                conn,
+            )
+        user = self.db.users.get(user_id)
+        self.assertIsInstance(user, dal.User)
+        self.assertEqual((user.UserName, user.Age), ("jane", 31))
+        window = self.db.exercise_logs.by_user(user_id, "2023-09-02", "2023-09-03")
+        self.assertEqual([log.DateTime for log in window], ["2023-09-02 07:00:00"])
+        self.assertEqual(self.db.exercise_logs.latest(user_id).DateTime, "2023-09-03 07:00:00")
+        self.assertEqual(self.db.exercise_logs.total_minutes(user_id), 90)
+        with self.assertRaises(ValueError):
+            self.db.users.insert(UserName="x", Nickname="y")
+        self.assertEqual(self.db.goals.by_user(user_id), [])
+        with self.assertRaises(ValueError):
+            self.db.goals.by_user(user_id, start="2023-09-01")
+
+    def test_transaction_rolls_back_and_pragmas_apply(self):
+        with self.assertRaises(ValueError):
+            transaction.insert_user(self.db, {"UserName": "JohnDoe", "Age": -25})
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.db.transaction() as conn:
+                self.db.users.insert(conn, UserName="ok", Age=20)
+                self.db.users.insert(conn, UserName="bad", Age=-1)
+        self.assertEqual(self.db.users.by_name("ok"), [])
+        with self.db.pool.connection() as conn:
+            self.assertEqual(conn.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+            self.assertFalse(conn.in_transaction)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.sleep_data.insert(UserID=999, SleepDurationMinutes=400)
+
+    def test_pool_is_bounded_and_thread_safe(self):
+        held = [self.db.pool.acquire(), self.db.pool.acquire()]
+        with self.assertRaises(dal.PoolTimeout):
+            self.db.pool.acquire(timeout=0.05)
+        for conn in held:
+            self.db.pool.release(conn)
+
+        user_id = self.db.users.insert(UserName="shared", Age=40)
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(50):
+                    self.assertEqual(self.db.users.get(user_id).UserName, "shared")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(self.db.pool.opened, 2)
+
+    def test_user_queries_follow_epoch_storage(self):
+        users = range(1, 51)
+        counts = {}
+        for epoch in (False, True):
+            path = os.path.join(self.tmp.name, f"catalog{int(epoch)}.db")
+            conn = sqlite3.connect(path)
+            bulk_load.ensure_schema(conn)
+            dataset = synthetic_data.SyntheticDataset(0.05, seed=4, epoch=epoch)
+            for table in synthetic_data.TABLES:
+                bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+            conn.close()
+            numbers = sorted(query_catalog.user_queries())
+            with dal.Database(path, pool_size=1) as db:
+                counts[epoch] = {(n, u): len(db.user_query(n, u)) for n in numbers for u in users}
+                meals = [len(db.profile(u, meal_day="2023-10-01").meals) for u in users]
+            self.assertEqual(meals, [counts[epoch][5, u] for u in users])
+
+            async def run():
+                async with dal.AsyncDatabase(path, readers=1) as db:
+                    return [len(await db.user_query(5, u)) for u in users]
+
+            self.assertEqual(asyncio.run(run()), [counts[epoch][5, u] for u in users])
+        self.assertTrue(sum(counts[True][5, u] for u in users))
+        self.assertEqual(counts[True], counts[False])
+
+
+class TestAsyncDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "aio.db")
+        conn = sqlite3.connect(self.path)
+        bulk_load.ensure_schema(conn)
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=6)
+        for table in synthetic_data.TABLES:
+            bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_concurrent_user_queries_match_sync_results(self):
+        queries = query_catalog.user_queries()
+        conn = sqlite3.connect(self.path)
+        expected = {(n, u): conn.execute(sql, (u,) * k).fetchall() for n, (sql, k) in queries.items() for u in (1, 2, 3)}
+        conn.close()
+
+        async def run():
+            async with dal.AsyncDatabase(self.path, readers=3, max_pending=4) as db:
+                keys = list(expected)
+                results = await asyncio.gather(*(db.user_query(n, u) for n, u in keys))
+                user_id = await db.insert_user({"UserName": "async", "Age": 30})
+                with self.assertRaises(ValueError):
+                    await db.insert_user({"UserName": "bad", "Age": -1})
+                return dict(zip(keys, results)), user_id
+
+        results, user_id = asyncio.run(run())
+        self.assertEqual(results, expected)
+        self.assertEqual(user_id, 51)
+
+    def test_cancelled_read_is_interrupted(self):
+        slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+        async def run():
+            async with dal.AsyncDatabase(self.path, readers=1) as db:
+                task = asyncio.create_task(db.fetchall(slow))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                return await asyncio.wait_for(db.user_query(3, 1), 5)
+
+        self.assertEqual(len(asyncio.run(run())), 1)
+
+    def test_cancelled_write_keeps_its_slot_until_it_finishes(self):
+        release = threading.Event()
+        order = []
+
+        def slow_write(db):
+            release.wait(5)
+            order.append("write")
+
+        async def run():
+            async with dal.AsyncDatabase(self.path, readers=1, max_pending=1) as db:
+                task = asyncio.create_task(db.write(slow_write))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                read = asyncio.create_task(db.fetchall("SELECT 1"))
+                await asyncio.sleep(0.05)
+                self.assertFalse(read.done())
+                release.set()
+                order.append(await asyncio.wait_for(read, 5))
+
+        asyncio.run(run())
+        self.assertEqual(order, ["write", [(1,)]])
+
+
+class TestGroupCommit(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "wal.db")
+        conn = sqlite3.connect(self.path)
+        bulk_load.ensure_schema(conn)
+        conn.execute("INSERT INTO Users (UserName, Age) VALUES ('a', 30)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pragma_profiles(self):
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(dal.apply_pragma_profile(conn, "wal", autocheckpoint=0), "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+        self.assertEqual(conn.execute("PRAGMA wal_autocheckpoint").fetchone()[0], 0)
+        self.assertEqual(dal.apply_pragma_profile(conn, "rollback"), "delete")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 2)
+        with self.assertRaises(ValueError):
+            dal.apply_pragma_profile(conn, "fast")
+        conn.close()
+
+    def test_failures_are_reported_per_request(self):
+        insert = "INSERT INTO ExerciseLogs (UserID, DurationMinutes) VALUES (?, ?)"
+        with dal.GroupCommitWriter(self.path, max_delay=0.05) as writer:
+            self.assertEqual(writer.journal_mode, "wal")
+            futures = [writer.submit_sql(insert, (1, minutes)) for minutes in (10, 20)]
+            futures.append(writer.submit_sql(insert, (999, 30)))  # foreign key violation
+            futures.append(writer.submit_sql(insert, (1, 40)))
+            results = [f.exception(timeout=5) or f.result() for f in futures]
+        self.assertIsInstance(results[2], sqlite3.IntegrityError)
+        self.assertEqual(writer.batches, 1)
+        conn = sqlite3.connect(self.path)
+        rows = conn.execute("SELECT LogID, DurationMinutes FROM ExerciseLogs ORDER BY LogID").fetchall()
+        self.assertEqual(rows, [(results[0], 10), (results[1], 20), (results[3], 40)])
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        conn.close()
+
+    def test_concurrent_producers_share_commits(self):
+        with dal.GroupCommitWriter(self.path) as writer:
+            def produce(n):
+                for i in range(n):
+                    writer.execute("INSERT INTO SleepData (UserID, SleepDurationMinutes) VALUES (1, ?)", (i,))
+
+            threads = [threading.Thread(target=produce, args=(50,)) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(writer.requests, 400)
+        self.assertLess(writer.batches, 400)
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM SleepData").fetchone()[0], 400)
+        conn.close()
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(self.conn)
+        self.conn.executemany("INSERT INTO Users (UserName, Age) VALUES (?, 30)", [("a",), ("b",)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_validation_rejects_rows_without_aborting_batch(self):
+        columns = ("UserID", "SleepDurationMinutes", "SleepQualityRating", "SleepStartTime")
+        rows = [
+            (1, 420, 4, "2023-09-01 23:10:00"),
+            (2, 380, 9, "2023-09-02 23:00:00"),     # rating out of range
+            (7, 400, 3, "2023-09-03 22:45:00"),     # unknown user
+            (None, 400, 3, "2023-09-03 22:45:00"),  # missing user
+            (1, "long", 3, 1693775100),             # not a number
+            (2, 450, 5, "last night"),              # not a timestamp
+            (2, 450, 5, 1693775100),
+        ]
+        report = ingest.ingest(self.conn, "SleepData", columns, rows, chunk_size=2)
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual(report["rejected"], {
+            1: "SleepQualityRating: out of range [1, 5]",
+            2: "UserID: unknown user",
+            3: "UserID: missing",
+            4: "SleepDurationMinutes: not a number",
+            5: "SleepStartTime: not a timestamp",
+        })
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM SleepData").fetchone()[0], 2)
+        self.assertIn("1  UserID: unknown user  (rows 2)", ingest.format_report(report))
+
+    def test_database_errors_are_isolated_by_bisection(self):
+        rows = [(i, 1, "Running", 30) for i in range(1, 41)]
+        rows[13] = (5, 1, "Running", 30)   # duplicate primary key
+        rows[29] = (6, 2, "Cycling", 45)   # duplicate primary key
+        report = ingest.ingest(self.conn, "ExerciseLogs", ("LogID", "UserID", "ExerciseType", "DurationMinutes"),
+                               rows, chunk_size=16)
+        self.assertEqual(sorted(report["rejected"]), [13, 29])
+        self.assertTrue(report["rejected"][13].startswith("database: UNIQUE constraint failed"))
+        self.assertEqual(report["inserted"], 38)
+        self.assertFalse(self.conn.in_transaction)
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(self.conn)
+        self.conn.executemany("INSERT INTO Users (UserName) VALUES (?)", [(f"user{i}",) for i in range(1, 4)])
+        self.conn.executemany(
+            "INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes, DateTime) VALUES (?, ?, ?, ?)",
+            [(i % 3 + 1, "Running", i, f"2023-09-{i % 28 + 1:02d} 07:00:00") for i in range(100)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def read_csv(self, path):
+        with open(path, newline="") as f:
+            return list(csv.reader(f))
+
+    def test_pages_through_views(self):
+        expected = {table: self.conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+                    for table in ("Users", "ExerciseLogs")}
+        for migrate in (encode_categoricals.migrate, partitions.migrate):
+            conn = sqlite3.connect(":memory:")
+            self.conn.backup(conn)
+            migrate(conn)
+            for table, rows in expected.items():
+                self.assertEqual(export.page_key(conn, table), "UserID" if table == "Users" else "LogID")
+                self.assertEqual([row for _, page in export.pages(conn, table, batch_size=7) for row in page], rows)
+            self.assertEqual(cohorts.signature(conn, "ExerciseLogs"), (100, 100))
+            conn.close()
+        self.conn.execute("CREATE VIEW Recent AS SELECT DurationMinutes, LogID FROM ExerciseLogs")
+        with self.assertRaises(ValueError):
+            list(export.pages(self.conn, "Recent"))
+
+    def test_filtered_csv_and_jsonl_match_query(self):
+        window = export.window_bounds(self.conn, "ExerciseLogs", "2023-09-10", "2023-09-20")
+        expected = self.conn.execute(
+            "SELECT LogID, DurationMinutes FROM ExerciseLogs WHERE UserID BETWEEN 2 AND 3 "
+            "AND DateTime >= '2023-09-10 00:00:00' AND DateTime < '2023-09-20 00:00:00' ORDER BY LogID").fetchall()
+        result = export.export(self.conn, "ExerciseLogs", self.path("out.csv"), columns=["LogID", "DurationMinutes"],
+                               users=(2, 3), window=window, batch_size=7)
+        self.assertEqual(result["rows"], len(expected))
+        rows = self.read_csv(self.path("out.csv"))
+        self.assertEqual(rows[0], ["LogID", "DurationMinutes"])
+        self.assertEqual([tuple(map(int, row)) for row in rows[1:]], expected)
+
+        export.export(self.conn, "ExerciseLogs", self.path("out.jsonl"), "jsonl", users=(2, 3), window=window)
+        with open(self.path("out.jsonl")) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([(r["LogID"], r["DurationMinutes"]) for r in records], expected)
+
+    def test_resume_after_interruption(self):
+        output, checkpoint = self.path("resume.csv"), self.path("resume.ckpt")
+        real_pages = export.pages
+
+        def interrupted(*args, **kwargs):
+            for i, page in enumerate(real_pages(*args, **kwargs)):
+                if i == 3:
+                    raise KeyboardInterrupt
+                yield page
+
+        export.pages = interrupted
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                export.export(self.conn, "ExerciseLogs", output, batch_size=10, checkpoint=checkpoint)
+        finally:
+            export.pages = real_pages
+        self.assertEqual(export.load_checkpoint(checkpoint)["rows"], 30)
+        # Rows written after the checkpoint are discarded on resume
+        with open(output, "a") as f:
+            f.write("partial,row\n")
+
+        result = export.export(self.conn, "ExerciseLogs", output, batch_size=10, checkpoint=checkpoint)
+        self.assertTrue(result["resumed"])
+        self.assertEqual(result["rows"], 70)
+        export.export(self.conn, "ExerciseLogs", self.path("full.csv"))
+        self.assertEqual(self.read_csv(output), self.read_csv(self.path("full.csv")))
+        with self.assertRaises(ValueError):
+            export.export(self.conn, "ExerciseLogs", output, "jsonl", checkpoint=checkpoint)
+
+
+class TestImportFeed(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(self.conn)
+        self.conn.executemany("INSERT INTO Users (UserName) VALUES (?)", [("a",), ("b",)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.dir.cleanup()
+
+    def test_csv_mapping_conversion_and_rejects(self):
+        path = os.path.join(self.dir.name, "sessions.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["log_id", "user_id", "exercise_type", "duration", "start", "calories_burned", "device"])
+            writer.writerow([900, 1, "Running", "30", "2023-09-01T07:00:00Z", "250.5", "watch"])
+            writer.writerow([901, 2, "Cycling", "45.0", "1693555200000", "", "band"])
+            writer.writerow([902, 2, "Rowing", "-3", "2023-09-02 06:30:00", "100", "band"])
+            writer.writerow([903, 9, "Rowing", "20", "2023-09-03T06:30:00+02:00", "100", "band"])
+        stats = []
+        report = import_feed.import_feed(self.conn, path, "ExerciseLogs", {"duration": "DurationMinutes",
+                                         "start": "DateTime"}, batch_size=2, commit_rows=2, progress=stats.append)
+        self.assertEqual(report["mapping"], {"user_id": "UserID", "exercise_type": "ExerciseType",
+                                             "duration": "DurationMinutes", "start": "DateTime",
+                                             "calories_burned": "CaloriesBurned"})
+        self.assertEqual((report["received"], report["inserted"]), (4, 2))
+        self.assertEqual(report["examples"], {"DurationMinutes: out of range [0, 1440]": [2],
+                                              "UserID: unknown user": [3]})
+        self.assertEqual(self.conn.execute(
+            "SELECT UserID, DurationMinutes, DateTime, CaloriesBurned FROM ExerciseLogs ORDER BY LogID").fetchall(),
+            [(1, 30, "2023-09-01 07:00:00", 250.5), (2, 45, "2023-09-01 08:00:00", None)])
+        self.assertEqual(stats[-1]["fraction"], 1.0)
+
+    def test_gzipped_jsonl_with_deferred_indexes(self):
+        path = os.path.join(self.dir.name, "sleep.jsonl.gz")
+        with gzip.open(path, "wt") as f:
+            for i in range(50):
+                f.write(json.dumps({"UserID": i % 2 + 1, "SleepDurationMinutes": 400 + i,
+                                    "SleepStartTime": 1693602000 + i * 86400}) + "\n")
+        indexes = bulk_load.secondary_indexes(self.conn, ["SleepData"])
+        report = import_feed.import_feed(self.conn, path, "SleepData", batch_size=16, validate=False,
+                                         defer_indexes=True)
+        self.assertEqual(report["inserted"], 50)
+        self.assertEqual(bulk_load.secondary_indexes(self.conn, ["SleepData"]), indexes)
+        self.assertEqual(self.conn.execute("SELECT MIN(SleepStartTime) FROM SleepData").fetchone()[0],
+                         "2023-09-01 21:00:00")
+
+
+class TestPartitions(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.dir.name, "main.db"), isolation_level=None)
+        bulk_load.ensure_schema(self.conn)
+        self.conn.execute("INSERT INTO Users (UserName) VALUES ('a')")
+        self.conn.executemany(
+            "INSERT INTO ExerciseLogs (UserID, ExerciseType, DurationMinutes, DateTime) VALUES (1, 'Running', ?, ?)",
+            [(i, f"2023-{i % 4 + 9:02d}-{i % 28 + 1:02d} 07:00:00") for i in range(40)]
+            + [(99, None)])
+        self.before = sorted(self.conn.execute("SELECT * FROM ExerciseLogs").fetchall())
+        self.months, _ = partitions.migrate(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.dir.cleanup()
+
+    def test_migrate_and_route_writes(self):
+        self.assertEqual(self.months, ["2023-09", "2023-10", "2023-11", "2023-12"])
+        self.assertEqual(sorted(self.conn.execute("SELECT * FROM ExerciseLogs").fetchall()), self.before)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ExerciseLogs_202310").fetchone()[0], 10)
+        self.assertEqual(self.conn.execute("SELECT DurationMinutes FROM ExerciseLogs_Default").fetchall(), [(99,)])
+
+        self.conn.execute("INSERT INTO ExerciseLogs (UserID, DurationMinutes, DateTime) VALUES (1, 500, '2023-10-31')")
+        self.assertEqual(self.conn.execute("SELECT LogID FROM ExerciseLogs_202310 WHERE DurationMinutes = 500")
+                         .fetchone()[0], 42)
+        self.conn.execute("UPDATE ExerciseLogs SET DateTime = '2023-11-02 08:00:00' WHERE LogID = 42")
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ExerciseLogs_202311 WHERE LogID = 42")
+                         .fetchone()[0], 1)
+
+        # Rows for a month without a partition create it when inserted directly
+        partitions.insert_many(self.conn, ("UserID", "DurationMinutes", "DateTime"),
+                               [(1, 7, "2024-01-03 06:00:00"), (1, 8, "2024-01-04 06:00:00")])
+        self.assertEqual(self.conn.execute("SELECT LogID FROM ExerciseLogs_202401 ORDER BY LogID").fetchall(),
+                         [(43,), (44,)])
+        self.conn.execute("DELETE FROM ExerciseLogs WHERE LogID = 43")
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ExerciseLogs").fetchone()[0], 43)
+
+    def test_data_access_layer(self):
+        cache = dal.QueryCache()
+        with dal.Database(os.path.join(self.dir.name, "main.db"), pool_size=1, cache=cache) as db:
+            self.assertEqual(len(db.user_query(1, 1)), 41)
+            log_id = db.exercise_logs.insert(UserID=1, ExerciseType="Rowing", DateTime="2023-10-05 07:00:00")
+            self.assertEqual(log_id, 42)
+            self.assertEqual(db.exercise_logs.get(log_id).ExerciseType, "Rowing")
+            self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ExerciseLogs_202310 WHERE LogID = 42")
+                             .fetchone()[0], 1)
+            self.assertEqual(len(db.user_query(1, 1)), 42)
+
+            rows = [(1, "Yoga", 20, None, "2024-02-0%d 07:00:00" % day, None, None, None, None) for day in (1, 2)]
+            self.assertEqual(db.exercise_logs.insert_many(rows), 2)
+            self.assertEqual([log.LogID for log in db.exercise_logs.by_user(1, "2024-02-01", "2024-03-01")],
+                             [43, 44])
+            self.assertEqual(db.exercise_logs.insert(UserID=1, ExerciseType="Swim"), 45)
+            self.assertEqual(len(db.user_query(1, 1)), 45)
+
+            self.assertEqual(db.exercise_logs.delete(log_id), 1)
+            self.assertIsNone(db.exercise_logs.get(log_id))
+            self.assertEqual(db.exercise_logs.delete(log_id), 0)
+            self.assertEqual(len(db.user_query(1, 1)), 44)
+        self.assertEqual(self.conn.execute(f"SELECT COUNT(*) FROM {partitions.KEYS}").fetchone()[0], 44)
+
+    def test_archive_and_pruned_queries(self):
+        archive_dir = os.path.join(self.dir.name, "archive")
+        written = partitions.maintain(self.conn, archive_dir, hot_months=2, ahead=0,
+                                      today=datetime.datetime(2023, 12, 15))
+        self.assertEqual([os.path.basename(p) for p in written], ["ExerciseLogs_202309.db", "ExerciseLogs_202310.db"])
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM ExerciseLogs").fetchone()[0], 21)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.conn.execute("SELECT 1 FROM ExerciseLogs_202309")
+
+        sql, _ = partitions.select(self.conn, "LogID", "2023-11-01", "2023-12-01")
+        self.assertNotIn("archive_", sql)
+        self.assertIn("ExerciseLogs_202311", sql)
+        self.assertNotIn("ExerciseLogs_202312", sql)
+        rows = partitions.query(self.conn, "DurationMinutes", "2023-09-01", "2023-11-01")
+        self.assertEqual(sorted(r[0] for r in rows), [i for i in range(40) if i % 4 in (0, 1)])
+        with self.assertRaises(sqlite3.OperationalError):
+            self.conn.execute("DELETE FROM archive_202309.ExerciseLogs_202309")
+
+        # Archive paths are stored absolute, so other working directories can attach them
+        self.assertTrue(all(os.path.isabs(row[4]) for row in partitions.partitions(self.conn) if row[4]))
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.dir.name)
+            conn = sqlite3.connect("main.db")
+            os.chdir(tempfile.gettempdir())
+            self.assertEqual(len(partitions.query(conn, "LogID", "2023-09-01", "2023-10-01")), 10)
+            conn.close()
+        finally:
+            os.chdir(cwd)
+
+        # LogIDs of archived months stay taken
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.conn.execute("INSERT INTO ExerciseLogs (LogID, UserID, DateTime) VALUES (1, 1, '2023-12-11')")
+
+    def test_log_ids_unique_across_partitions(self):
+        c = self.conn
+        log_id, month = c.execute("SELECT LogID, substr(DateTime, 1, 7) FROM ExerciseLogs_202309 LIMIT 1").fetchone()
+        for stamp in ("2023-10-11 07:00:00", "2023-09-11 07:00:00", None):
+            with self.assertRaises(sqlite3.IntegrityError):
+                c.execute("INSERT INTO ExerciseLogs (LogID, UserID, DateTime) VALUES (?, 1, ?)", (log_id, stamp))
+        with self.assertRaises(sqlite3.IntegrityError):
+            partitions.insert_many(c, ("LogID", "UserID", "DateTime"),
+                                   [(1000, 1, "2023-10-01 06:00:00"), (log_id, 1, "2024-02-01 06:00:00")])
+        self.assertEqual(c.execute("SELECT COUNT(*) FROM ExerciseLogs WHERE LogID IN (?, 1000)", (log_id,))
+                         .fetchone()[0], 1)
+        self.assertFalse(c.execute("SELECT 1 FROM ExerciseLogPartitions WHERE Month = '2024-02'").fetchone())
+
+        # Explicit and missing LogIDs mixed; updates and deletes keep the registry in step
+        partitions.insert_many(c, ("LogID", "UserID", "DateTime"),
+                               [(1000, 1, "2023-10-01 06:00:00"), (None, 1, "2023-10-02 06:00:00")])
+        self.assertEqual(c.execute("SELECT LogID FROM ExerciseLogs WHERE DateTime = '2023-10-02 06:00:00'")
+                         .fetchall(), [(42,)])
+        self.assertEqual(c.execute("SELECT NextLogID FROM ExerciseLogPartitionState").fetchone()[0], 1001)
+        c.execute("UPDATE ExerciseLogs SET DateTime = '2023-12-01 06:00:00' WHERE LogID = 1000")
+        c.execute("DELETE FROM ExerciseLogs WHERE LogID = ?", (log_id,))
+        c.execute("INSERT INTO ExerciseLogs (LogID, UserID, DateTime) VALUES (?, 1, '2023-10-11')", (log_id,))
+        self.assertEqual(c.execute("SELECT LogID FROM ExerciseLogs GROUP BY LogID HAVING COUNT(*) > 1").fetchall(), [])
+        self.assertEqual(c.execute("SELECT COUNT(*) FROM ExerciseLogKeys").fetchone()[0],
+                         c.execute("SELECT COUNT(*) FROM ExerciseLogs").fetchone()[0])
+
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.dir.name, "single.db")
+        conn = sqlite3.connect(self.source)
+        bulk_load.ensure_schema(conn)
+        conn.executemany("INSERT INTO Users (UserName, Age) VALUES (?, 30)", [(f"u{i}",) for i in range(1, 41)])
+        conn.executemany(
+            "INSERT INTO ExerciseLogs (UserID, ExerciseType, CaloriesBurned) VALUES (?, ?, ?)",
+            [(i % 40 + 1, ("Running", "Cycling", "Yoga")[i % 3], float(i)) for i in range(300)])
+        conn.commit()
+        self.expected = {row[0]: row[1:] for row in conn.execute(
+            "SELECT ExerciseType, AVG(CaloriesBurned), COUNT(*), MAX(CaloriesBurned) FROM ExerciseLogs "
+            "GROUP BY ExerciseType")}
+        conn.close()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def paths(self, prefix, shards):
+        return reshard.shard_paths(os.path.join(self.dir.name, prefix), shards)
+
+    def test_jump_hash_moves_few_users(self):
+        users = range(1, 10001)
+        counts = [0] * 4
+        for user_id in users:
+            counts[dal.shard_of(user_id, 4)] += 1
+        self.assertTrue(all(2200 < count < 2800 for count in counts))
+        self.assertAlmostEqual(reshard.moved_fraction(users, 4, 5), 0.2, delta=0.02)
+        self.assertEqual(reshard.moved_fraction(users, 4, 4), 0.0)
+
+    def test_routing_scatter_gather_and_reshard(self):
+        paths = self.paths("a", 3)
+        reshard.reshard([self.source], paths)
+        with dal.ShardedDatabase(paths) as db:
+            self.assertEqual(db.count("Users"), 40)
+            for user_id in (1, 17, 40):
+                shard = db.for_user(user_id)
+                self.assertIsNotNone(shard.users.get(user_id))
+                self.assertEqual(len(db.user_query(1, user_id)), shard.exercise_logs.count_for_user(user_id))
+            grouped = db.grouped("ExerciseLogs", "ExerciseType", {"avg": ("avg", "CaloriesBurned"),
+                                                                   "n": ("count", "*"),
+                                                                   "top": ("max", "CaloriesBurned")})
+            self.assertEqual({k: (v["avg"], v["n"], v["top"]) for k, v in grouped.items()}, self.expected)
+
+            user_id = transaction.insert_user(db, {"UserName": "new", "Age": 22})
+            self.assertEqual(user_id, 41)
+            self.assertEqual(db.for_user(user_id).users.get(user_id).UserName, "new")
+            db.for_user(user_id).exercise_logs.insert(UserID=user_id, ExerciseType="Yoga")
+
+        grown = self.paths("b", 4)
+        counts = reshard.reshard(paths, grown)
+        self.assertEqual(sum(tables["ExerciseLogs"] for tables in counts.values()), 301)
+        with dal.ShardedDatabase(grown) as db:
+            self.assertEqual(db.for_user(41).exercise_logs.count_for_user(41), 1)
+            self.assertEqual(db.new_user_id(), 42)
+        with self.assertRaises(ValueError):
+            dal.ShardedDatabase(list(reversed(grown)))
+
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+        conn = sqlite3.connect(self.path)
+        bulk_load.ensure_schema(conn)
+        conn.executemany("INSERT INTO Users (UserName, Age) VALUES (?, 30)", [("a",), ("b",)])
+        conn.executemany("INSERT INTO SleepData (UserID, SleepDurationMinutes) VALUES (?, 420)", [(1,), (2,)])
+        conn.commit()
+        conn.close()
+        self.now = 0.0
+        self.cache = dal.QueryCache(max_entries=4, ttl=10.0, clock=lambda: self.now)
+        self.db = dal.Database(self.path, pool_size=2, cache=self.cache)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_lru_and_ttl(self):
+        for user_id in (1, 2):
+            self.db.user_query(6, user_id)
+            self.db.user_query(6, user_id)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+        for number in (1, 2, 12):
+            self.db.user_query(number, 1)
+        self.db.user_query(6, 2)
+        self.assertEqual(self.cache.evictions, 1)
+        self.db.user_query(6, 1)   # least recently used, evicted
+        self.assertEqual(self.cache.misses, 6)
+        self.now = 11.0
+        self.db.user_query(6, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats["expirations"], stats["entries"]), (1, 4))
+
+    def test_writes_invalidate_only_affected_entries(self):
+        for number in (1, 6):
+            for user_id in (1, 2):
+                self.db.user_query(number, user_id)
+        self.db.exercise_logs.insert(UserID=1, ExerciseType="Running", DurationMinutes=30)
+        self.assertEqual(self.cache.invalidations, 1)
+        self.assertEqual(len(self.db.user_query(1, 1)), 1)
+        self.assertEqual(self.cache.hits, 0)
+        self.db.user_query(6, 1)
+        self.db.user_query(1, 2)
+        self.assertEqual(self.cache.hits, 2)
+
+        # Inside a transaction the entry is dropped only once it commits
+        with self.db.transaction() as conn:
+            self.db.sleep_data.insert(conn, UserID=2, SleepDurationMinutes=300)
+            self.assertEqual(len(self.db.user_query(6, 2)), 1)
+        self.assertEqual(len(self.db.user_query(6, 2)), 2)
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction() as conn:
+                self.db.exercise_logs.insert(conn, UserID=2, ExerciseType="Yoga")
+                raise RuntimeError
+        self.assertEqual(self.cache._pending, {})
+
+        # So do writes joined to a bare pool transaction
+        self.assertEqual(len(self.db.user_query(6, 1)), 1)
+        with self.db.pool.transaction() as conn:
+            self.db.sleep_data.insert(conn, UserID=1, SleepDurationMinutes=400)
+        self.assertEqual(self.cache._pending, {})
+        self.assertEqual(len(self.db.user_query(6, 1)), 2)
+
+        with sqlite3.connect(self.path) as conn:
+            ingest.ingest(conn, "ExerciseLogs", ("UserID", "ExerciseType"), [(2, "Rowing")], cache=self.cache)
+        self.assertEqual(len(self.db.user_query(1, 2)), 1)
+
+    def test_load_racing_an_invalidation_is_not_cached(self):
+        def load():
+            self.cache.invalidate(1, "SleepData")
+            return [("stale",)]
+
+        self.assertEqual(self.cache.get_or_load("q", 1, (), ("SleepData",), load), [("stale",)])
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "profile.db")
+        conn = sqlite3.connect(self.path)
+        bulk_load.ensure_schema(conn)
+        dataset = synthetic_data.SyntheticDataset(0.03, seed=3)
+        for table in synthetic_data.TABLES:
+            bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        conn.executemany("INSERT INTO NutritionLogs (UserID, MealName, FoodItems, MealTime) VALUES (?, ?, ?, ?)",
+                         [(1, "Lunch", "Rice", "2023-10-01 12:30:00"), (1, "Snack", None, "2023-10-01 16:00:00"),
+                          (1, "Dinner", "Soup", "2023-10-02 19:00:00")])
+        conn.execute("UPDATE Users SET Weight = 80, Height = 2 WHERE UserID = 2")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_queries_sql(self):
+        queries = query_catalog.user_queries()
+        conn = sqlite3.connect(self.path)
+        for user_id in (1, 2, 5, 30, 999):
+            lines = dal.profile_lines(dal.fetch_profile(conn, user_id, "2023-10-01"))
+            for number, (sql, count) in queries.items():
+                expected = [row[0] for row in conn.execute(sql, (user_id,) * count)]
+                if number == 10 and expected:
+                    # Ties between exercise types have no defined winner
+                    counts = dict(conn.execute("SELECT ExerciseType, COUNT(*) FROM ExerciseLogs WHERE UserID = ? "
+                                               "GROUP BY ExerciseType", (user_id,)).fetchall())
+                    top = [f"Most Frequent Exercise Type: {kind}" for kind, n in counts.items()
+                           if n == max(counts.values())]
+                    self.assertIn(lines[10][0], top)
+                    continue
+                self.assertCountEqual(lines[number], expected, (user_id, number))
+        self.assertEqual(dal.profile_lines(dal.fetch_profile(conn, 2), [11]), {11: ["BMI (Body Mass Index): 20"]})
+        conn.close()
+
+    def test_sections_and_cache(self):
+        cache = dal.QueryCache()
+        with dal.Database(self.path, pool_size=1, cache=cache) as db:
+            profile = db.profile(1, "2023-10-01")
+            self.assertEqual([m.MealName for m in profile.meals], ["Lunch", "Snack"])
+            self.assertEqual(len(db.profile(1).meals), db.nutrition_logs.count_for_user(1))
+            self.assertEqual(profile.user.UserID, 1)
+            self.assertEqual(profile.goal_count, len(profile.goals))
+            db.profile(1, "2023-10-01")
+            self.assertEqual(cache.hits, 1)
+            db.sleep_data.insert(UserID=1, SleepDurationMinutes=600, SleepQualityRating=5)
+            self.assertEqual(len(db.profile(1, "2023-10-01").sleep), len(profile.sleep) + 1)
+
+            empty = db.profile(999)
+            self.assertIsNone(empty.user)
+            self.assertEqual((empty.goal_count, empty.latest_exercise, empty.average_sleep_hours), (0, None, None))
+
+
+class TestBatchCatalog(unittest.TestCase):
+    def test_batch_matches_per_user(self):
+        conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(conn)
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=5)
+        for table in synthetic_data.TABLES:
+            bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        conn.execute("INSERT INTO NutritionLogs (UserID, MealName, FoodItems, MealTime) "
+                     "VALUES (3, 'Lunch', 'Rice', '2023-10-01 12:00:00')")
+        conn.commit()
+        queries = query_catalog.batch_queries()
+        self.assertEqual({name for name in queries if name.startswith("queries.sql")},
+                         {f"queries.sql Query {n}" for n in range(1, 15)})
+        self.assertIsNone(query_catalog.batch_sql(query_catalog.hypertensive_optimized))
+        users = list(range(1, 51)) + [999]
+        for name, query in queries.items():
+            expected = list(batch_catalog.run_per_user(conn, query, users))
+            actual = list(batch_catalog.run_batch(conn, query, users, batch_size=16))
+            self.assertEqual([user_id for user_id, _ in actual], sorted(users))
+            for (user_id, want), (_, got) in zip(expected, actual):
+                if query.kind == "ranked" and "COUNT" in query.batch_sql:
+                    # Ties between exercise types have no defined winner
+                    self.assertEqual(len(got), len(want))
+                    continue
+                self.assertCountEqual(got, want, (name, user_id))
+        self.assertFalse(conn.in_transaction)
+        conn.close()
+
+    def test_batch_queries_follow_epoch_storage(self):
+        rows = {}
+        for epoch in (False, True):
+            conn = sqlite3.connect(":memory:")
+            bulk_load.ensure_schema(conn)
+            dataset = synthetic_data.SyntheticDataset(0.05, seed=5, epoch=epoch)
+            for table in synthetic_data.TABLES:
+                bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+            queries = query_catalog.batch_queries(epoch=query_catalog.stores_epoch(conn))
+            users = range(1, 51)
+            rows[epoch] = {name: sum(len(r) for _, r in batch_catalog.run_batch(conn, query, users))
+                           for name, query in queries.items()}
+            results = batch_catalog.compare(conn, ["Exercise Window (Optimized)"], users)
+            self.assertEqual(results[0]["rows"], rows[epoch]["Exercise Window (Optimized)"])
+            conn.close()
+        self.assertTrue(rows[True]["Exercise Window (Optimized)"])
+        self.assertEqual(rows[True], rows[False])
+
+
+class TestCohorts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.tmp.name, "cohorts.db"))
+        bulk_load.ensure_schema(self.conn)
+        dataset = synthetic_data.SyntheticDataset(0.2, seed=7)
+        for table in synthetic_data.TABLES:
+            bulk_load.bulk_insert(self.conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        self.conn.execute("INSERT INTO ExerciseLogs (UserID, ExerciseType, CaloriesBurned) VALUES (1, NULL, NULL)")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_reports_match_sql(self):
+        store = cohorts.ColumnStore(self.conn, chunk_rows=333)
+        report = cohorts.calories_by_cohort(store)
+        expected = self.conn.execute(cohorts.CALORIES_SQL.format(width=10)).fetchall()
+        self.assertEqual([row[:4] for row in report], [row[:4] for row in expected])
+        for row, want in zip(report, expected):
+            if want[4] is None:
+                self.assertTrue(np.isnan(row[4]))
+            else:
+                self.assertAlmostEqual(row[4], want[4])
+        age, gender, kind = report[-1][:3]
+        calories = [c for (c,) in self.conn.execute(
+            "SELECT E.CaloriesBurned FROM ExerciseLogs E JOIN Users U USING (UserID) "
+            "WHERE U.Age / 10 * 10 = ? AND U.Gender = ? AND E.ExerciseType = ?", (age, gender, kind))]
+        self.assertAlmostEqual(report[-1][5], float(np.percentile(calories, 50)))
+        self.assertAlmostEqual(report[-1][6], float(np.percentile(calories, 90)))
+
+        pairs = np.array(self.conn.execute(cohorts.SLEEP_STEPS_SQL).fetchall(), dtype=np.float64)
+        result = cohorts.sleep_vs_steps(store)
+        self.assertEqual(result["users"], len(pairs))
+        self.assertAlmostEqual(result["pearson"], np.corrcoef(pairs[:, 0], pairs[:, 1])[0, 1])
+        self.assertTrue(-1 <= result["spearman"] <= 1)
+
+    def test_snapshot_cache(self):
+        cache_dir = os.path.join(self.tmp.name, "snapshots")
+        store = cohorts.ColumnStore(self.conn, cache_dir)
+        first = store.table("SleepData")
+        self.assertIs(store.table("SleepData"), first)
+        self.assertEqual((store.hits, store.misses), (1, 1))
+
+        reopened = cohorts.ColumnStore(self.conn, cache_dir)
+        np.testing.assert_array_equal(reopened.table("SleepData")["SleepQualityRating"], first["SleepQualityRating"])
+        self.assertEqual((reopened.hits, reopened.misses), (1, 0))
+
+        self.conn.execute("INSERT INTO SleepData (UserID, SleepQualityRating) VALUES (1, 5)")
+        self.conn.commit()
+        self.assertEqual(len(store.table("SleepData")), len(first) + 1)
+        self.assertEqual(store.misses, 2)
+
+
+class TestRollups(unittest.TestCase):
+    def build(self, epoch):
+        conn = sqlite3.connect(":memory:", isolation_level=None)
+        bulk_load.ensure_schema(conn)
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=11, epoch=epoch)
+        for table in ("Users", "ExerciseLogs", "SleepData"):
+            bulk_load.bulk_insert(conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        return conn
+
+    def actual(self, conn, table, grain, user_id):
+        return {row["Period"]: row for row in rollups.trend(conn, table, grain, user_id)}
+
+    def expected(self, conn, table, grain, user_id):
+        _, column, (first, second) = rollups.SOURCES[table]
+        period = rollups._period(conn, table, grain)
+        return {row[0]: row[1:] for row in conn.execute(
+            f"SELECT {period} AS Period, COUNT(*), SUM({first}), AVG({second}) FROM {table} "
+            f"WHERE UserID = ? AND {column} IS NOT NULL GROUP BY Period", (user_id,))}
+
+    def check(self, conn, user_ids):
+        for table, (_, _, (first, second)) in rollups.SOURCES.items():
+            for grain in rollups.GRAINS:
+                for user_id in user_ids:
+                    expected = self.expected(conn, table, grain, user_id)
+                    actual = self.actual(conn, table, grain, user_id)
+                    self.assertEqual(sorted(actual), sorted(expected))
+                    for period, (rows, total, average) in expected.items():
+                        row = actual[period]
+                        self.assertEqual((row["RowCount"], row[first]), (rows, total))
+                        self.assertAlmostEqual(row[f"{second}Avg"], average)
+
+    def test_incremental_refresh_and_stitching(self):
+        for epoch in (False, True):
+            conn = self.build(epoch)
+            self.assertEqual(rollups.rebuild(conn)["SleepData"], conn.execute("SELECT COUNT(*) FROM SleepData")
+                             .fetchone()[0])
+            self.check(conn, (1, 7, 50))
+
+            stamp = 1704153600 if epoch else "2024-01-02 00:00:00"
+            conn.execute("INSERT INTO ExerciseLogs (UserID, DurationMinutes, CaloriesBurned, DateTime) "
+                         "VALUES (7, 40, 300.0, ?), (7, 20, NULL, ?)", (stamp, stamp))
+            conn.execute("INSERT INTO SleepData (UserID, SleepDurationMinutes, SleepQualityRating, SleepStartTime) "
+                         "VALUES (7, 400, 3, ?)", (stamp,))
+            self.check(conn, (7,))   # the tail is stitched in before any refresh
+            self.assertEqual(rollups.refresh_all(conn), {"ExerciseLogs": 2, "SleepData": 1})
+            self.assertEqual(rollups.refresh_all(conn), {"ExerciseLogs": 0, "SleepData": 0})
+            self.check(conn, (1, 7))
+            daily = rollups.trend(conn, "ExerciseLogs", "daily", 7, "2024-01-02", "2024-01-03")
+            self.assertEqual([(r["Period"], r["RowCount"], r["DurationMinutes"]) for r in daily],
+                             [("2024-01-02", 2, 60)])
+            self.assertEqual(rollups.trend(conn, "ExerciseLogs", "weekly", 7, "2024-01-01")[0]["Period"],
+                             "2024-01-01")
+            conn.close()
+
+    def test_failed_rebuild_keeps_the_rollups(self):
+        conn = self.build(False)
+        rollups.rebuild(conn)
+        before = {t: conn.execute(f"SELECT * FROM {rollups.rollup_table(t, 'daily')} ORDER BY 1, 2").fetchall()
+                  for t in rollups.SOURCES}
+        marks = conn.execute(f"SELECT * FROM {rollups.WATERMARKS} ORDER BY 1").fetchall()
+        conn.execute(f"CREATE TRIGGER fail AFTER INSERT ON {rollups.rollup_table('SleepData', 'weekly')} "
+                     f"BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+        with self.assertRaises(sqlite3.IntegrityError):
+            rollups.rebuild(conn)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute(f"SELECT * FROM {rollups.WATERMARKS} ORDER BY 1").fetchall(), marks)
+        for table, rows in before.items():
+            self.assertEqual(conn.execute(f"SELECT * FROM {rollups.rollup_table(table, 'daily')} "
+                                          f"ORDER BY 1, 2").fetchall(), rows)
+        conn.close()
+
+
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        bulk_load.ensure_schema(self.conn)
+        dataset = synthetic_data.SyntheticDataset(0.05, seed=13)
+        for table in ("Users", "NutritionLogs", "UserPreferences"):
+            bulk_load.bulk_insert(self.conn, table, synthetic_data.COLUMNS[table], dataset.rows(table))
+        search.install(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def keys(self, *args, **kwargs):
+        return [hit.key for hit in search.search(self.conn, *args, limit=10 ** 6, **kwargs)]
+
+    def like(self, sql, params):
+        return sorted(row[0] for row in self.conn.execute(sql, params))
+
+    def test_matches_like(self):
+        for text in ("salmon", "peanut butter", "salmon quinoa"):
+            words = text.split()
+            expected = self.like(search.like_sql("NutritionLogs", "FoodItems", words),
+                                 [f"%{word}%" for word in words])
+            self.assertTrue(expected)
+            self.assertEqual(sorted(self.keys("NutritionLogs", text)), expected)
+        self.assertEqual(sorted(self.keys("UserPreferences", "vegan", column="DietaryRestrictions")),
+                         self.like("SELECT UserID FROM UserPreferences WHERE DietaryRestrictions LIKE ?", ("%vegan%",)))
+        self.assertEqual(self.keys("NutritionLogs", "  ,; "), [])
+
+    def test_ranking_prefix_and_user_filter(self):
+        hits = search.search(self.conn, "NutritionLogs", "salmon", limit=10)
+        self.assertEqual(len(hits), 10)
+        self.assertEqual([hit.score for hit in hits], sorted(hit.score for hit in hits))
+        self.assertIn("salmon", hits[0].values[0])
+
+        starts = [key for key, foods in self.conn.execute("SELECT LogID, FoodItems FROM NutritionLogs")
+                  if any(word.startswith("sal") for word in foods.replace(",", " ").split())]
+        self.assertEqual(sorted(self.keys("NutritionLogs", "sal", prefix=True)), starts)
+        self.assertEqual(self.keys("NutritionLogs", "sal"), [])
+
+        user_id = 7
+        expected = self.like(search.like_sql("NutritionLogs", "FoodItems", ["salmon"], user_id),
+                             (user_id, "%salmon%"))
+        hits = search.search(self.conn, "NutritionLogs", "salmon", user_id=user_id, limit=10 ** 6)
+        self.assertEqual(sorted(hit.key for hit in hits), expected)
+        self.assertTrue(all(hit.user_id == user_id for hit in hits))
+        self.assertEqual([hit.score for hit in hits], sorted(hit.score for hit in hits))
+        everyone = {hit.key: hit.score for hit in search.search(self.conn, "NutritionLogs", "salmon", limit=10 ** 6)}
+        for hit in hits:
+            self.assertAlmostEqual(hit.score, everyone[hit.key])
+        self.assertEqual(self.keys("UserPreferences", "running", user_id=3), [3])
+
+    def test_triggers_and_bulk_load(self):
+        c = self.conn
+        c.execute("INSERT INTO NutritionLogs (LogID, UserID, FoodItems) VALUES (900001, 3, 'kimchi, rice')")
+        c.execute("UPDATE NutritionLogs SET FoodItems = 'kimchi stew' WHERE LogID = 1")
+        c.execute("DELETE FROM NutritionLogs WHERE LogID = 2")
+        c.execute("UPDATE UserPreferences SET DietaryRestrictions = 'Paleo' WHERE UserID = 4")
+        self.assertEqual(sorted(self.keys("NutritionLogs", "kimchi")), [1, 900001])
+        self.assertEqual(self.keys("UserPreferences", "paleo"), [4])
+        search.check(c)
+
+        with search.suspended(c, "NutritionLogs"):
+            c.executemany("INSERT INTO NutritionLogs (LogID, UserID, FoodItems) VALUES (?, 5, 'natto')",
+                          [(900002 + i,) for i in range(100)])
+        self.assertEqual(len(self.keys("NutritionLogs", "natto")), 100)
+        c.execute("INSERT INTO NutritionLogs (UserID, FoodItems) VALUES (5, 'natto')")
+        self.assertEqual(len(self.keys("NutritionLogs", "natto")), 101)
+        search.check(c)
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            with search.suspended(c, "NutritionLogs"):
+                c.execute("INSERT INTO NutritionLogs (LogID, UserID, FoodItems) VALUES (900500, 5, 'miso')")
+                c.execute("INSERT INTO NutritionLogs (LogID, UserID, FoodItems) VALUES (900500, 5, 'miso')")
+        self.assertEqual(c.execute("SELECT COUNT(*) FROM NutritionLogs WHERE LogID = 900500").fetchone()[0], 0)
+        self.assertEqual(self.keys("NutritionLogs", "miso"), [])
+        c.execute("INSERT INTO NutritionLogs (UserID, FoodItems) VALUES (5, 'miso')")
+        self.assertEqual(len(self.keys("NutritionLogs", "miso")), 1)
+        search.check(c)
+
+    def test_encoded_layout(self):
+        encode_categoricals.migrate(self.conn)
+        search.install(self.conn)
+        self.conn.execute("INSERT INTO NutritionLogs (UserID, MealName, FoodItems) VALUES (9, 'Lunch', 'tempeh')")
+        hits = search.search(self.conn, "NutritionLogs", "tempeh", user_id=9)
+        self.assertEqual([hit.values for hit in hits], [("tempeh",)])
+        search.check(self.conn)
+
+    def test_match_expression(self):
+        self.assertEqual(search.match_expression('salmon, NOT "pizza'), '"salmon" "NOT" "pizza"')
+        self.assertEqual(search.match_expression("peanut but", prefix=True), '"peanut" "but"*')
+        self.assertIsNone(search.match_expression("--"))
+
+    def test_cli_query(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "search.db")
+            self.conn.execute("VACUUM INTO ?", (path,))
+            user_id = search.search(self.conn, "NutritionLogs", "salmon", limit=1)[0].user_id
+            for user in ((), ("--user", str(user_id))):
+                out = io.StringIO()
+                with contextlib.redirect_stdout(out):
+                    search.main(["query", "--text", "salmon", "--db", path, *user])
+                self.assertIn("salmon", out.getvalue())
+
+
 if __name__ == '__main__':
     unittest.main()
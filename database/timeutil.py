@@ -0,0 +1,59 @@
+import calendar
+from datetime import date, datetime, timezone
+
+# Text format used for DATETIME columns in text mode
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Temporal columns per table. In epoch mode they hold integer seconds since
+# 1970-01-01 UTC; in text mode 'YYYY-MM-DD HH:MM:SS' strings.
+TEMPORAL_COLUMNS = {
+    "ExerciseLogs": ("DateTime",),
+    "HealthMetrics": ("RecordedAt",),
+    "NutritionLogs": ("MealTime",),
+    "SleepData": ("SleepStartTime", "SleepEndTime"),
+}
+
+DAY = 86400
+WEEK = 7 * DAY
+
+
+# Epoch seconds for a datetime, date, 'YYYY-MM-DD[ HH:MM:SS]' string or an
+# epoch value. Naive datetimes are taken as UTC, matching SQLite's
+# unixepoch() and strftime('%s', ...).
+def to_epoch(value):
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        fmt = DATETIME_FORMAT if len(value) > 10 else "%Y-%m-%d"
+        value = datetime.strptime(value, fmt)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is not None:
+        return int(value.timestamp())
+    return calendar.timegm(value.timetuple())
+
+
+# 'YYYY-MM-DD HH:MM:SS' (UTC) for epoch seconds
+def from_epoch(value):
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).strftime(DATETIME_FORMAT)
+
+
+# Store a datetime either as epoch seconds or as formatted text
+def format_timestamp(value, epoch=False):
+    return to_epoch(value) if epoch else value.strftime(DATETIME_FORMAT)
+
+
+# Start of the bucket (e.g. DAY or WEEK) that an epoch value falls into.
+# Weeks start on Thursday, like 1970-01-01; pass offset=4 * DAY for Mondays.
+def bucket(value, size=DAY, offset=0):
+    return value - (value - offset) % size
+
+
+# Bounds for a half-open [start, end) window in the storage format of the
+# database, so the same query text works in both modes
+def window(start, end, epoch=False):
+    if epoch:
+        return to_epoch(start), to_epoch(end)
+    return from_epoch(to_epoch(start)), from_epoch(to_epoch(end))
@@ -1,14 +1,24 @@
 import sqlite3
 
-# Connect to the SQLite database
-conn = sqlite3.connect("health_fitness_app.db")
-cursor = conn.cursor()
+from dal import Database, ShardedDatabase
 
-try:
-    # Begin the transaction
-    conn.execute("BEGIN")
 
-    # Example: Insert a new user with age (assuming you have a table named 'Users')
+# Insert a new user in its own transaction. Invalid users are rejected before
+# anything is written, and a database error (e.g. the Age CHECK constraint)
+# rolls the transaction back. With a ShardedDatabase the user gets the next
+# global UserID and is written to the shard that owns it.
+def insert_user(db, new_user):
+    # Check for negative age
+    if new_user["Age"] < 0:
+        raise ValueError("Age cannot be negative")
+    if isinstance(db, ShardedDatabase):
+        return db.insert_user(**new_user)
+    with db.transaction() as conn:
+        return db.users.insert(conn, **new_user)
+
+
+def main(db_path="health_fitness_app.db"):
+    # Example: Insert a new user with age
     new_user = {
         "UserName": "JohnDoe",
         "Age": -25,  # Negative age (intentional to cause a transaction failure)
@@ -16,25 +26,15 @@ try:
         # Add other user attributes here
     }
 
-    # Check for negative age
-    if new_user["Age"] < 0:
-        raise ValueError("Age cannot be negative")
-
-    cursor.execute("""
-    INSERT INTO Users (UserName, Age, Gender)
-    VALUES (?, ?, ?);
-    """, (new_user["UserName"], new_user["Age"], new_user["Gender"]))
-
-    # Commit the transaction
-    conn.commit()
-    print("User insertion successful.")
+    with Database(db_path, pool_size=1) as db:
+        try:
+            user_id = insert_user(db, new_user)
+            print(f"User insertion successful (UserID {user_id}).")
+        except (ValueError, sqlite3.Error) as e:
+            # Nothing was committed
+            print("Error:", e)
+            print("User insertion failed.")
 
-except sqlite3.Error as e:
-    # Handle the error and rollback the transaction on failure
-    print("Error:", e)
-    conn.rollback()
-    print("User insertion failed due to negative age.")
 
-finally:
-    # Close the database connection
-    conn.close()
+if __name__ == "__main__":
+    main()
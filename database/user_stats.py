@@ -0,0 +1,130 @@
+import argparse
+import os
+import re
+import sqlite3
+
+USER_STATS_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_stats.sql")
+
+# Recompute the summary tables from the raw rows
+REBUILD_SQL = """
+DELETE FROM UserExerciseTypeStats;
+DELETE FROM UserStats;
+
+INSERT INTO UserExerciseTypeStats (UserID, ExerciseType, LogCount)
+SELECT UserID, ExerciseType, COUNT(*)
+FROM ExerciseLogs
+WHERE UserID IS NOT NULL AND ExerciseType IS NOT NULL
+GROUP BY UserID, ExerciseType;
+
+INSERT INTO UserStats (
+    UserID, GoalCount, ExerciseCount, ExerciseMinutes, MostFrequentExerciseType,
+    SleepMinutesSum, SleepDurationCount, SleepQualitySum, SleepQualityCount
+)
+SELECT
+    ids.UserID,
+    COALESCE(g.GoalCount, 0),
+    COALESCE(e.ExerciseCount, 0),
+    COALESCE(e.ExerciseMinutes, 0),
+    (SELECT ExerciseType FROM UserExerciseTypeStats t
+     WHERE t.UserID = ids.UserID ORDER BY LogCount DESC, ExerciseType LIMIT 1),
+    COALESCE(s.SleepMinutesSum, 0),
+    COALESCE(s.SleepDurationCount, 0),
+    COALESCE(s.SleepQualitySum, 0),
+    COALESCE(s.SleepQualityCount, 0)
+FROM (
+    SELECT UserID FROM ExerciseLogs WHERE UserID IS NOT NULL
+    UNION SELECT UserID FROM SleepData WHERE UserID IS NOT NULL
+    UNION SELECT UserID FROM GoalsAndProgress WHERE UserID IS NOT NULL
+) ids
+LEFT JOIN (
+    SELECT UserID, COUNT(*) AS GoalCount FROM GoalsAndProgress GROUP BY UserID
+) g ON g.UserID = ids.UserID
+LEFT JOIN (
+    SELECT UserID, COUNT(*) AS ExerciseCount, TOTAL(DurationMinutes) AS ExerciseMinutes
+    FROM ExerciseLogs GROUP BY UserID
+) e ON e.UserID = ids.UserID
+LEFT JOIN (
+    SELECT UserID,
+           TOTAL(SleepDurationMinutes) AS SleepMinutesSum, COUNT(SleepDurationMinutes) AS SleepDurationCount,
+           TOTAL(SleepQualityRating) AS SleepQualitySum, COUNT(SleepQualityRating) AS SleepQualityCount
+    FROM SleepData GROUP BY UserID
+) s ON s.UserID = ids.UserID
+ORDER BY ids.UserID;
+"""
+
+
+# user_stats.sql, with the triggers of tables that encode_categoricals has
+# turned into views moved onto their <Table>Encoded tables
+def install_sql(conn):
+    import encode_categoricals
+
+    with open(USER_STATS_SQL) as f:
+        script = f.read()
+    encoded = {table for table in encode_categoricals.CATEGORICAL if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (encode_categoricals.encoded_table(table),)).fetchone()}
+
+    def move(match):
+        table = match.group(1)
+        sql = match.group(0)
+        return encode_categoricals.encoded_trigger_ddl(table, sql) if table in encoded else sql
+
+    return re.sub(r"CREATE TRIGGER [^\n]*\n[^\n]* ON (\w+)\n.*?\nEND;", move, script, flags=re.S)
+
+
+# Create the summary tables and triggers, then fill them from existing rows
+def install(conn):
+    conn.executescript(install_sql(conn))
+    rebuild(conn)
+
+
+# Full rebuild from the raw tables, for repair after bulk changes made with
+# the triggers disabled or dropped
+def rebuild(conn):
+    conn.executescript("BEGIN;" + REBUILD_SQL + "COMMIT;")
+
+
+# The dashboard aggregates for one user from a single primary-key lookup
+def dashboard(conn, user_id):
+    row = conn.execute(
+        """
+        SELECT GoalCount, ExerciseMinutes, ExerciseCount, MostFrequentExerciseType,
+               SleepMinutesSum, SleepDurationCount, SleepQualitySum, SleepQualityCount
+        FROM UserStats WHERE UserID = ?
+        """,
+        (user_id,),
+    ).fetchone()
+    if row is None:
+        row = (0, 0, 0, None, 0, 0, 0, 0)
+    goals, minutes, exercises, most_frequent, sleep_minutes, sleep_count, quality_sum, quality_count = row
+    return {
+        "NumberOfGoals": goals,
+        "TotalExerciseDuration": minutes if exercises else None,
+        "MostFrequentExerciseType": most_frequent,
+        "AverageDailySleepDurationHours": sleep_minutes / 60.0 / sleep_count if sleep_count else None,
+        "AverageDailySleepQualityRating": quality_sum / quality_count if quality_count else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the UserStats summary table")
+    parser.add_argument("command", choices=("install", "rebuild", "show"))
+    parser.add_argument("--db", default="health_fitness_app.db")
+    parser.add_argument("--user", type=int, default=1, help="UserID for the show command")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    if args.command == "install":
+        install(conn)
+        print("Installed UserStats and its triggers")
+    elif args.command == "rebuild":
+        rebuild(conn)
+        print("Rebuilt UserStats")
+    else:
+        for name, value in dashboard(conn, args.user).items():
+            print(f"{name}: {value}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+-- Per-user summary kept current by triggers, so the dashboard aggregates
+-- (queries 3, 8, 10, 12 and 13 in queries.sql) become a primary-key lookup
+-- instead of re-aggregating the user's whole history.
+-- Run `python user_stats.py install` to create it and fill it from existing rows,
+-- and `python user_stats.py rebuild` to repair it.
+
+CREATE TABLE IF NOT EXISTS UserStats (
+    UserID INTEGER NOT NULL,
+    GoalCount INTEGER NOT NULL DEFAULT 0,
+    ExerciseCount INTEGER NOT NULL DEFAULT 0,
+    ExerciseMinutes INTEGER NOT NULL DEFAULT 0,
+    MostFrequentExerciseType VARCHAR(50),
+    SleepMinutesSum INTEGER NOT NULL DEFAULT 0,
+    SleepDurationCount INTEGER NOT NULL DEFAULT 0,
+    SleepQualitySum INTEGER NOT NULL DEFAULT 0,
+    SleepQualityCount INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (UserID),
+    FOREIGN KEY(UserID) REFERENCES Users (UserID)
+);
+
+-- Per-type exercise counters behind UserStats.MostFrequentExerciseType
+CREATE TABLE IF NOT EXISTS UserExerciseTypeStats (
+    UserID INTEGER NOT NULL,
+    ExerciseType VARCHAR(50) NOT NULL,
+    LogCount INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (UserID, ExerciseType)
+) WITHOUT ROWID;
+
+-- ExerciseLogs
+CREATE TRIGGER IF NOT EXISTS trg_ExerciseLogs_UserStats_Insert
+AFTER INSERT ON ExerciseLogs
+BEGIN
+    INSERT INTO UserStats (UserID) SELECT NEW.UserID WHERE NEW.UserID IS NOT NULL
+        ON CONFLICT (UserID) DO NOTHING;
+    UPDATE UserStats
+    SET ExerciseCount = ExerciseCount + 1,
+        ExerciseMinutes = ExerciseMinutes + COALESCE(NEW.DurationMinutes, 0)
+    WHERE UserID = NEW.UserID;
+    INSERT INTO UserExerciseTypeStats (UserID, ExerciseType, LogCount)
+        SELECT NEW.UserID, NEW.ExerciseType, 1 WHERE NEW.UserID IS NOT NULL AND NEW.ExerciseType IS NOT NULL
+        ON CONFLICT (UserID, ExerciseType) DO UPDATE SET LogCount = LogCount + 1;
+    UPDATE UserStats
+    SET MostFrequentExerciseType = (
+        SELECT ExerciseType FROM UserExerciseTypeStats
+        WHERE UserID = NEW.UserID ORDER BY LogCount DESC, ExerciseType LIMIT 1)
+    WHERE UserID = NEW.UserID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ExerciseLogs_UserStats_Delete
+AFTER DELETE ON ExerciseLogs
+BEGIN
+    UPDATE UserStats
+    SET ExerciseCount = ExerciseCount - 1,
+        ExerciseMinutes = ExerciseMinutes - COALESCE(OLD.DurationMinutes, 0)
+    WHERE UserID = OLD.UserID;
+    UPDATE UserExerciseTypeStats SET LogCount = LogCount - 1
+    WHERE UserID = OLD.UserID AND ExerciseType = OLD.ExerciseType;
+    DELETE FROM UserExerciseTypeStats
+    WHERE UserID = OLD.UserID AND ExerciseType = OLD.ExerciseType AND LogCount <= 0;
+    UPDATE UserStats
+    SET MostFrequentExerciseType = (
+        SELECT ExerciseType FROM UserExerciseTypeStats
+        WHERE UserID = OLD.UserID ORDER BY LogCount DESC, ExerciseType LIMIT 1)
+    WHERE UserID = OLD.UserID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_ExerciseLogs_UserStats_Update
+AFTER UPDATE OF UserID, ExerciseType, DurationMinutes ON ExerciseLogs
+BEGIN
+    UPDATE UserStats
+    SET ExerciseCount = ExerciseCount - 1,
+        ExerciseMinutes = ExerciseMinutes - COALESCE(OLD.DurationMinutes, 0)
+    WHERE UserID = OLD.UserID;
+    UPDATE UserExerciseTypeStats SET LogCount = LogCount - 1
+    WHERE UserID = OLD.UserID AND ExerciseType = OLD.ExerciseType;
+    DELETE FROM UserExerciseTypeStats
+    WHERE UserID = OLD.UserID AND ExerciseType = OLD.ExerciseType AND LogCount <= 0;
+
+    INSERT INTO UserStats (UserID) SELECT NEW.UserID WHERE NEW.UserID IS NOT NULL
+        ON CONFLICT (UserID) DO NOTHING;
+    UPDATE UserStats
+    SET ExerciseCount = ExerciseCount + 1,
+        ExerciseMinutes = ExerciseMinutes + COALESCE(NEW.DurationMinutes, 0)
+    WHERE UserID = NEW.UserID;
+    INSERT INTO UserExerciseTypeStats (UserID, ExerciseType, LogCount)
+        SELECT NEW.UserID, NEW.ExerciseType, 1 WHERE NEW.UserID IS NOT NULL AND NEW.ExerciseType IS NOT NULL
+        ON CONFLICT (UserID, ExerciseType) DO UPDATE SET LogCount = LogCount + 1;
+
+    UPDATE UserStats
+    SET MostFrequentExerciseType = (
+        SELECT ExerciseType FROM UserExerciseTypeStats
+        WHERE UserExerciseTypeStats.UserID = UserStats.UserID ORDER BY LogCount DESC, ExerciseType LIMIT 1)
+    WHERE UserID IN (OLD.UserID, NEW.UserID);
+END;
+
+-- SleepData
+CREATE TRIGGER IF NOT EXISTS trg_SleepData_UserStats_Insert
+AFTER INSERT ON SleepData
+BEGIN
+    INSERT INTO UserStats (UserID) SELECT NEW.UserID WHERE NEW.UserID IS NOT NULL
+        ON CONFLICT (UserID) DO NOTHING;
+    UPDATE UserStats
+    SET SleepMinutesSum = SleepMinutesSum + COALESCE(NEW.SleepDurationMinutes, 0),
+        SleepDurationCount = SleepDurationCount + (NEW.SleepDurationMinutes IS NOT NULL),
+        SleepQualitySum = SleepQualitySum + COALESCE(NEW.SleepQualityRating, 0),
+        SleepQualityCount = SleepQualityCount + (NEW.SleepQualityRating IS NOT NULL)
+    WHERE UserID = NEW.UserID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_SleepData_UserStats_Delete
+AFTER DELETE ON SleepData
+BEGIN
+    UPDATE UserStats
+    SET SleepMinutesSum = SleepMinutesSum - COALESCE(OLD.SleepDurationMinutes, 0),
+        SleepDurationCount = SleepDurationCount - (OLD.SleepDurationMinutes IS NOT NULL),
+        SleepQualitySum = SleepQualitySum - COALESCE(OLD.SleepQualityRating, 0),
+        SleepQualityCount = SleepQualityCount - (OLD.SleepQualityRating IS NOT NULL)
+    WHERE UserID = OLD.UserID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_SleepData_UserStats_Update
+AFTER UPDATE OF UserID, SleepDurationMinutes, SleepQualityRating ON SleepData
+BEGIN
+    UPDATE UserStats
+    SET SleepMinutesSum = SleepMinutesSum - COALESCE(OLD.SleepDurationMinutes, 0),
+        SleepDurationCount = SleepDurationCount - (OLD.SleepDurationMinutes IS NOT NULL),
+        SleepQualitySum = SleepQualitySum - COALESCE(OLD.SleepQualityRating, 0),
+        SleepQualityCount = SleepQualityCount - (OLD.SleepQualityRating IS NOT NULL)
+    WHERE UserID = OLD.UserID;
+    INSERT INTO UserStats (UserID) SELECT NEW.UserID WHERE NEW.UserID IS NOT NULL
+        ON CONFLICT (UserID) DO NOTHING;
+    UPDATE UserStats
+    SET SleepMinutesSum = SleepMinutesSum + COALESCE(NEW.SleepDurationMinutes, 0),
+        SleepDurationCount = SleepDurationCount + (NEW.SleepDurationMinutes IS NOT NULL),
+        SleepQualitySum = SleepQualitySum + COALESCE(NEW.SleepQualityRating, 0),
+        SleepQualityCount = SleepQualityCount + (NEW.SleepQualityRating IS NOT NULL)
+    WHERE UserID = NEW.UserID;
+END;
+
+-- GoalsAndProgress
+CREATE TRIGGER IF NOT EXISTS trg_GoalsAndProgress_UserStats_Insert
+AFTER INSERT ON GoalsAndProgress
+BEGIN
+    INSERT INTO UserStats (UserID) SELECT NEW.UserID WHERE NEW.UserID IS NOT NULL
+        ON CONFLICT (UserID) DO NOTHING;
+    UPDATE UserStats SET GoalCount = GoalCount + 1 WHERE UserID = NEW.UserID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_GoalsAndProgress_UserStats_Delete
+AFTER DELETE ON GoalsAndProgress
+BEGIN
+    UPDATE UserStats SET GoalCount = GoalCount - 1 WHERE UserID = OLD.UserID;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_GoalsAndProgress_UserStats_Update
+AFTER UPDATE OF UserID ON GoalsAndProgress
+BEGIN
+    UPDATE UserStats SET GoalCount = GoalCount - 1 WHERE UserID = OLD.UserID;
+    INSERT INTO UserStats (UserID) SELECT NEW.UserID WHERE NEW.UserID IS NOT NULL
+        ON CONFLICT (UserID) DO NOTHING;
+    UPDATE UserStats SET GoalCount = GoalCount + 1 WHERE UserID = NEW.UserID;
+END;
@@ -0,0 +1,33 @@
+-- The dashboard aggregates from queries.sql answered from the UserStats summary
+-- table (see user_stats.sql). Each one is a single primary-key lookup. Numbers
+-- match the corresponding queries in queries.sql.
+
+-- Query 3: Count the number of goals for UserID 1
+SELECT 
+    'Number of Goals: ' || GoalCount AS NumberOfGoals
+FROM UserStats
+WHERE UserID = 1;
+
+-- Query 8: Calculate the total duration of exercise (minutes) for UserID 1
+SELECT 
+    'Total Exercise Duration: ' || ExerciseMinutes AS TotalExerciseDuration
+FROM UserStats
+WHERE UserID = 1;
+
+-- Query 10: Find the most frequent exercise type for UserID 1
+SELECT 
+    'Most Frequent Exercise Type: ' || MostFrequentExerciseType AS MostFrequentExerciseType
+FROM UserStats
+WHERE UserID = 1;
+
+-- Query 12: Calculate the average daily sleep duration (hours) for UserID 1
+SELECT 
+    'Average Daily Sleep Duration: ' || (SleepMinutesSum / 60.0 / SleepDurationCount) AS AverageDailySleepDurationHours
+FROM UserStats
+WHERE UserID = 1;
+
+-- Query 13: Calculate the average daily sleep quality rating for UserID 1
+SELECT 
+    'Average Daily Sleep Quality Rating: ' || (CAST(SleepQualitySum AS REAL) / SleepQualityCount) AS AverageDailySleepQualityRating
+FROM UserStats
+WHERE UserID = 1;